@@ -0,0 +1,428 @@
+"""Benchmark de carga e latência da API Flask.
+
+Para cada tamanho de base (--rows), cria um SQLite novo, semeia N RSVPs e
+roda uma mistura realista de tráfego (polls de /api/stats e /api/dishes,
+rajadas de POST /api/rsvps e aceites/recusas do admin):
+
+  * inprocess: app de main.py chamado pelo test client, em threads;
+  * gunicorn:  app servido por um gunicorn local com vários workers.
+
+Para cada rota reporta p50/p95/p99, requisições/s e consultas SQL por
+requisição, e grava tudo em JSON. No modo gunicorn as consultas vêm da
+diferença dos contadores de /api/metrics de cada worker antes e depois
+da carga:
+
+    python backend_code/bench/bench_api.py --rows 1000 10000 100000 --mode both --output bench.json
+    python backend_code/bench/bench_api.py --rows 1000 --baseline bench.json   # compara com uma execução anterior
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.abspath(os.path.join(HERE, "..", "src"))
+# Carga sintética vinda de um IP só: sem limite por cliente nem admissão
+os.environ.setdefault("RATE_LIMIT", "0")
+os.environ.setdefault("MAX_IN_FLIGHT", "0")
+
+# (rota, peso) — os polls dominam, como no dia do convite
+TRAFFIC_MIX = [
+    ("GET /api/stats", 45),
+    ("GET /api/dishes", 30),
+    ("GET /api/rsvps", 5),
+    ("POST /api/rsvps", 10),
+    ("POST /api/rsvps/<id>/accept", 5),
+    ("POST /api/rsvps/<id>/reject", 5),
+]
+POST_BURST = 5
+SEED_CHUNK = 5000
+METRIC_LINE = re.compile(r'^(flashback_sql_statements_total|flashback_http_requests_total)\{(.*)\} (\S+)$')
+METRIC_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def _load_app(db_path):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, SRC)
+    from main import app
+    return app
+
+
+# -------------------------------------------------
+# Semeadura
+# -------------------------------------------------
+def seed(db_path, rows):
+    app = _load_app(db_path)
+    import eventscope
+    import stats
+    from models.rsvp import db, RSVP, DishCounter
+
+    rng = random.Random(42)
+    start = datetime.utcnow() - timedelta(days=30)
+    with app.app_context():
+        event_id = eventscope.get(eventscope.DEFAULT_EVENT_SLUG).id
+        dish_ids = db.session.scalars(db.select(DishCounter.id).order_by(DishCounter.id)).all()
+        dish_names = dict(db.session.execute(db.select(DishCounter.id, DishCounter.dish_name)).all())
+        batch = []
+        for i in range(rows):
+            payment_type = rng.choice(["individual", "casal"])
+            dish_id = rng.choice(dish_ids)
+            batch.append({
+                "event_id": event_id,
+                "name": f"Convidado {i}",
+                "email": f"convidado{i}@example.com",
+                "phone": f"6199{i:07d}",
+                "guests": 1 if payment_type == "individual" else 2,
+                "dish_id": dish_id,
+                "selected_dish": dish_names[dish_id],
+                "payment_type": payment_type,
+                "total_amount": 60.0 if payment_type == "individual" else 100.0,
+                "payment_status": rng.choice(["pending", "pending", "confirmed", "rejected"]),
+                "created_at": start + timedelta(seconds=i * 30),
+                "updated_at": start + timedelta(seconds=i * 30),
+            })
+            if len(batch) == SEED_CHUNK:
+                db.session.execute(db.insert(RSVP), batch)
+                batch = []
+        if batch:
+            db.session.execute(db.insert(RSVP), batch)
+
+        # Sem limite de vagas: as rajadas de POST medem a escrita, não a recusa
+        counts = dict(db.session.execute(
+            db.select(RSVP.dish_id, db.func.count(RSVP.id)).group_by(RSVP.dish_id)
+        ).all())
+        for counter in DishCounter.query.all():
+            counter.current_count = counts.get(counter.id, 0)
+            counter.max_count = 10 ** 9
+        stats.rebuild(event_id)
+        db.session.commit()
+
+
+# -------------------------------------------------
+# Geração de tráfego
+# -------------------------------------------------
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.queries = defaultdict(list)
+
+    def add(self, route, seconds, ok, queries=None):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+            if queries is not None:
+                self.queries[route].append(queries)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _summary(recorder, elapsed, sql_per_request=None):
+    """sql_per_request: {rota: consultas por requisição} medido fora do Recorder (gunicorn)"""
+    routes = {}
+    total = 0
+    for route, values in sorted(recorder.latencies.items()):
+        total += len(values)
+        queries = recorder.queries.get(route)
+        routes[route] = {
+            "requests": len(values),
+            "errors": recorder.errors.get(route, 0),
+            "requests_per_s": round(len(values) / elapsed, 1),
+            "p50_ms": round(_percentile(values, 50) * 1000, 2),
+            "p95_ms": round(_percentile(values, 95) * 1000, 2),
+            "p99_ms": round(_percentile(values, 99) * 1000, 2),
+            "sql_per_request": round(sum(queries) / len(queries), 2) if queries else
+            (sql_per_request or {}).get(route),
+        }
+    return {"elapsed_s": round(elapsed, 2), "requests_per_s": round(total / elapsed, 1), "routes": routes}
+
+
+def _plan(rng, rows):
+    """Sorteia a próxima operação: lista de (rota, método, caminho, corpo)"""
+    route = rng.choices([r for r, _ in TRAFFIC_MIX], weights=[w for _, w in TRAFFIC_MIX])[0]
+    if route == "POST /api/rsvps":
+        n = rng.randint(1, 10 ** 9)
+        body = {"name": f"Bench {n}", "email": f"bench{n}@example.com", "payment_type": "individual",
+                "selected_dish": rng.choice(_dish_names())}
+        return [(route, "POST", "/api/rsvps", body)] * POST_BURST
+    if route.endswith("/accept") or route.endswith("/reject"):
+        rsvp_id = rng.randint(1, max(rows, 1))
+        return [(route, "POST", route.replace("<id>", str(rsvp_id)).split(" ", 1)[1], None)]
+    method, path = route.split(" ", 1)
+    return [(route, method, path, None)]
+
+
+_DISHES = []
+
+
+def _dish_names():
+    if not _DISHES:
+        sys.path.insert(0, SRC)
+        from dishes import AVAILABLE_DISHES
+        _DISHES.extend(AVAILABLE_DISHES)
+    return _DISHES
+
+
+def _drive(send, rows, duration, concurrency, recorder):
+    deadline = time.perf_counter() + duration
+
+    def worker(seed_value):
+        rng = random.Random(seed_value)
+        while time.perf_counter() < deadline:
+            for route, method, path, body in _plan(rng, rows):
+                started = time.perf_counter()
+                ok, queries = send(method, path, body)
+                recorder.add(route, time.perf_counter() - started, ok, queries)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def run_inprocess(db_path, rows, duration, concurrency):
+    app = _load_app(db_path)
+    from sqlalchemy import event
+    from models.rsvp import db
+
+    local = threading.local()
+
+    def count_query(*_args):
+        local.queries = getattr(local, "queries", 0) + 1
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", count_query)
+
+    def send(method, path, body):
+        local.queries = 0
+        response = app.test_client().open(path, method=method, json=body)
+        return response.status_code < 500, local.queries
+
+    recorder = Recorder()
+    elapsed = _drive(send, rows, duration, concurrency, recorder)
+    return _summary(recorder, elapsed)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(port, workers, timeout=60):
+    """Espera o gunicorn responder (uma requisição por worker, para aquecer)"""
+    deadline = time.monotonic() + timeout
+    ready = 0
+    while ready < workers:
+        if time.monotonic() > deadline:
+            raise RuntimeError("gunicorn não subiu")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/api/stats")
+            if conn.getresponse().status == 200:
+                ready += 1
+            conn.close()
+        except OSError:
+            time.sleep(0.1)
+
+
+def _parse_metrics(text):
+    """{(métrica, "MÉTODO /rota"): valor} dos contadores de SQL e de requisições de um worker"""
+    values = defaultdict(float)
+    pid = None
+    for line in text.splitlines():
+        match = METRIC_LINE.match(line)
+        if not match:
+            continue
+        labels = dict(METRIC_LABEL.findall(match.group(2)))
+        pid = labels["pid"]
+        # /api/rsvps/<int:rsvp_id>/accept -> /api/rsvps/<id>/accept, como em TRAFFIC_MIX
+        route = re.sub(r"<[^>]*>", "<id>", labels["route"])
+        values[(match.group(1), f"{labels['method']} {route}")] += float(match.group(3))
+    return pid, values
+
+
+def _scrape_metrics(port, workers):
+    """{pid: contadores} de /api/metrics. Cada conexão cai em um worker: repete até ver todos."""
+    snapshots = {}
+    for _ in range(workers * 25):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        try:
+            conn.request("GET", "/api/metrics")
+            pid, values = _parse_metrics(conn.getresponse().read().decode())
+        finally:
+            conn.close()
+        if pid is not None:
+            snapshots[pid] = values
+        if len(snapshots) >= workers:
+            break
+    return snapshots
+
+
+def _sql_per_request(before, after):
+    """Consultas SQL por requisição de cada rota, somando a diferença de todos os workers"""
+    delta = defaultdict(float)
+    for pid, values in after.items():
+        previous = before.get(pid, {})
+        for key, value in values.items():
+            delta[key] += value - previous.get(key, 0.0)
+    result = {}
+    for (metric, route), requests in delta.items():
+        if metric == "flashback_http_requests_total" and requests > 0:
+            result[route] = round(delta[("flashback_sql_statements_total", route)] / requests, 2)
+    return result
+
+
+def run_gunicorn(db_path, rows, duration, concurrency, workers, threads):
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-k", "gthread", "--threads", str(threads),
+         "-b", f"127.0.0.1:{port}", "--log-level", "warning", "main:app"],
+        cwd=SRC, env=env,
+    )
+    try:
+        _wait_ready(port, workers)
+
+        local = threading.local()
+
+        def send(method, path, body):
+            conn = getattr(local, "conn", None)
+            if conn is None:
+                conn = local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            payload = json.dumps(body) if body is not None else None
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                return response.status < 500, None
+            except (OSError, http.client.HTTPException):
+                local.conn = None
+                return False, None
+
+        before = _scrape_metrics(port, workers)
+        recorder = Recorder()
+        elapsed = _drive(send, rows, duration, concurrency, recorder)
+        after = _scrape_metrics(port, workers)
+        if len(after) < workers:
+            print(f"/api/metrics: só {len(after)} de {workers} workers responderam; "
+                  "SQL por requisição é uma amostra", file=sys.stderr)
+        return _summary(recorder, elapsed, _sql_per_request(before, after))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+# -------------------------------------------------
+# Comparação com uma execução anterior
+# -------------------------------------------------
+def compare(current, baseline_path, threshold):
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)
+    previous = {(run["rows"], run["mode"]): run for run in baseline["runs"]}
+    regressions = []
+    for run in current["runs"]:
+        old = previous.get((run["rows"], run["mode"]))
+        if old is None:
+            continue
+        for route, metrics in run["routes"].items():
+            old_metrics = old["routes"].get(route)
+            if not old_metrics or not old_metrics["p95_ms"]:
+                continue
+            ratio = metrics["p95_ms"] / old_metrics["p95_ms"]
+            flag = "REGRESSÃO" if ratio > threshold else ""
+            print(f"{run['mode']:>9} {run['rows']:>7} {route:<30} p95 {old_metrics['p95_ms']:>8} -> "
+                  f"{metrics['p95_ms']:>8} ms ({ratio:.2f}x) {flag}")
+            if flag:
+                regressions.append((run["mode"], run["rows"], route))
+    return regressions
+
+
+def _child(args):
+    """Roda uma etapa em um processo novo (main.py monta o app no import)"""
+    cmd = [sys.executable, os.path.abspath(__file__)] + args
+    output = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1]) if output.strip() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--mode", choices=["inprocess", "gunicorn", "both"], default="both")
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos por execução")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--gunicorn-workers", type=int, default=4)
+    parser.add_argument("--gunicorn-threads", type=int, default=8)
+    parser.add_argument("--output", default="bench_api.json")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar o p95")
+    parser.add_argument("--threshold", type=float, default=1.2, help="razão de p95 considerada regressão")
+    parser.add_argument("--step", choices=["seed", "inprocess"], help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step == "seed":
+        seed(args.db, args.rows[0])
+        return 0
+    if args.step == "inprocess":
+        print(json.dumps(run_inprocess(args.db, args.rows[0], args.duration, args.concurrency)))
+        return 0
+
+    modes = ["inprocess", "gunicorn"] if args.mode == "both" else [args.mode]
+    result = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "gunicorn_workers": args.gunicorn_workers,
+            "gunicorn_threads": args.gunicorn_threads,
+        },
+        "runs": [],
+    }
+    for rows in args.rows:
+        for mode in modes:
+            db_path = os.path.join(tempfile.mkdtemp(prefix="flashback-bench-"), "bench.db")
+            print(f"semeando {rows} RSVPs ({mode})...", file=sys.stderr)
+            _child(["--step", "seed", "--db", db_path, "--rows", str(rows)])
+            if mode == "inprocess":
+                summary = _child(["--step", "inprocess", "--db", db_path, "--rows", str(rows),
+                                  "--duration", str(args.duration), "--concurrency", str(args.concurrency)])
+            else:
+                summary = run_gunicorn(db_path, rows, args.duration, args.concurrency,
+                                       args.gunicorn_workers, args.gunicorn_threads)
+            result["runs"].append({"rows": rows, "mode": mode, **summary})
+            print(f"{mode} {rows}: {summary['requests_per_s']} req/s", file=sys.stderr)
+
+    with open(args.output, "w") as fh:
+        json.dump(result, fh, indent=2)
+    print(f"resultados em {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        return 1 if compare(result, args.baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Rajada de RSVPs concorrentes em um único prato.
+
+Sobe o app de main.py em um SQLite novo, dispara N POST /api/rsvps em
+paralelo no mesmo prato e confere se o limite (max_count) foi respeitado.
+Com --hold cada convidado segura a vaga antes (POST /api/dishes/<id>/hold)
+e só envia o RSVP se conseguiu: envios recusados por lotação viram zero.
+
+    python backend_code/bench/bench_dish_reservation.py --requests 300 --workers 32 --max-count 50
+    python backend_code/bench/bench_dish_reservation.py --requests 300 --workers 32 --max-count 50 --hold
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+# Carga sintética vinda de um IP só: sem limite por cliente (requisições e holds) nem admissão
+os.environ.setdefault("RATE_LIMIT", "0")
+os.environ.setdefault("MAX_IN_FLIGHT", "0")
+os.environ.setdefault("DISH_HOLD_MAX_PER_CLIENT", "0")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--max-count", type=int, default=50)
+    parser.add_argument("--dish", default="Kibe")
+    parser.add_argument("--hold", action="store_true", help="Segura a vaga antes de enviar o RSVP")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="flashback-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    sys.path.insert(0, os.path.abspath(SRC))
+    from main import app
+    from models.rsvp import db, RSVP, DishCounter
+
+    with app.app_context():
+        db.session.execute(
+            db.update(DishCounter).where(DishCounter.dish_name == args.dish)
+            .values(max_count=args.max_count, current_count=0)
+        )
+        db.session.commit()
+        dish_id = db.session.scalar(db.select(DishCounter.id).where(DishCounter.dish_name == args.dish))
+
+    def post(i):
+        client = app.test_client()
+        data = {
+            "name": f"Convidado {i}",
+            "email": f"convidado{i}@example.com",
+            "selected_dish": args.dish,
+            "payment_type": "individual",
+        }
+        if args.hold:
+            hold = client.post(f"/api/dishes/{dish_id}/hold")
+            if hold.status_code != 201:
+                return "hold_full" if hold.status_code == 400 else hold.status_code
+            data["hold_token"] = hold.get_json()["data"]["token"]
+        response = client.post("/api/rsvps", json=data)
+        return response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        statuses = list(pool.map(post, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        counter = db.session.scalar(db.select(DishCounter).where(DishCounter.dish_name == args.dish))
+        rows = db.session.scalar(
+            db.select(db.func.count(RSVP.id)).where(RSVP.dish_id == counter.id)
+        )
+        current_count, max_count = counter.current_count, counter.max_count
+
+    result = {
+        "requests": args.requests,
+        "workers": args.workers,
+        "max_count": max_count,
+        "created": statuses.count(201),
+        "rejected_full": statuses.count(400),
+        "hold_full": statuses.count("hold_full"),
+        "errors": len(statuses) - statuses.count(201) - statuses.count(400) - statuses.count("hold_full"),
+        "counter": current_count,
+        "rsvp_rows": rows,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(args.requests / elapsed, 1),
+    }
+    result["cap_held"] = rows <= max_count and current_count == rows
+    print(json.dumps(result, indent=2))
+    return 0 if result["cap_held"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""Benchmark da listagem de RSVPs: caminho antigo x projeção de colunas.
+
+Para cada tamanho de base (--rows), semeia um SQLite novo e gera a lista
+inteira de RSVPs de três jeitos:
+
+  * orm:       objetos do ORM + RSVP.to_dict() + jsonify (caminho antigo);
+  * projected: SELECT só das colunas, tuplas + serializador rápido, em streaming;
+  * narrow:    o mesmo, pedindo só fields=id,name,payment_status.
+
+Mede tempo de CPU, tempo real e pico de memória (tracemalloc, em uma
+execução separada para não distorcer os tempos):
+
+    python backend_code/bench/bench_serialization.py --rows 10000 100000 --output bench_serialization.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.abspath(os.path.join(HERE, "..", "src"))
+SEED_CHUNK = 5000
+NARROW_FIELDS = ["id", "name", "payment_status"]
+
+
+def _load_app(db_path):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, SRC)
+    from main import app
+    return app
+
+
+def seed(app, rows):
+    from models.rsvp import db, RSVP, DishCounter
+    import eventscope
+
+    rng = random.Random(42)
+    start = datetime.utcnow() - timedelta(days=30)
+    with app.app_context():
+        event_id = eventscope.get(eventscope.DEFAULT_EVENT_SLUG).id
+        dishes = db.session.execute(db.select(DishCounter.id, DishCounter.dish_name)).all()
+        batch = []
+        for i in range(rows):
+            dish_id, dish_name = rng.choice(dishes)
+            batch.append({
+                "event_id": event_id, "name": f"Convidado {i}", "email": f"convidado{i}@example.com",
+                "phone": f"6199{i:07d}",
+                "guests": 1, "dish_id": dish_id, "selected_dish": dish_name, "payment_type": "individual",
+                "total_amount": 60.0, "payment_status": rng.choice(["pending", "confirmed", "rejected"]),
+                "created_at": start + timedelta(seconds=i), "updated_at": start + timedelta(seconds=i),
+                "notes": "",
+            })
+            if len(batch) == SEED_CHUNK:
+                db.session.execute(db.insert(RSVP), batch)
+                batch = []
+        if batch:
+            db.session.execute(db.insert(RSVP), batch)
+        db.session.commit()
+
+
+# -------------------------------------------------
+# Caminhos medidos (devolvem o número de bytes gerados)
+# -------------------------------------------------
+def path_orm(app):
+    from flask import jsonify
+    from models.rsvp import RSVP
+
+    with app.test_request_context():
+        rsvps = RSVP.query.order_by(RSVP.created_at.desc(), RSVP.id.desc()).all()
+        response = jsonify({"success": True, "data": [rsvp.to_dict() for rsvp in rsvps]})
+        size = len(response.get_data())
+    _reset_session(app)
+    return size
+
+
+def _path_projected(app, fields):
+    import projection
+    from models.rsvp import db, RSVP
+
+    with app.test_request_context():
+        query = projection.RsvpProjection(fields)
+        result = db.session.execute(
+            query.select().order_by(RSVP.created_at.desc(), RSVP.id.desc())
+        )
+
+        def batches():
+            while True:
+                rows = result.fetchmany(projection.STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                yield [query.to_dict(row) for row in rows]
+
+        # Consome o stream como o servidor faria (pedaço a pedaço, sem juntar)
+        size = sum(len(chunk) for chunk in projection.stream_list(batches(), lambda: {"has_more": False}))
+        result.close()
+    _reset_session(app)
+    return size
+
+
+def path_projected(app):
+    import projection
+    return _path_projected(app, list(projection.RSVP_FIELDS))
+
+
+def path_narrow(app):
+    return _path_projected(app, NARROW_FIELDS)
+
+
+PATHS = {"orm": path_orm, "projected": path_projected, "narrow": path_narrow}
+
+
+def _reset_session(app):
+    from models.rsvp import db
+    with app.app_context():
+        db.session.remove()
+
+
+def measure(app, fn, repeat):
+    fn(app)  # aquece caches do SQLite e do SQLAlchemy
+    cpu, wall = [], []
+    for _ in range(repeat):
+        cpu_started, wall_started = time.process_time(), time.perf_counter()
+        size = fn(app)
+        cpu.append(time.process_time() - cpu_started)
+        wall.append(time.perf_counter() - wall_started)
+    tracemalloc.start()
+    fn(app)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "cpu_ms": round(min(cpu) * 1000, 1),
+        "wall_ms": round(min(wall) * 1000, 1),
+        "peak_mb": round(peak / (1024 * 1024), 2),
+        "bytes": size,
+    }
+
+
+def run(rows, repeat):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="flashback-bench-"), "bench.db")
+    app = _load_app(db_path)
+    seed(app, rows)
+    import fastjson
+    return {
+        "rows": rows,
+        "serializer": "orjson" if fastjson.orjson is not None else "json",
+        **{name: measure(app, fn, repeat) for name, fn in PATHS.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_serialization.json")
+    parser.add_argument("--step", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step:
+        print(json.dumps(run(args.rows[0], args.repeat)))
+        return 0
+
+    result = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "runs": [],
+    }
+    for rows in args.rows:
+        print(f"{rows} RSVPs...", file=sys.stderr)
+        # Um processo por tamanho: o pico de memória de um não contamina o outro
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--step", "--rows", str(rows), "--repeat", str(args.repeat)],
+            check=True, stdout=subprocess.PIPE, text=True,
+        ).stdout
+        run_result = json.loads(output.strip().splitlines()[-1])
+        result["runs"].append(run_result)
+        for name in PATHS:
+            stats = run_result[name]
+            print(f"  {name:10s} cpu {stats['cpu_ms']:9.1f} ms  real {stats['wall_ms']:9.1f} ms  "
+                  f"pico {stats['peak_mb']:8.2f} MB  {stats['bytes']} bytes", file=sys.stderr)
+
+    with open(args.output, "w") as fh:
+        json.dump(result, fh, indent=2)
+    print(f"resultados em {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
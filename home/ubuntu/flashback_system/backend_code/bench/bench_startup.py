@@ -0,0 +1,216 @@
+"""Benchmark do tempo de inicialização do backend.
+
+Cada medição roda em um processo Python novo, como um worker recém-criado:
+
+  * cold:    banco vazio (cria tabelas, semeia pratos e snapshot);
+  * warm:    banco já no esquema atual (só confere schema_version);
+  * legacy:  banco já pronto, refazendo o trabalho do boot antigo
+             (schema.upgrade + seed_dishes + ensure_snapshot a cada boot);
+  * gunicorn: tempo até N workers responderem, com e sem preload_app.
+
+--latency-ms soma um atraso a cada consulta, para simular um Postgres
+remoto (Neon/Render), onde o custo do boot é dominado pelas idas e voltas:
+
+    python backend_code/bench/bench_startup.py --runs 5 --latency-ms 5 --output bench_startup.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.abspath(os.path.join(HERE, "..", "src"))
+
+
+# -------------------------------------------------
+# Etapas (rodam no processo filho)
+# -------------------------------------------------
+def _instrument(latency):
+    """Conta (e atrasa) as consultas de todas as engines"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    counter = {"queries": 0}
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _count(*_args):
+        counter["queries"] += 1
+        if latency:
+            time.sleep(latency)
+
+    return counter
+
+
+def step_boot(latency):
+    counter = _instrument(latency)
+    started = time.perf_counter()
+    sys.path.insert(0, SRC)
+    import main  # noqa: F401 - monta o app no import
+    return {"seconds": time.perf_counter() - started, "queries": counter["queries"]}
+
+
+def step_legacy(latency):
+    sys.path.insert(0, SRC)
+    import main
+    import dishes
+    import eventscope
+    import schema
+    import stats
+    import versioning
+    from models.rsvp import db
+
+    counter = _instrument(latency)
+    started = time.perf_counter()
+    with main.app.app_context():
+        schema.upgrade()
+        default_event = eventscope.get(eventscope.DEFAULT_EVENT_SLUG)
+        if dishes.seed_dishes(default_event):
+            versioning.bump(default_event.id)
+            db.session.commit()
+        for event_id in eventscope.all_ids():
+            stats.ensure_snapshot(event_id)
+    return {"seconds": time.perf_counter() - started, "queries": counter["queries"]}
+
+
+# -------------------------------------------------
+# Gunicorn
+# -------------------------------------------------
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _worker_pids(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("GET", "/api/metrics")
+        body = conn.getresponse().read().decode()
+    finally:
+        conn.close()
+    return set(re.findall(r'pid="(\d+)"', body))
+
+
+def run_gunicorn(db_path, workers, preload, timeout=120):
+    """Segundos até todos os workers responderem (pids distintos em /api/metrics)"""
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    conf = os.path.join(SRC, "gunicorn.conf.py")
+    if not preload:
+        fd, conf = tempfile.mkstemp(suffix=".py")
+        os.close(fd)
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", conf, "-w", str(workers), "--threads", "4",
+         "-b", f"127.0.0.1:{port}", "--log-level", "warning", "main:app"],
+        cwd=SRC, env=env,
+    )
+    try:
+        seen = set()
+        while len(seen) < workers:
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("gunicorn não subiu")
+            try:
+                seen |= _worker_pids(port)
+            except OSError:
+                time.sleep(0.02)
+        return time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        if not preload:
+            os.unlink(conf)
+
+
+# -------------------------------------------------
+# Orquestração
+# -------------------------------------------------
+def _child(step, db_path, latency_ms):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    cmd = [sys.executable, os.path.abspath(__file__), "--step", step, "--latency-ms", str(latency_ms)]
+    output = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, text=True, env=env).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _summary(samples):
+    seconds = [sample["seconds"] for sample in samples]
+    return {
+        "median_ms": round(statistics.median(seconds) * 1000, 1),
+        "min_ms": round(min(seconds) * 1000, 1),
+        "max_ms": round(max(seconds) * 1000, 1),
+        "queries": samples[-1]["queries"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="atraso por consulta (banco remoto)")
+    parser.add_argument("--gunicorn-workers", type=int, default=4, help="0 para pular o gunicorn")
+    parser.add_argument("--output", default="bench_startup.json")
+    parser.add_argument("--step", choices=["boot", "legacy"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000.0
+    if args.step == "boot":
+        print(json.dumps(step_boot(latency)))
+        return 0
+    if args.step == "legacy":
+        print(json.dumps(step_legacy(latency)))
+        return 0
+
+    result = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+            "latency_ms": args.latency_ms,
+        },
+    }
+    tmp = tempfile.mkdtemp(prefix="flashback-startup-")
+    cold = []
+    for i in range(args.runs):
+        cold.append(_child("boot", os.path.join(tmp, f"cold-{i}.db"), args.latency_ms))
+    warm_db = os.path.join(tmp, "cold-0.db")
+    warm = [_child("boot", warm_db, args.latency_ms) for _ in range(args.runs)]
+    legacy = [_child("legacy", warm_db, args.latency_ms) for _ in range(args.runs)]
+    result["cold"] = _summary(cold)
+    result["warm"] = _summary(warm)
+    # O boot antigo = import (sem DDL) + o trabalho de esquema que ele refazia sempre
+    result["legacy_warm"] = _summary([
+        {"seconds": w["seconds"] + l["seconds"], "queries": w["queries"] + l["queries"]}
+        for w, l in zip(warm, legacy)
+    ])
+
+    if args.gunicorn_workers:
+        result["gunicorn"] = {
+            "workers": args.gunicorn_workers,
+            "preload_s": round(run_gunicorn(warm_db, args.gunicorn_workers, preload=True), 3),
+            "no_preload_s": round(run_gunicorn(warm_db, args.gunicorn_workers, preload=False), 3),
+        }
+
+    for name in ("cold", "warm", "legacy_warm"):
+        summary = result[name]
+        print(f"{name:12s} {summary['median_ms']:8.1f} ms  {summary['queries']:3d} consultas", file=sys.stderr)
+    if "gunicorn" in result:
+        print(f"gunicorn     preload {result['gunicorn']['preload_s']} s, "
+              f"sem preload {result['gunicorn']['no_preload_s']} s", file=sys.stderr)
+
+    with open(args.output, "w") as fh:
+        json.dump(result, fh, indent=2)
+    print(f"resultados em {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
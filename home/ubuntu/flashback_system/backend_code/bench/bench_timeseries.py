@@ -0,0 +1,108 @@
+"""Série temporal: buckets pré-agregados x GROUP BY na tabela RSVP.
+
+Sobe o app de main.py em um SQLite novo, cresce a tabela até cada tamanho
+de --sizes (RSVPs espalhados por --days dias), monta os buckets
+(rollups.rebuild) e mede GET /api/stats/timeseries contra a mesma
+agregação por hora feita direto na tabela RSVP.
+
+    python backend_code/bench/bench_timeseries.py --sizes 10000 100000 --days 30 --output bench_timeseries.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+os.environ.setdefault("RATE_LIMIT", "0")
+os.environ.setdefault("MAX_IN_FLIGHT", "0")
+
+
+def _timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def _seed(db, RSVP, dish_ids, first, last, days):
+    rng = random.Random(last)
+    start = datetime.utcnow() - timedelta(days=days)
+    rows = []
+    for i in range(first, last):
+        created_at = start + timedelta(seconds=rng.randrange(days * 86400))
+        status = rng.choice(("pending", "confirmed", "rejected"))
+        rows.append({
+            "event_id": 1, "name": f"Convidado {i}", "email": f"c{i}@example.com", "phone": "",
+            "guests": 1, "dish_id": rng.choice(dish_ids), "selected_dish": "", "payment_type": "individual",
+            "total_amount": 60.0, "payment_status": status, "created_at": created_at, "updated_at": created_at,
+            "confirmed_at": created_at + timedelta(hours=1) if status == "confirmed" else None,
+        })
+        if len(rows) == 5000:
+            db.session.execute(db.insert(RSVP), rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(RSVP), rows)
+    db.session.commit()
+
+
+def run(app, db, size, days, repeat):
+    from models.rsvp import RSVP, DishCounter
+    import rollups
+
+    with app.app_context():
+        dish_ids = db.session.execute(db.select(DishCounter.id)).scalars().all()
+        seeded = db.session.scalar(db.select(db.func.count(RSVP.id)))
+        _seed(db, RSVP, dish_ids, seeded, size, days)
+        started = time.perf_counter()
+        buckets = rollups.rebuild(1)
+        db.session.commit()
+        rebuild_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        hour = db.func.strftime("%Y-%m-%d %H:00", RSVP.created_at)
+        group_by = db.select(hour, db.func.count(RSVP.id), db.func.sum(RSVP.guests)).where(
+            RSVP.event_id == 1).group_by(hour).order_by(hour)
+        scan_ms = _timed(lambda: db.session.execute(group_by).all(), repeat)
+
+    client = app.test_client()
+    return {
+        "rsvps": size,
+        "buckets": buckets,
+        "rebuild_ms": rebuild_ms,
+        "timeseries_hour_ms": _timed(lambda: client.get("/api/stats/timeseries?granularity=hour"), repeat),
+        "timeseries_day_ms": _timed(lambda: client.get("/api/stats/timeseries?granularity=day"), repeat),
+        "group_by_hour_ms": scan_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="bench_timeseries.json")
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp(prefix="flashback-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    sys.path.insert(0, os.path.abspath(SRC))
+    from main import app
+    from models.rsvp import db
+
+    results = [run(app, db, size, args.days, args.repeat) for size in sorted(args.sizes)]
+    for result in results:
+        print(f"{result['rsvps']:>8} RSVPs  {result['buckets']:>5} buckets  "
+              f"timeseries hora {result['timeseries_hour_ms']:>8.2f} ms  dia {result['timeseries_day_ms']:>7.2f} ms  "
+              f"GROUP BY {result['group_by_hour_ms']:>8.2f} ms  rebuild {result['rebuild_ms']:>8.1f} ms")
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"resultados em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Benchmark de escrita concorrente no SQLite: POST /api/rsvps em rajada.
+
+Vários processos (como workers do gunicorn), cada um com várias threads,
+criam RSVPs ao mesmo tempo no mesmo arquivo SQLite, em três modos:
+
+  * default: comportamento antigo (journal padrão, synchronous=FULL, BEGIN adiado);
+  * tuned:   WAL + synchronous=NORMAL + busy_timeout + BEGIN IMMEDIATE nas escritas;
+  * queue:   tuned + fila de escrita com group commit (WRITE_QUEUE=1).
+
+Mede RSVPs criados por segundo, latência p50/p95/p99 e erros (ex.: "database
+is locked"), e confere no fim se RSVPs, vagas e snapshot batem:
+
+    python backend_code/bench/bench_write_queue.py --processes 4 --threads 8 --requests 50 --output bench_write_queue.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.abspath(os.path.join(HERE, "..", "src"))
+# Carga sintética vinda de um IP só: sem limite por cliente nem admissão
+os.environ.setdefault("RATE_LIMIT", "0")
+os.environ.setdefault("MAX_IN_FLIGHT", "0")
+
+MODES = {
+    "default": {"SQLITE_TUNING": "0", "WRITE_QUEUE": "0"},
+    "tuned": {"SQLITE_TUNING": "1", "WRITE_QUEUE": "0"},
+    "queue": {"SQLITE_TUNING": "1", "WRITE_QUEUE": "1"},
+}
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def _load_app():
+    sys.path.insert(0, SRC)
+    from main import app
+    return app
+
+
+# -------------------------------------------------
+# Processo filho: prepara o banco ou dispara a rajada
+# -------------------------------------------------
+def step_prepare():
+    """Cria o banco e abre vagas de sobra (o teste é de escrita, não de limite)"""
+    app = _load_app()
+    from models.rsvp import db, DishCounter
+    with app.app_context():
+        db.session.execute(db.update(DishCounter).values(max_count=10 ** 9))
+        db.session.commit()
+    return {}
+
+
+def step_worker(threads, requests, start_at):
+    app = _load_app()
+    with app.app_context():
+        from models.rsvp import db, DishCounter
+        dish_ids = db.session.execute(db.select(DishCounter.id)).scalars().all()
+    latencies, statuses, errors = [], Counter(), Counter()
+    lock = threading.Lock()
+
+    def client(index):
+        http = app.test_client()
+        for i in range(requests):
+            payload = {
+                "name": f"Convidado {os.getpid()}-{index}-{i}", "email": f"c{os.getpid()}.{index}.{i}@example.com",
+                "payment_type": "individual", "guests": 1, "dish_id": dish_ids[(index + i) % len(dish_ids)],
+            }
+            started = time.perf_counter()
+            response = http.post("/api/rsvps", json=payload)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] += 1
+                if response.status_code >= 500:
+                    errors[(response.get_json() or {}).get("error", "")[:80]] += 1
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    time.sleep(max(start_at - time.time(), 0))
+    started = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    finished = time.time()
+    return {
+        "started": started, "finished": finished, "latencies": latencies,
+        "statuses": dict(statuses), "errors": dict(errors),
+    }
+
+
+def step_check():
+    app = _load_app()
+    from models.rsvp import db, RSVP, DishCounter, StatsSnapshot
+    import eventscope
+    with app.app_context():
+        rsvps = db.session.scalar(db.select(db.func.count(RSVP.id)))
+        reserved = db.session.scalar(db.select(db.func.sum(DishCounter.current_count)))
+        snapshot = db.session.get(StatsSnapshot, eventscope.get(eventscope.DEFAULT_EVENT_SLUG).id).total_rsvps
+    return {"rsvps": rsvps, "reserved": reserved, "snapshot": snapshot}
+
+
+# -------------------------------------------------
+# Processo pai
+# -------------------------------------------------
+def _child(env, *args):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *args],
+        check=True, stdout=subprocess.PIPE, text=True, env=env,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_mode(mode, args):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="flashback-bench-"), "bench.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", **MODES[mode])
+    _child(env, "--step", "prepare")
+
+    start_at = time.time() + args.warmup
+    procs = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--step", "worker", "--threads", str(args.threads),
+             "--requests", str(args.requests), "--start-at", str(start_at)],
+            stdout=subprocess.PIPE, text=True, env=env,
+        )
+        for _ in range(args.processes)
+    ]
+    results = []
+    for proc in procs:
+        output, _ = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"worker saiu com {proc.returncode}")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    latencies = [value for result in results for value in result["latencies"]]
+    statuses, errors = Counter(), Counter()
+    for result in results:
+        statuses.update({int(code): count for code, count in result["statuses"].items()})
+        errors.update(result["errors"])
+    elapsed = max(r["finished"] for r in results) - min(r["started"] for r in results)
+    created = statuses.get(201, 0)
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "created": created,
+        "failed": len(latencies) - created,
+        "rsvps_per_second": round(created / elapsed, 1) if elapsed else None,
+        "seconds": round(elapsed, 3),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "statuses": dict(statuses),
+        "errors": dict(errors),
+        "check": _child(env, "--step", "check"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=50, help="POSTs por thread")
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=list(MODES))
+    parser.add_argument("--warmup", type=float, default=3.0, help="segundos para os workers subirem")
+    parser.add_argument("--output", default="bench_write_queue.json")
+    parser.add_argument("--step", choices=["prepare", "worker", "check"], help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, default=0.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step == "prepare":
+        print(json.dumps(step_prepare()))
+        return 0
+    if args.step == "worker":
+        print(json.dumps(step_worker(args.threads, args.requests, args.start_at)))
+        return 0
+    if args.step == "check":
+        print(json.dumps(step_check()))
+        return 0
+
+    result = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processes": args.processes,
+            "threads": args.threads,
+            "requests_per_thread": args.requests,
+        },
+        "runs": [],
+    }
+    for mode in args.modes:
+        print(f"{mode}...", file=sys.stderr)
+        run = run_mode(mode, args)
+        result["runs"].append(run)
+        check = run["check"]
+        consistent = check["rsvps"] == check["reserved"] == check["snapshot"] == run["created"]
+        print(f"  {run['rsvps_per_second']:8.1f} RSVPs/s  p50 {run['p50_ms']:7.2f} ms  p95 {run['p95_ms']:8.2f} ms  "
+              f"p99 {run['p99_ms']:8.2f} ms  falhas {run['failed']}  consistente {consistent}", file=sys.stderr)
+        for error, count in run["errors"].items():
+            print(f"    {count}x {error}", file=sys.stderr)
+
+    with open(args.output, "w") as fh:
+        json.dump(result, fh, indent=2)
+    print(f"resultados em {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
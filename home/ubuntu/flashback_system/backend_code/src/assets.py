@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:  # Brotli é opcional: sem ele, só gzip
+    brotli = None
+
+# -------------------------------------------------
+# Assets estáticos pré-comprimidos (painel admin e index)
+# Na inicialização cada arquivo é lido uma vez, ganha um nome com o hash do
+# conteúdo (admin.3f2a….js) e versões gzip/brotli em memória. As páginas HTML
+# apontam para os nomes com hash, então CSS/JS podem ficar em cache por um
+# ano; o HTML é revalidado a cada acesso (304 quando nada mudou).
+# -------------------------------------------------
+ASSET_URL_PREFIX = "/assets/"
+IMMUTABLE_MAX_AGE = 31536000
+MIN_COMPRESS_BYTES = 256
+ASSET_FILES = ["admin.css", "admin.js"]
+PAGE_FILES = ["admin.html", "index.html"]
+_REFERENCE_RE = re.compile(re.escape(ASSET_URL_PREFIX) + r"([\w.-]+)")
+
+
+class Asset:
+    def __init__(self, name, data):
+        self.name = name
+        self.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.digest = hashlib.sha256(data).hexdigest()[:16]
+        stem, ext = os.path.splitext(name)
+        self.fingerprinted = f"{stem}.{self.digest}{ext}"
+        self.variants = {"identity": data}
+        if len(data) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(data, quality=11)
+
+    @property
+    def url(self):
+        return ASSET_URL_PREFIX + self.fingerprinted
+
+    def choose_encoding(self, accept_encodings):
+        """Menor variante aceita pelo cliente (br > gzip > sem compressão)"""
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accept_encodings[encoding] > 0:
+                return encoding
+        return "identity"
+
+    def response(self, immutable=False):
+        encoding = self.choose_encoding(request.accept_encodings)
+        response = Response(self.variants[encoding], mimetype=self.mimetype)
+        if encoding != "identity":
+            response.content_encoding = encoding
+        response.vary.add("Accept-Encoding")
+        response.set_etag(f"{self.digest}-{encoding}")
+        if immutable:
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+
+class AssetRegistry:
+    def __init__(self):
+        self.assets = {}        # nome lógico -> Asset
+        self.fingerprinted = {}  # nome com hash -> Asset
+
+    def add(self, name, data):
+        asset = Asset(name, data)
+        self.assets[name] = asset
+        self.fingerprinted[asset.fingerprinted] = asset
+        return asset
+
+    def rewrite(self, html):
+        """Troca /assets/<nome> pelo nome com hash nas páginas"""
+        def replace(match):
+            asset = self.assets.get(match.group(1))
+            return asset.url if asset is not None else match.group(0)
+        return _REFERENCE_RE.sub(replace, html)
+
+    def build(self, folder):
+        # Primeiro CSS/JS: as páginas precisam dos nomes com hash
+        for name in ASSET_FILES:
+            path = os.path.join(folder, name)
+            if os.path.exists(path):
+                with open(path, "rb") as fh:
+                    self.add(name, fh.read())
+        for name in PAGE_FILES:
+            path = os.path.join(folder, name)
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as fh:
+                    self.add(name, self.rewrite(fh.read()).encode("utf-8"))
+        return self
+
+
+def init_app(app):
+    app.extensions["assets"] = AssetRegistry().build(app.static_folder)
+
+
+def page(name):
+    """Asset de uma página HTML, ou None se o arquivo não existe"""
+    return current_app.extensions["assets"].assets.get(name)
+
+
+def send_page(name):
+    return current_app.extensions["assets"].assets[name].response()
+
+
+def send_asset(name):
+    """/assets/<nome>: com hash, cache imutável; pelo nome lógico, revalidado"""
+    registry = current_app.extensions["assets"]
+    asset = registry.fingerprinted.get(name)
+    if asset is not None:
+        return asset.response(immutable=True)
+    asset = registry.assets.get(name)
+    if asset is None or name in PAGE_FILES:
+        return None
+    return asset.response()
@@ -0,0 +1,140 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow é opcional: sem ele não há miniaturas
+    Image = None
+
+# -------------------------------------------------
+# Armazenamento de comprovantes (endereçado por conteúdo, em disco)
+# Cada arquivo é salvo como <BLOB_DIR>/<aa>/<bb>/<sha256>; o mesmo arquivo
+# enviado duas vezes ocupa espaço uma vez só. No banco fica só o hash.
+# -------------------------------------------------
+CHUNK_SIZE = 64 * 1024
+MAX_BLOB_BYTES = 10 * 1024 * 1024
+THUMBNAIL_SIZE = (160, 160)
+HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Assinaturas dos formatos aceitos nos comprovantes
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+]
+
+
+class BlobTooLarge(ValueError):
+    pass
+
+
+def is_valid_hash(value):
+    return bool(value) and HASH_RE.match(value) is not None
+
+
+def sniff_mimetype(head):
+    for signature, mimetype in _SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+class BlobStore:
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def thumbnail_path(self, digest):
+        return os.path.join(self.root, "thumbs", digest[:2], f"{digest}.jpg")
+
+    def exists(self, digest):
+        return is_valid_hash(digest) and os.path.exists(self.path(digest))
+
+    def save_stream(self, stream, max_bytes=MAX_BLOB_BYTES):
+        """Grava o conteúdo de um arquivo aos poucos, calculando o hash. Retorna (sha256, bytes)."""
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise BlobTooLarge(f"Arquivo maior que {max_bytes // (1024 * 1024)} MB")
+                    digest.update(chunk)
+                    out.write(chunk)
+            if size == 0:
+                raise ValueError("Arquivo vazio")
+            hexdigest = digest.hexdigest()
+            final_path = self.path(hexdigest)
+            if os.path.exists(final_path):
+                os.unlink(tmp_path)  # Já temos esse arquivo
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+            return hexdigest, size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def save_data_uri(self, value):
+        """Grava um comprovante inline ("data:...;base64,..." ou base64 puro). Retorna o hash."""
+        payload = value.split(",", 1)[1] if value.startswith("data:") else value
+        try:
+            raw = base64.b64decode(payload, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError("Comprovante em base64 inválido")
+        return self.save_stream(io.BytesIO(raw))[0]
+
+    def mimetype(self, digest):
+        with open(self.path(digest), "rb") as fh:
+            return sniff_mimetype(fh.read(16))
+
+    def thumbnail(self, digest):
+        """Caminho da miniatura JPEG (gerada na primeira vez). None se não for possível gerar."""
+        thumb_path = self.thumbnail_path(digest)
+        if os.path.exists(thumb_path):
+            return thumb_path
+        if Image is None or not self.mimetype(digest).startswith("image/"):
+            return None
+        try:
+            with Image.open(self.path(digest)) as image:
+                image.thumbnail(THUMBNAIL_SIZE)
+                os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(thumb_path), suffix=".jpg")
+                with os.fdopen(fd, "wb") as out:
+                    image.convert("RGB").save(out, "JPEG", quality=80)
+                os.replace(tmp_path, thumb_path)
+        except OSError:
+            return None
+        return thumb_path
+
+
+def looks_inline(value):
+    """Comprovante gravado direto na coluna (data URI ou base64 longo) em vez de URL"""
+    if not value:
+        return False
+    if value.startswith("data:"):
+        return True
+    return len(value) > 200 and not value.startswith(("http://", "https://"))
+
+
+_default_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database", "blobs")
+store = BlobStore(os.getenv("BLOB_DIR", "").strip() or _default_root)
@@ -0,0 +1,104 @@
+from datetime import datetime
+
+from models.rsvp import db, RSVP
+import changes
+import dishes
+import stats
+
+# -------------------------------------------------
+# Ações em lote do admin (aceitar / recusar / excluir vários RSVPs)
+# Uma transação: um SELECT dos RSVPs, um UPDATE/DELETE para todos, ajuste
+# das vagas agregado por prato e uma atualização do snapshot.
+# Vagas: todo RSVP que não está recusado ocupa uma vaga do seu prato.
+# -------------------------------------------------
+BULK_ACTIONS = ("accept", "reject", "delete")
+MAX_BULK_IDS = 500  # Abaixo do limite de parâmetros do SQLite antigo (999)
+
+_NEW_STATUS = {"accept": "confirmed", "reject": "rejected"}
+
+
+def _facts(row, status=None, confirmed_at=None):
+    if status is None:
+        status, confirmed_at = row.payment_status or "pending", row.confirmed_at
+    return stats.RsvpFacts(row.event_id, status, int(row.guests or 0), float(row.total_amount or 0), row.dish_id,
+                           row.created_at, confirmed_at)
+
+
+def apply(action, ids, event_id):
+    """Aplica a ação aos RSVPs do evento (ids de outros eventos: não encontrados). Não faz commit.
+
+    Retorna (resultados por id na ordem pedida, quantos RSVPs mudaram).
+    """
+    stmt = db.select(
+        RSVP.id, RSVP.event_id, RSVP.payment_status, RSVP.guests, RSVP.total_amount, RSVP.dish_id,
+        RSVP.created_at, RSVP.confirmed_at,
+    ).where(RSVP.id.in_(ids), RSVP.event_id == event_id).order_by(RSVP.id)
+    if db.engine.dialect.name != "sqlite":
+        stmt = stmt.with_for_update()  # Outro admin pode estar mexendo nas mesmas linhas
+    rows = {row.id: row for row in db.session.execute(stmt)}
+
+    results = {}
+    for rsvp_id in ids:
+        if rsvp_id not in rows:
+            results[rsvp_id] = {"id": rsvp_id, "success": False, "error": "RSVP não encontrado"}
+
+    if action == "delete":
+        changed = [rows[rsvp_id] for rsvp_id in ids if rsvp_id in rows]
+    else:
+        new_status = _NEW_STATUS[action]
+        changed = []
+        for rsvp_id in ids:
+            row = rows.get(rsvp_id)
+            if row is None:
+                continue
+            if row.payment_status == new_status:
+                results[rsvp_id] = {"id": rsvp_id, "success": True, "payment_status": new_status,
+                                    "unchanged": True}
+            else:
+                changed.append(row)
+
+    # Vagas, agregadas por prato
+    if action == "accept":
+        # Só RSVPs recusados voltam a ocupar vaga (UPDATE condicional por prato)
+        wanted = {}
+        for row in changed:
+            if row.payment_status == "rejected":
+                wanted.setdefault(row.dish_id, []).append(row.id)
+        full = set()
+        for dish_id, dish_ids in wanted.items():
+            granted = dishes.reserve_many(dish_id, len(dish_ids)) if dish_id is not None else len(dish_ids)
+            full.update(dish_ids[granted:])
+        for rsvp_id in full:
+            results[rsvp_id] = {"id": rsvp_id, "success": False, "error": "Prato não disponível (limite atingido)"}
+        changed = [row for row in changed if row.id not in full]
+    else:
+        released = {}
+        for row in changed:
+            if row.payment_status != "rejected":
+                released[row.dish_id] = released.get(row.dish_id, 0) + 1
+        dishes.release_many(released)
+
+    if not changed:
+        return [results[rsvp_id] for rsvp_id in ids], 0
+
+    changed_ids = [row.id for row in changed]
+    if action == "delete":
+        db.session.execute(db.delete(RSVP).where(RSVP.id.in_(changed_ids)),
+                           execution_options={"synchronize_session": False})
+        stats.apply_changes([(_facts(row), None) for row in changed])
+        changes.record_deletions(event_id, [(row.id, row.dish_id) for row in changed])
+        for rsvp_id in changed_ids:
+            results[rsvp_id] = {"id": rsvp_id, "success": True, "deleted": True}
+    else:
+        now = datetime.utcnow()
+        confirmed_at = now if new_status == "confirmed" else None
+        db.session.execute(
+            db.update(RSVP).where(RSVP.id.in_(changed_ids)).values(
+                payment_status=new_status, confirmed_at=confirmed_at, updated_at=now
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        stats.apply_changes([(_facts(row), _facts(row, new_status, confirmed_at)) for row in changed])
+        for rsvp_id in changed_ids:
+            results[rsvp_id] = {"id": rsvp_id, "success": True, "payment_status": new_status}
+    return [results[rsvp_id] for rsvp_id in ids], len(changed)
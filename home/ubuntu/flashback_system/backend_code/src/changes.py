@@ -0,0 +1,88 @@
+import base64
+from datetime import datetime, timedelta
+
+from models.rsvp import db, RSVP, RsvpTombstone
+import projection
+import versioning
+
+# -------------------------------------------------
+# Sincronização incremental do painel (/api/admin/changes?since=<cursor>)
+# O cursor guarda o instante da consulta e a versão dos dados. Na próxima
+# chamada: versão igual -> nada mudou (uma leitura por chave primária);
+# senão, RSVPs do evento com updated_at recente (ix_rsvp_event_updated_at) e
+# exclusões da tabela de tombstones. A janela volta CHANGE_OVERLAP no tempo
+# para pegar transações que gravaram updated_at antes e fizeram commit
+# depois; o painel aplica as mudanças de forma idempotente.
+# -------------------------------------------------
+CHANGE_OVERLAP = timedelta(seconds=5)
+TOMBSTONE_TTL = timedelta(days=7)
+MAX_CHANGES = 1000  # Mais que isso: o painel recarrega tudo
+PRUNE_EVERY = 100
+
+_recorded = 0
+
+
+def encode_cursor(moment, version):
+    raw = f"{moment.isoformat()}|{version}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        moment, version = raw.rsplit("|", 1)
+        return datetime.fromisoformat(moment), int(version)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor inválido")
+
+
+def record_deletions(event_id, deleted):
+    """Grava os tombstones na transação atual (sem commit). deleted: [(rsvp_id, dish_id)]"""
+    global _recorded
+    if not deleted:
+        return
+    now = datetime.utcnow()
+    db.session.execute(db.insert(RsvpTombstone), [
+        {"event_id": event_id, "rsvp_id": rsvp_id, "dish_id": dish_id, "deleted_at": now}
+        for rsvp_id, dish_id in deleted
+    ])
+    _recorded += 1
+    if _recorded % PRUNE_EVERY == 0:
+        db.session.execute(db.delete(RsvpTombstone).where(RsvpTombstone.deleted_at < now - TOMBSTONE_TTL))
+
+
+def since(cursor, event_id):
+    """Mudanças no evento desde o cursor (None: só o cursor atual, o painel carrega a lista inteira).
+
+    Devolve {"cursor", "reset", "changed", "upserted", "deleted"}.
+    """
+    now = datetime.utcnow()
+    version = versioning.current(event_id)[0]
+    result = {"cursor": encode_cursor(now, version), "reset": False, "changed": False,
+              "upserted": [], "deleted": []}
+    if cursor is None:
+        result.update(reset=True, changed=True)
+        return result
+    moment, seen_version = decode_cursor(cursor)
+    if seen_version == version:
+        return result
+    if moment < now - TOMBSTONE_TTL:
+        # Tombstones dessa época já podem ter sido apagados
+        result.update(reset=True, changed=True)
+        return result
+
+    window = moment - CHANGE_OVERLAP
+    query = projection.RsvpProjection(list(projection.RSVP_FIELDS))
+    rows = db.session.execute(
+        query.select().where(RSVP.event_id == event_id, RSVP.updated_at >= window).order_by(
+            RSVP.updated_at).limit(MAX_CHANGES + 1)
+    ).all()
+    deleted = db.session.execute(
+        db.select(RsvpTombstone.rsvp_id).where(RsvpTombstone.event_id == event_id, RsvpTombstone.deleted_at >= window)
+        .order_by(RsvpTombstone.deleted_at).limit(MAX_CHANGES + 1)
+    ).scalars().all()
+    if len(rows) > MAX_CHANGES or len(deleted) > MAX_CHANGES:
+        result.update(reset=True, changed=True)
+        return result
+    result.update(changed=True, upserted=[query.to_dict(row) for row in rows], deleted=list(dict.fromkeys(deleted)))
+    return result
@@ -0,0 +1,207 @@
+import threading
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models.rsvp import db, DishCounter
+
+# Cardápio padrão (evento padrão e create-event sem --menu)
+AVAILABLE_DISHES = [
+    "Almôndegas com mandioca",
+    "Torresmo",
+    "Calabresa frita",
+    "Batata frita",
+    "Carne de sol frita",
+    "Caldos",
+    "Pastéis",
+    "Churrasquinho",
+    "Frango a passarinho",
+    "Linguiça acebolada",
+    "Cachorro quente",
+    "Mandioca frita",
+    "Frios (mussarela, presunto, mortadela, ovos de codorna, azeitona, salsicha, palmito, salaminho)",
+    "Bolinho de arroz",
+    "Bolinho de bacalhau",
+    "Camarão",
+    "Tilápia frita",
+    "Kibe"
+]
+DEFAULT_MAX_COUNT = 7
+DISH_FIELDS = ("id", "dish_name", "current_count", "held_count", "max_count", "available")  # Mesmos de DishCounter.to_dict()
+
+_INSERT_IGNORE = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def seed_dishes(event, names=None):
+    """Cria os contadores que faltam no cardápio do evento em um único INSERT idempotente. Não faz commit.
+
+    event: eventscope.EventConfig; names: pratos (padrão AVAILABLE_DISHES).
+    Retorna quantos pratos foram criados.
+    """
+    names = AVAILABLE_DISHES if names is None else names
+    existing = set(db.session.scalars(db.select(DishCounter.dish_name).where(DishCounter.event_id == event.id)))
+    rows = [
+        {"event_id": event.id, "dish_name": dish, "current_count": 0, "max_count": event.default_max_count}
+        for dish in dict.fromkeys(names) if dish not in existing
+    ]
+    if not rows:
+        return 0
+    insert = _INSERT_IGNORE.get(db.engine.dialect.name)
+    if insert is not None:
+        # Outro worker pode estar semeando ao mesmo tempo
+        stmt = insert(DishCounter).on_conflict_do_nothing(index_elements=["event_id", "dish_name"])
+    else:
+        stmt = db.insert(DishCounter)
+    db.session.execute(stmt, rows)
+    return len(rows)
+
+
+# -------------------------------------------------
+# Cache em processo da lista de pratos, por evento
+# A chave é a versão dos dados (versioning): toda rota de escrita incrementa
+# a versão, o que invalida o cache em todos os workers.
+# -------------------------------------------------
+_cache_lock = threading.Lock()
+_cache = {}  # event_id -> (versão, lista de pratos)
+
+
+def dish_list(event_id, version):
+    """Status dos pratos do evento, do cache se a versão não mudou"""
+    cached_version, cached = _cache.get(event_id, (None, None))
+    if cached is not None and cached_version == version:
+        return cached
+    with _cache_lock:
+        # Só as colunas, como tuplas (sem objetos do ORM)
+        rows = db.session.execute(
+            db.select(DishCounter.id, DishCounter.dish_name, DishCounter.current_count, DishCounter.held_count,
+                      DishCounter.max_count)
+            .where(DishCounter.event_id == event_id)
+            .order_by(DishCounter.id)
+        ).all()
+        data = [
+            {"id": dish_id, "dish_name": dish_name, "current_count": current_count, "held_count": held_count,
+             "max_count": max_count, "available": current_count + held_count < max_count}
+            for dish_id, dish_name, current_count, held_count, max_count in rows
+        ]
+        _cache[event_id] = (version, data)
+    return data
+
+
+def lookup(event_id, dish_id=None, dish_name=None):
+    """(id, dish_name) do prato do evento pelo id ou, para clientes antigos, pelo nome. None se não existe."""
+    stmt = db.select(DishCounter.id, DishCounter.dish_name).where(DishCounter.event_id == event_id)
+    if dish_id not in (None, ""):
+        try:
+            stmt = stmt.where(DishCounter.id == int(dish_id))
+        except (TypeError, ValueError):
+            return None
+    elif dish_name:
+        stmt = stmt.where(DishCounter.dish_name == dish_name)
+    else:
+        return None
+    return db.session.execute(stmt).first()
+
+
+# -------------------------------------------------
+# Reserva atômica de vagas
+# Um único UPDATE condicional: o banco garante o limite mesmo com vários
+# workers disputando o mesmo prato, sem lock explícito de linha.
+# Vagas seguradas (held_count, holds.py) contam no limite.
+# -------------------------------------------------
+def reserve(dish_id):
+    """Ocupa uma vaga do prato. Retorna False se o prato está lotado. Não faz commit.
+
+    O prato precisa existir (lookup): pratos novos só entram pela lista/seed_dishes.
+    """
+    result = db.session.execute(
+        db.update(DishCounter)
+        .where(DishCounter.id == dish_id,
+               DishCounter.current_count + DishCounter.held_count < DishCounter.max_count)
+        .values(current_count=DishCounter.current_count + 1)
+    )
+    return result.rowcount == 1
+
+
+def release(dish_id):
+    """Libera uma vaga do prato (sem deixar o contador negativo). Não faz commit."""
+    db.session.execute(
+        db.update(DishCounter)
+        .where(DishCounter.id == dish_id, DishCounter.current_count > 0)
+        .values(current_count=DishCounter.current_count - 1)
+    )
+
+
+def reserve_many(dish_id, count):
+    """Ocupa até `count` vagas do prato de uma vez. Retorna quantas conseguiu. Não faz commit.
+
+    Usado na importação em lote: um UPDATE condicional por prato e por lote.
+    """
+    wanted = count
+    while wanted > 0:
+        result = db.session.execute(
+            db.update(DishCounter)
+            .where(DishCounter.id == dish_id,
+                   DishCounter.current_count + DishCounter.held_count + wanted <= DishCounter.max_count)
+            .values(current_count=DishCounter.current_count + wanted)
+        )
+        if result.rowcount == 1:
+            return wanted
+        # Não cabem todas: tenta de novo com o que sobrou (outro worker pode ter ocupado vagas)
+        free = db.session.execute(
+            db.select(DishCounter.max_count - DishCounter.current_count - DishCounter.held_count)
+            .where(DishCounter.id == dish_id)
+        ).scalar()
+        if not free or free <= 0:
+            return 0
+        wanted = min(wanted, free)
+    return 0
+
+
+def release_many(counts):
+    """Libera vagas de vários pratos em um único UPDATE ({dish_id: quantidade}). Não faz commit."""
+    counts = {dish_id: count for dish_id, count in counts.items() if dish_id is not None and count > 0}
+    if not counts:
+        return
+    delta = db.case(counts, value=DishCounter.id, else_=0)
+    db.session.execute(
+        db.update(DishCounter)
+        .where(DishCounter.id.in_(counts))
+        .values(current_count=db.case((DishCounter.current_count > delta, DishCounter.current_count - delta),
+                                      else_=0))
+    )
+
+
+def hold(dish_id):
+    """Segura uma vaga livre do prato (held_count). Retorna False se o prato está lotado. Não faz commit."""
+    result = db.session.execute(
+        db.update(DishCounter)
+        .where(DishCounter.id == dish_id,
+               DishCounter.current_count + DishCounter.held_count < DishCounter.max_count)
+        .values(held_count=DishCounter.held_count + 1)
+    )
+    return result.rowcount == 1
+
+
+def claim_hold(dish_id):
+    """Transforma uma vaga segurada em ocupada (sem disputar o limite de novo). Não faz commit."""
+    db.session.execute(
+        db.update(DishCounter)
+        .where(DishCounter.id == dish_id)
+        .values(current_count=DishCounter.current_count + 1,
+                held_count=db.case((DishCounter.held_count > 0, DishCounter.held_count - 1), else_=0))
+    )
+
+
+def release_holds(counts):
+    """Libera vagas seguradas de vários pratos em um único UPDATE ({dish_id: quantidade}). Não faz commit."""
+    counts = {dish_id: count for dish_id, count in counts.items() if count > 0}
+    if not counts:
+        return
+    delta = db.case(counts, value=DishCounter.id, else_=0)
+    db.session.execute(
+        db.update(DishCounter)
+        .where(DishCounter.id.in_(counts))
+        .values(held_count=db.case((DishCounter.held_count > delta, DishCounter.held_count - delta), else_=0))
+    )
@@ -0,0 +1,165 @@
+import json
+import os
+import queue
+import threading
+import time
+
+# -------------------------------------------------
+# Eventos em tempo real (Server-Sent Events)
+# As rotas de escrita publicam aqui depois do commit e cada conexão
+# aberta em /api/events recebe a mudança com stats e pratos atualizados.
+# O broker é por processo: com gunicorn use workers com threads
+# (ex.: gunicorn -k gthread --threads 50 main:app). Mudanças feitas por
+# outros workers são detectadas pelo watcher, que lê a versão dos dados
+# a cada VERSION_POLL_SECONDS enquanto houver clientes conectados.
+# Um broker por evento (broker_for): cada conexão só recebe o seu evento.
+# Cada stream aberto prende uma thread do worker por até MAX_STREAM_SECONDS.
+# SSE_MAX_STREAMS limita os streams por processo, somando todos os eventos
+# (padrão: GUNICORN_THREADS - SSE_RESERVED_THREADS, para sobrar threads às
+# outras rotas); acima do limite, /api/events responde 503 com Retry-After e
+# o site e o painel seguem no polling. 0 desliga o limite.
+# -------------------------------------------------
+HEARTBEAT_SECONDS = 15
+VERSION_POLL_SECONDS = 2
+# Fecha a conexão de tempos em tempos; o EventSource reconecta sozinho
+MAX_STREAM_SECONDS = 300
+RETRY_MS = 3000
+SSE_RESERVED_THREADS = 10
+MAX_STREAMS = int(os.getenv(
+    "SSE_MAX_STREAMS", max(1, int(os.getenv("GUNICORN_THREADS", "50")) - SSE_RESERVED_THREADS)
+))
+STREAMS_FULL_RETRY_SECONDS = 30
+
+
+class StreamsFull(Exception):
+    pass
+
+
+_streams_lock = threading.Lock()
+_open_streams = 0
+
+
+def _take_stream():
+    global _open_streams
+    with _streams_lock:
+        if MAX_STREAMS > 0 and _open_streams >= MAX_STREAMS:
+            raise StreamsFull(f"Limite de {MAX_STREAMS} streams abertos neste processo")
+        _open_streams += 1
+
+
+def _release_stream():
+    global _open_streams
+    with _streams_lock:
+        _open_streams -= 1
+
+
+def format_event(event, data):
+    """Serializa uma mensagem no formato text/event-stream"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class ChangeBroker:
+    """Distribui mensagens SSE para as conexões abertas neste processo"""
+
+    def __init__(self, max_queue=16):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._max_queue = max_queue
+        self._version = None
+        self._watcher = None
+
+    @property
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self):
+        """Inscreve uma conexão. StreamsFull se o processo já está no limite de streams."""
+        _take_stream()
+        q = queue.Queue(maxsize=self._max_queue)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            if q not in self._subscribers:
+                return
+            self._subscribers.discard(q)
+        _release_stream()
+
+    def note_version(self, version):
+        """Registra a última versão dos dados já publicada por este processo"""
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._version = version
+
+    def watch(self, app, read_version, build, interval=VERSION_POLL_SECONDS):
+        """Inicia (se preciso) a thread que publica mudanças de outros workers"""
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._watcher = threading.Thread(
+                target=self._watch_loop, args=(app, read_version, build, interval),
+                name="sse-version-watcher", daemon=True
+            )
+        self._watcher.start()
+
+    def _watch_loop(self, app, read_version, build, interval):
+        try:
+            while self._subscribers:
+                time.sleep(interval)
+                with app.app_context():
+                    version = read_version()
+                    if self._version is not None and version > self._version:
+                        self.publish("change", build)
+                    self.note_version(version)
+        finally:
+            with self._lock:
+                self._watcher = None
+
+    def publish(self, event, build):
+        """Publica uma mudança; build() monta os dados e só roda se houver ouvintes"""
+        if not self._subscribers:
+            return
+        message = format_event(event, build())
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # Cliente lento: descarta a mensagem mais antiga, a nova já traz o estado completo
+                try:
+                    q.get_nowait()
+                    q.put_nowait(message)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def stream(self, q, first_message=None):
+        """Gerador da resposta SSE de um cliente inscrito"""
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            if first_message:
+                yield first_message
+            deadline = time.monotonic() + MAX_STREAM_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    yield q.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(q)
+
+
+_brokers_lock = threading.Lock()
+_brokers = {}  # event_id -> ChangeBroker
+
+
+def broker_for(event_id):
+    """Broker das conexões de /api/events de um evento"""
+    broker = _brokers.get(event_id)
+    if broker is None:
+        with _brokers_lock:
+            broker = _brokers.setdefault(event_id, ChangeBroker())
+    return broker
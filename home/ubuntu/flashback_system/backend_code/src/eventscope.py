@@ -0,0 +1,110 @@
+import os
+import threading
+from dataclasses import dataclass
+
+from flask import g, jsonify, request
+
+from models.rsvp import db, Event
+import dishes
+
+# -------------------------------------------------
+# Vários eventos no mesmo backend
+# Cada rota atende o evento de ?event=<slug> (sem o parâmetro: DEFAULT_EVENT).
+# A config do evento (preços, vagas padrão) é lida do banco uma vez por
+# processo e fica em cache; o cardápio são as linhas de dish_counter do
+# evento (cache por versão em dishes.dish_list). Eventos são criados pelo
+# comando flask rsvp create-event; mudar preços de um evento existente
+# pede reinício dos workers.
+# -------------------------------------------------
+QUERY_ARG = "event"
+DEFAULT_EVENT_SLUG = os.getenv("DEFAULT_EVENT", "flashback")
+DEFAULT_EVENT_NAME = "Flashback"
+DEFAULT_PRICE_INDIVIDUAL = 60.0
+DEFAULT_PRICE_COUPLE = 100.0
+
+
+class UnknownEvent(LookupError):
+    pass
+
+
+@dataclass(frozen=True)
+class EventConfig:
+    id: int
+    slug: str
+    name: str
+    price_individual: float
+    price_couple: float
+    default_max_count: int
+
+    def total_amount(self, payment_type, guests):
+        """Valor do RSVP: por pessoa (individual) ou fixo (casal)"""
+        if payment_type == "individual":
+            return guests * self.price_individual
+        return self.price_couple
+
+    def to_dict(self):
+        return {"id": self.id, "slug": self.slug, "name": self.name,
+                "price_individual": self.price_individual, "price_couple": self.price_couple,
+                "default_max_count": self.default_max_count}
+
+
+_lock = threading.Lock()
+_cache = {}  # slug -> EventConfig
+
+
+def default_values():
+    """Colunas do evento padrão (criado pelo schema.upgrade)"""
+    return {"slug": DEFAULT_EVENT_SLUG, "name": DEFAULT_EVENT_NAME, "price_individual": DEFAULT_PRICE_INDIVIDUAL,
+            "price_couple": DEFAULT_PRICE_COUPLE, "default_max_count": dishes.DEFAULT_MAX_COUNT}
+
+
+def get(slug):
+    """Config do evento pelo slug (do cache; na primeira vez, do banco). UnknownEvent se não existe."""
+    config = _cache.get(slug)
+    if config is not None:
+        return config
+    row = db.session.execute(
+        db.select(Event.id, Event.slug, Event.name, Event.price_individual, Event.price_couple,
+                  Event.default_max_count).where(Event.slug == slug)
+    ).first()
+    if row is None:
+        raise UnknownEvent(f"Evento desconhecido: {slug}")
+    config = EventConfig(*row)
+    with _lock:
+        _cache[slug] = config
+    return config
+
+
+def all_ids():
+    return db.session.execute(db.select(Event.id).order_by(Event.id)).scalars().all()
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+def current():
+    """Evento da requisição (?event=<slug> ou o padrão)"""
+    if "event" not in g:
+        g.event = get(request.args.get(QUERY_ARG) or DEFAULT_EVENT_SLUG)
+    return g.event
+
+
+def before_request():
+    """Resolve o evento antes da rota (404 se o slug não existe)"""
+    try:
+        current()
+    except UnknownEvent as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+
+
+def create(slug, name, price_individual=DEFAULT_PRICE_INDIVIDUAL, price_couple=DEFAULT_PRICE_COUPLE,
+           default_max_count=dishes.DEFAULT_MAX_COUNT):
+    """Cria o evento (sem commit) e devolve a config"""
+    event = Event(slug=slug, name=name, price_individual=price_individual, price_couple=price_couple,
+                  default_max_count=default_max_count)
+    db.session.add(event)
+    db.session.flush()
+    return EventConfig(event.id, event.slug, event.name, event.price_individual, event.price_couple,
+                       event.default_max_count)
@@ -0,0 +1,38 @@
+import json
+from datetime import date, datetime
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele, json da biblioteca padrão
+    orjson = None
+
+# -------------------------------------------------
+# Serialização JSON rápida para as rotas de leitura
+# orjson serializa datetime direto (mesmo formato de isoformat()) e é
+# várias vezes mais rápido que o json da stdlib usado pelo jsonify.
+# -------------------------------------------------
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+if orjson is not None:
+    def dumps(value):
+        """Serializa para bytes (UTF-8, sem espaços)"""
+        return orjson.dumps(value, default=_default)
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_default)
+
+    def dumps(value):
+        """Serializa para bytes (UTF-8, sem espaços)"""
+        return _encoder.encode(value).encode("utf-8")
+
+
+def response(payload, status=200):
+    """Equivalente a jsonify(payload), com o serializador rápido"""
+    return Response(dumps(payload), status=status, mimetype="application/json")
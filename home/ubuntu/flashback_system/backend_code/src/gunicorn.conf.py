@@ -0,0 +1,23 @@
+import os
+
+# -------------------------------------------------
+# Configuração do gunicorn (lida automaticamente quando iniciado em src/:
+# gunicorn main:app). O número de workers vem de WEB_CONCURRENCY e a porta
+# de PORT (padrões do gunicorn, definidos pelo Render).
+# -------------------------------------------------
+
+# O app (e a checagem do esquema) é carregado uma vez no mestre e os workers
+# herdam tudo via fork: o boot de cada worker não repete imports nem consultas
+preload_app = True
+
+# SSE (/api/events) mantém uma conexão aberta por cliente: workers com threads.
+# Até GUNICORN_THREADS - 10 streams por worker (SSE_MAX_STREAMS, events.py);
+# as threads restantes ficam para as outras rotas
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "50"))
+
+
+def post_fork(server, worker):
+    # O pool de conexões do mestre não pode ser compartilhado entre processos
+    from main import dispose_engines
+    dispose_engines(server.app.wsgi())
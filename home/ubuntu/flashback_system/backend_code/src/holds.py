@@ -0,0 +1,181 @@
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import request
+
+from models.rsvp import db, DishHold
+import dishes
+import versioning
+
+# -------------------------------------------------
+# Vagas seguradas durante o pagamento (PIX)
+# Ao escolher o prato, o convite segura uma vaga (POST /api/dishes/<id>/hold)
+# e recebe um token válido por DISH_HOLD_TTL_SECONDS (padrão 15 min). O
+# POST /api/rsvps com hold_token transforma essa vaga em ocupada, sem
+# disputar o prato de novo. As vagas seguradas ficam em
+# dish_counter.held_count e contam no limite, então /api/dishes já mostra o
+# prato lotado enquanto os outros convidados ainda estão pagando.
+# Holds vencidos são apagados em lote pelo índice de expires_at (sweep), sem
+# depender de um processo à parte: antes de cada novo hold (de qualquer
+# prato), quando um prato parece lotado e nas leituras da disponibilidade
+# (expire_due: /api/dishes, /api/events e o watcher do SSE), no máximo uma
+# vez a cada EXPIRE_CHECK_SECONDS por processo. O comando
+# flask rsvp sweep-holds --every 60 continua disponível.
+# Cada cliente (IP) tem no máximo DISH_HOLD_MAX_PER_CLIENT holds ativos por
+# evento (padrão 2): um script não tira pratos do cardápio segurando vagas.
+# Quem passa do limite continua podendo enviar o RSVP sem hold.
+# -------------------------------------------------
+TTL = timedelta(seconds=int(os.getenv("DISH_HOLD_TTL_SECONDS", "900")))
+SWEEP_BATCH_SIZE = 500
+MAX_PER_CLIENT = int(os.getenv("DISH_HOLD_MAX_PER_CLIENT", "2"))
+EXPIRE_CHECK_SECONDS = 1.0
+EXPIRE_ON = {"rsvp.get_dish_status", "rsvp.stream_events"}  # Rotas que mostram a disponibilidade
+
+_expire_lock = threading.Lock()
+_next_expire_check = 0.0
+
+
+class TooManyHolds(Exception):
+    pass
+
+
+def active_count(event_id, client):
+    """Holds ainda válidos do cliente no evento"""
+    return db.session.scalar(
+        db.select(db.func.count(DishHold.id)).where(DishHold.event_id == event_id, DishHold.client == client,
+                                                   DishHold.expires_at > datetime.utcnow())
+    )
+
+
+def create(event_id, dish_id, client=None):
+    """Segura uma vaga do prato. Retorna o DishHold, ou None se o prato está lotado. Não faz commit.
+
+    TooManyHolds se o cliente já tem MAX_PER_CLIENT holds ativos no evento.
+    """
+    if client is not None and MAX_PER_CLIENT > 0 and active_count(event_id, client) >= MAX_PER_CLIENT:
+        raise TooManyHolds(f"Limite de {MAX_PER_CLIENT} vagas seguradas ao mesmo tempo; "
+                           "devolva uma (replace) ou envie o RSVP sem segurar a vaga")
+    sweep()  # Holds vencidos de todos os pratos, não só deste
+    if not dishes.hold(dish_id):
+        return None
+    now = datetime.utcnow()
+    hold = DishHold(token=secrets.token_urlsafe(16), event_id=event_id, dish_id=dish_id,
+                    expires_at=now + TTL, client=client, created_at=now)
+    db.session.add(hold)
+    db.session.flush()
+    versioning.bump(event_id)
+    return hold
+
+
+def release(token, event_id):
+    """Devolve a vaga do hold (troca de prato, desistência). Retorna False se ele não existe mais. Não faz commit."""
+    dish_id = db.session.scalar(
+        db.select(DishHold.dish_id).where(DishHold.token == token, DishHold.event_id == event_id)
+    )
+    if dish_id is None:
+        return False
+    # rowcount: uma limpeza simultânea pode ter apagado o mesmo hold
+    deleted = db.session.execute(
+        db.delete(DishHold).where(DishHold.token == token, DishHold.event_id == event_id)
+    ).rowcount
+    if not deleted:
+        return False
+    dishes.release_holds({dish_id: 1})
+    versioning.bump(event_id)
+    return True
+
+
+def reserve(event_id, dish_id, token=None):
+    """Ocupa uma vaga do prato para um RSVP novo. Não faz commit.
+
+    Com um token válido para o prato, usa a vaga segurada; senão disputa uma
+    vaga livre (limpando holds vencidos se o prato parecer lotado).
+    Retorna False se o prato está lotado.
+    """
+    if token:
+        consumed = db.session.execute(
+            db.delete(DishHold).where(DishHold.token == token, DishHold.event_id == event_id,
+                                      DishHold.dish_id == dish_id, DishHold.expires_at > datetime.utcnow())
+        ).rowcount
+        if consumed:
+            dishes.claim_hold(dish_id)
+            return True
+    if dishes.reserve(dish_id):
+        return True
+    return bool(sweep()) and dishes.reserve(dish_id)
+
+
+def sweep(limit=SWEEP_BATCH_SIZE):
+    """Apaga até `limit` holds vencidos e devolve as vagas num único UPDATE. Não faz commit.
+
+    Retorna quantos holds foram apagados.
+    """
+    expired = db.select(DishHold.id, DishHold.dish_id, DishHold.event_id).where(DishHold.expires_at <= datetime.utcnow()) \
+        .order_by(DishHold.expires_at).limit(limit)
+    if db.engine.dialect.delete_returning:
+        # Só os holds que esta transação apagou (um consumo simultâneo pode ter levado algum)
+        swept = db.session.execute(
+            db.delete(DishHold).where(DishHold.id.in_(expired.with_only_columns(DishHold.id).scalar_subquery()))
+            .returning(DishHold.dish_id, DishHold.event_id)
+        ).all()
+    else:
+        swept = [
+            (dish_id, event_id) for hold_id, dish_id, event_id in db.session.execute(expired).all()
+            if db.session.execute(db.delete(DishHold).where(DishHold.id == hold_id)).rowcount
+        ]
+    if not swept:
+        return 0
+    counts = {}
+    for dish_id, _event_id in swept:
+        counts[dish_id] = counts.get(dish_id, 0) + 1
+    dishes.release_holds(counts)
+    for event_id in sorted({event_id for _dish_id, event_id in swept}):
+        versioning.bump(event_id)
+    return len(swept)
+
+
+def expire_due():
+    """Limpa os holds vencidos se houver algum, no máximo uma vez a cada EXPIRE_CHECK_SECONDS
+    por processo. Faz commit. Retorna quantos holds foram apagados.
+
+    Chamado antes das leituras da disponibilidade: sem isso, um prato com holds
+    vencidos continua lotado (e o ETag não muda) até alguém tentar segurá-lo.
+    """
+    global _next_expire_check
+    now = time.monotonic()
+    with _expire_lock:
+        if now < _next_expire_check:
+            return 0
+        _next_expire_check = now + EXPIRE_CHECK_SECONDS
+    # Pelo índice de expires_at: sem holds vencidos, uma leitura e nada mais
+    if db.session.scalar(db.select(DishHold.id).where(DishHold.expires_at <= datetime.utcnow()).limit(1)) is None:
+        return 0
+    swept = sweep()
+    db.session.commit()
+    return swept
+
+
+def before_request():
+    """Hook do rsvp_bp: expire_due() antes das rotas que mostram a disponibilidade dos pratos"""
+    if request.endpoint not in EXPIRE_ON:
+        return None
+    try:
+        expire_due()
+    except Exception:
+        # A leitura segue com os contadores atuais; a próxima tenta de novo
+        db.session.rollback()
+    return None
+
+
+def sweep_all():
+    """Limpa todos os holds vencidos, em lotes de SWEEP_BATCH_SIZE, com um commit por lote"""
+    total = 0
+    while True:
+        swept = sweep()
+        db.session.commit()
+        total += swept
+        if swept < SWEEP_BATCH_SIZE:
+            return total
@@ -0,0 +1,80 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+from flask import Response, jsonify, request
+
+from models.rsvp import db, IdempotencyKey
+
+# -------------------------------------------------
+# Idempotency-Key em POST /api/rsvps
+# O cliente manda um valor único por envio do formulário (ex.: um UUID) e
+# repete o mesmo valor nas novas tentativas. A resposta do primeiro envio
+# é gravada na mesma transação do RSVP; reenvios com a mesma chave recebem
+# essa resposta de volta, sem criar linha nem ocupar vaga. A chave vale por
+# evento: a mesma chave em outro evento é um envio novo. Duas tentativas
+# simultâneas: a segunda esbarra na chave primária e também recebe a resposta
+# guardada. As chaves valem por IDEMPOTENCY_TTL_HOURS (padrão 24).
+# -------------------------------------------------
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 100
+TTL = timedelta(hours=float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")))
+PRUNE_EVERY = 100
+
+_remembered = 0
+
+
+def request_key():
+    """Chave do cabeçalho (None se não veio). ValueError se inválida."""
+    key = request.headers.get(HEADER, "").strip()
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"{HEADER} muito longa (máximo {MAX_KEY_LENGTH} caracteres)")
+    return key
+
+
+def body_hash():
+    return hashlib.sha256(request.get_data()).hexdigest()
+
+
+def find(key, event_id):
+    """Resposta guardada para a chave no evento, se ainda válida. Chave expirada é apagada (sem commit)."""
+    stored = db.session.get(IdempotencyKey, (event_id, key))
+    if stored is not None and stored.created_at < datetime.utcnow() - TTL:
+        db.session.delete(stored)
+        db.session.flush()
+        return None
+    return stored
+
+
+def replay(stored, request_hash):
+    """Devolve a resposta guardada; 422 se a chave veio com outro corpo"""
+    if stored.request_hash != request_hash:
+        return jsonify({
+            "success": False,
+            "error": f"{HEADER} já usada em outra requisição"
+        }), 422
+    response = Response(stored.response, status=stored.status_code, mimetype="application/json")
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def remember(key, event_id, request_hash, status_code, body):
+    """Grava a resposta na transação atual (sem commit). body: bytes do JSON."""
+    global _remembered
+    db.session.add(IdempotencyKey(
+        event_id=event_id, key=key, request_hash=request_hash, status_code=status_code,
+        response=body.decode("utf-8")
+    ))
+    db.session.flush()
+    _remembered += 1
+    if _remembered % PRUNE_EVERY == 0:
+        prune()
+
+
+def prune():
+    """Apaga as chaves expiradas (pelo índice de created_at). Sem commit."""
+    return db.session.execute(
+        db.delete(IdempotencyKey).where(IdempotencyKey.created_at < datetime.utcnow() - TTL)
+    ).rowcount
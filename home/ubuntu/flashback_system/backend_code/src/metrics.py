@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# -------------------------------------------------
+# Métricas por rota + instrumentação de SQL (formato texto do Prometheus)
+# Latência, status, requisições em andamento e, por requisição, quantas
+# consultas SQL rodaram e quanto tempo levaram (eventos do engine).
+# As métricas são por processo: com vários workers do gunicorn, cada
+# scrape de /api/metrics mostra o worker que atendeu (label "pid").
+# Log de consultas lentas: defina SLOW_QUERY_MS (ex.: SLOW_QUERY_MS=200).
+# -------------------------------------------------
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+logger = logging.getLogger("flashback.sql")
+
+
+def _slow_query_threshold():
+    value = os.getenv("SLOW_QUERY_MS", "").strip()
+    return float(value) / 1000.0 if value else None
+
+
+SLOW_QUERY_SECONDS = _slow_query_threshold()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = defaultdict(int)                       # (método, rota, status)
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))  # (método, rota)
+        self.sql_per_request = defaultdict(lambda: Histogram(SQL_COUNT_BUCKETS))
+        self.sql_statements = defaultdict(int)                 # (método, rota)
+        self.sql_seconds = defaultdict(float)
+        self.slow_queries = defaultdict(int)
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, method, route, status, seconds, sql_count, sql_seconds):
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[(method, route, str(status))] += 1
+            self.latency[key].observe(seconds)
+            self.sql_per_request[key].observe(sql_count)
+            self.sql_statements[key] += sql_count
+            self.sql_seconds[key] += sql_seconds
+
+    def slow_query(self, method, route):
+        with self._lock:
+            self.slow_queries[(method, route)] += 1
+
+    def render(self):
+        """Exporta no formato texto do Prometheus (versão 0.0.4)"""
+        pid = str(os.getpid())
+        lines = []
+
+        def labels(**values):
+            values["pid"] = pid
+            body = ",".join(f'{k}="{_escape(v)}"' for k, v in values.items())
+            return "{" + body + "}"
+
+        def histogram(name, help_text, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), hist in sorted(series.items()):
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f"{name}_bucket{labels(method=method, route=route, le=_number(bound))} {count}")
+                lines.append(f"{name}_bucket{labels(method=method, route=route, le='+Inf')} {hist.total}")
+                lines.append(f"{name}_sum{labels(method=method, route=route)} {_number(hist.sum)}")
+                lines.append(f"{name}_count{labels(method=method, route=route)} {hist.total}")
+
+        def counter(name, help_text, series, keys=("method", "route")):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{labels(**dict(zip(keys, key)))} {_number(value)}")
+
+        with self._lock:
+            lines.append("# HELP flashback_http_requests_in_flight Requisições em andamento")
+            lines.append("# TYPE flashback_http_requests_in_flight gauge")
+            lines.append(f"flashback_http_requests_in_flight{labels()} {self.in_flight}")
+            counter("flashback_http_requests_total", "Requisições por rota e status",
+                    self.requests, keys=("method", "route", "status"))
+            histogram("flashback_http_request_duration_seconds", "Latência das requisições", self.latency)
+            histogram("flashback_sql_statements_per_request", "Consultas SQL por requisição",
+                      self.sql_per_request)
+            counter("flashback_sql_statements_total", "Consultas SQL executadas", self.sql_statements)
+            counter("flashback_sql_duration_seconds_total", "Tempo total em consultas SQL", self.sql_seconds)
+            counter("flashback_sql_slow_statements_total", "Consultas acima de SLOW_QUERY_MS",
+                    self.slow_queries)
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+
+# -------------------------------------------------
+# Hooks do Flask
+# -------------------------------------------------
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    g.sql_count = 0
+    g.sql_seconds = 0.0
+    registry.request_started()
+
+
+def _after_request(response):
+    started = g.pop("metrics_started", None)
+    if started is not None:
+        registry.request_finished(
+            request.method, _route_label(), response.status_code,
+            time.perf_counter() - started, g.get("sql_count", 0), g.get("sql_seconds", 0.0)
+        )
+    return response
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+
+# -------------------------------------------------
+# Eventos do SQLAlchemy (todas as engines)
+# -------------------------------------------------
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    in_request = has_request_context() and "sql_count" in g
+    if in_request:
+        g.sql_count += 1
+        g.sql_seconds += elapsed
+
+    if SLOW_QUERY_SECONDS is not None and elapsed >= SLOW_QUERY_SECONDS:
+        route = f"{request.method} {_route_label()}" if in_request else "-"
+        logger.warning("Consulta lenta (%.1f ms) em %s: %s", elapsed * 1000, route, " ".join(statement.split())[:500])
+        if in_request:
+            registry.slow_query(request.method, _route_label())
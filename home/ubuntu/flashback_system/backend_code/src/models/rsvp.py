@@ -1,22 +1,67 @@
+import os
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 
-db = SQLAlchemy()
+from models.session import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+PAYMENT_STATUSES = ('pending', 'confirmed', 'rejected')
+
+class Event(db.Model):
+    """Festa: cardápio (DishCounter), preços e vagas por prato próprios. Config em cache: eventscope.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(60), unique=True, nullable=False)  # ?event=<slug> nas rotas
+    name = db.Column(db.String(200), nullable=False)
+    price_individual = db.Column(db.Float, nullable=False, default=60.0)  # Por pessoa
+    price_couple = db.Column(db.Float, nullable=False, default=100.0)
+    default_max_count = db.Column(db.Integer, nullable=False, default=7)  # Vagas de cada prato novo
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Event {self.slug}>'
 
 class RSVP(db.Model):
+    # Toda consulta filtra pelo evento: event_id é a primeira coluna dos índices
+    __table_args__ = (
+        # Paginação por cursor em (created_at, id)
+        db.Index('ix_rsvp_event_created_at_id', 'event_id', 'created_at', 'id'),
+        db.Index('ix_rsvp_event_payment_status', 'event_id', 'payment_status'),
+        # Vagas e estatísticas por prato e status (o prato já é de um evento só)
+        db.Index('ix_rsvp_dish_id_status', 'dish_id', 'payment_status'),
+        db.Index('ix_rsvp_event_email', 'event_id', 'email'),
+        # Sincronização incremental do painel (/api/admin/changes)
+        db.Index('ix_rsvp_event_updated_at', 'event_id', 'updated_at'),
+        # Busca por prefixo (/api/rsvps/search)
+        db.Index('ix_rsvp_event_search_name', 'event_id', 'search_name'),
+        db.Index('ix_rsvp_event_search_email', 'event_id', 'search_email'),
+        db.Index('ix_rsvp_event_search_phone', 'event_id', 'search_phone'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=True)  # Bancos antigos: schema.upgrade
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(20), nullable=True)
     guests = db.Column(db.Integer, default=1)
-    selected_dish = db.Column(db.String(200), nullable=False)
+    dish_id = db.Column(db.Integer, db.ForeignKey('dish_counter.id'), nullable=True)  # Bancos antigos: schema.upgrade
+    selected_dish = db.Column(db.String(200), nullable=True)  # Nome do prato (legado, cópia de dish_counter)
     payment_type = db.Column(db.String(20), nullable=False)  # 'individual' ou 'casal'
     total_amount = db.Column(db.Float, nullable=False)
     payment_status = db.Column(db.String(20), default='pending')  # 'pending', 'confirmed', 'rejected'
-    payment_proof = db.Column(db.String(500), nullable=True)  # URL ou base64 do comprovante
+    payment_proof = db.Column(db.String(500), nullable=True)  # URL do comprovante (legado)
+    payment_proof_sha256 = db.Column(db.String(64), nullable=True)  # Comprovante no blobstore
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    confirmed_at = db.Column(db.DateTime, nullable=True)  # Quando foi confirmado (receita em rollups.py)
     notes = db.Column(db.Text, nullable=True)  # Observações do admin
+    # Busca: preenchidas por search.py (sem acento, minúsculas; telefone só com dígitos)
+    search_name = db.Column(db.String(100), nullable=True)
+    search_email = db.Column(db.String(120), nullable=True)
+    search_phone = db.Column(db.String(20), nullable=True)
+
+    # Nome do prato vem no mesmo SELECT (LEFT OUTER JOIN), sem consulta por linha
+    dish = db.relationship('DishCounter', lazy='joined')
     
     def __repr__(self):
         return f'<RSVP {self.name} - {self.selected_dish}>'
@@ -28,21 +73,44 @@ class RSVP(db.Model):
             'email': self.email,
             'phone': self.phone,
             'guests': self.guests,
-            'selected_dish': self.selected_dish,
+            'dish_id': self.dish_id,
+            'selected_dish': self.dish.dish_name if self.dish is not None else self.selected_dish,
             'payment_type': self.payment_type,
             'total_amount': self.total_amount,
             'payment_status': self.payment_status,
             'payment_proof': self.payment_proof,
+            'payment_proof_url': f'/api/proofs/{self.payment_proof_sha256}' if self.payment_proof_sha256 else None,
+            'payment_proof_thumbnail_url': (
+                f'/api/proofs/{self.payment_proof_sha256}/thumbnail' if self.payment_proof_sha256 else None
+            ),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'confirmed_at': self.confirmed_at.isoformat() if self.confirmed_at else None,
             'notes': self.notes
         }
 
+# E-mail único por RSVP em cada evento (sem diferenciar maiúsculas), opcional: UNIQUE_RSVP_EMAIL=1.
+# Garantido pelo índice; schema.upgrade cria/remove quando a opção muda.
+UNIQUE_EMAIL_INDEX = 'ux_rsvp_event_email'
+UNIQUE_RSVP_EMAIL = os.getenv('UNIQUE_RSVP_EMAIL', '0') == '1'
+if UNIQUE_RSVP_EMAIL:
+    db.Index(UNIQUE_EMAIL_INDEX, RSVP.event_id, db.func.lower(RSVP.email), unique=True)
+
 class DishCounter(db.Model):
+    __table_args__ = (
+        # Cardápio do evento; o mesmo prato pode existir em vários eventos
+        db.Index('ux_dish_counter_event_name', 'event_id', 'dish_name', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    dish_name = db.Column(db.String(200), unique=True, nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=True)  # Bancos antigos: schema.upgrade
+    dish_name = db.Column(db.String(200), nullable=False)
     current_count = db.Column(db.Integer, default=0)
     max_count = db.Column(db.Integer, default=7)
+    # Vagas seguradas durante o pagamento (holds.py); contam no limite junto com current_count
+    held_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Última mudança do contador (reconcile.py confere só os pratos mexidos)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
         return f'<DishCounter {self.dish_name}: {self.current_count}/{self.max_count}>'
@@ -51,9 +119,131 @@ class DishCounter(db.Model):
             'id': self.id,
             'dish_name': self.dish_name,
             'current_count': self.current_count,
+            'held_count': self.held_count,
             'max_count': self.max_count,
-            'available': self.current_count < self.max_count
+            'available': self.current_count + self.held_count < self.max_count
         }
 
+class StatsSnapshot(db.Model):
+    """Estatísticas materializadas (uma linha por evento, id = event_id), mantidas pelas rotas de escrita"""
+    id = db.Column(db.Integer, primary_key=True)
+    total_rsvps = db.Column(db.Integer, nullable=False, default=0)
+    confirmed_payments = db.Column(db.Integer, nullable=False, default=0)
+    pending_payments = db.Column(db.Integer, nullable=False, default=0)
+    total_guests = db.Column(db.Integer, nullable=False, default=0)
+    total_revenue = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StatsSnapshot {self.total_rsvps} RSVPs>'
+
+class DishStat(db.Model):
+    """Quantidade de RSVPs por prato (parte do snapshot de estatísticas)"""
+    dish_id = db.Column(db.Integer, db.ForeignKey('dish_counter.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
 
+    def __repr__(self):
+        return f'<DishStat {self.dish_id}: {self.count}>'
+
+class SchemaVersion(db.Model):
+    """Hash do esquema aplicado por schema.upgrade() (linha única, id=1)"""
+    id = db.Column(db.Integer, primary_key=True)
+    fingerprint = db.Column(db.String(40), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    def __repr__(self):
+        return f'<SchemaVersion {self.fingerprint}>'
+
+class DataVersion(db.Model):
+    """Marcador de versão dos dados (uma linha por evento, id = event_id), incrementado a cada escrita"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DataVersion {self.version}>'
+
+class IdempotencyKey(db.Model):
+    """Resposta de um POST /api/rsvps por evento e Idempotency-Key (reenvios recebem a mesma resposta)"""
+    __table_args__ = (
+        # Limpeza das chaves expiradas
+        db.Index('ix_idempotency_key_created_at', 'created_at'),
+    )
+
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), primary_key=True)
+    key = db.Column(db.String(100), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key}>'
+
+class RsvpTombstone(db.Model):
+    """RSVP excluído, para /api/admin/changes avisar o painel. Apagado depois de changes.TOMBSTONE_TTL."""
+    __table_args__ = (
+        db.Index('ix_rsvp_tombstone_event_deleted_at', 'event_id', 'deleted_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, nullable=True)
+    rsvp_id = db.Column(db.Integer, nullable=False)
+    dish_id = db.Column(db.Integer, nullable=True)  # Prato que o RSVP ocupava (reconcile.py)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<RsvpTombstone {self.rsvp_id}>'
+
+class ReconcileState(db.Model):
+    """Início da última conferência dos contadores de pratos (linha única, id=1)"""
+    id = db.Column(db.Integer, primary_key=True)
+    checked_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<ReconcileState {self.checked_at}>'
+
+class RollupBucket(db.Model):
+    """Totais de um evento por hora/dia (rollups.py): RSVPs e convidados por created_at,
+    confirmações e receita por confirmed_at"""
+    event_id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(5), primary_key=True)  # 'hour' ou 'day'
+    bucket_start = db.Column(db.DateTime, primary_key=True)  # Início do intervalo (UTC)
+    rsvps = db.Column(db.Integer, nullable=False, default=0)
+    guests = db.Column(db.Integer, nullable=False, default=0)
+    confirmed = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f'<RollupBucket {self.event_id} {self.granularity} {self.bucket_start}>'
+
+class DishRollupBucket(db.Model):
+    """Vagas ocupadas por prato em cada hora/dia (RSVPs não recusados, por created_at)"""
+    event_id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(5), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    dish_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DishRollupBucket {self.dish_id} {self.granularity} {self.bucket_start}>'
+
+class DishHold(db.Model):
+    """Vaga de um prato segurada por alguns minutos durante o pagamento (holds.py)"""
+    __table_args__ = (
+        # Limpeza em lote dos holds vencidos
+        db.Index('ix_dish_hold_expires_at', 'expires_at'),
+        # Holds ativos por cliente (holds.MAX_PER_CLIENT)
+        db.Index('ix_dish_hold_client', 'event_id', 'client', 'expires_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(32), unique=True, nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    dish_id = db.Column(db.Integer, db.ForeignKey('dish_counter.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    client = db.Column(db.String(64))  # IP de quem segurou
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DishHold {self.dish_id} até {self.expires_at}>'
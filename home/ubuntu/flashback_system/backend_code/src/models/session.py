@@ -0,0 +1,19 @@
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+
+# -------------------------------------------------
+# Sessão com roteamento leitura/escrita
+# Rotas marcadas com replica.read_only (g.use_replica) leem do bind
+# "replica" (DATABASE_READ_URL); todo o resto, e qualquer flush, vai para
+# o primário. Sem réplica configurada, tudo vai para o primário.
+# -------------------------------------------------
+REPLICA_BIND = "replica"
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get("use_replica"):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
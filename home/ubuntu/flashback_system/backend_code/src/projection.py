@@ -0,0 +1,119 @@
+from models.rsvp import db, RSVP, DishCounter
+import fastjson
+
+# -------------------------------------------------
+# Projeção de colunas para as rotas de leitura (?fields=id,name,...)
+# Seleciona só as colunas pedidas como tuplas (sem objetos do ORM nem
+# identity map) e monta os dicts da resposta direto das linhas.
+# Sem fields, a resposta tem os mesmos campos de RSVP.to_dict().
+# -------------------------------------------------
+STREAM_BATCH_SIZE = 500
+
+_RSVP_COLUMNS = {
+    "id": RSVP.id,
+    "name": RSVP.name,
+    "email": RSVP.email,
+    "phone": RSVP.phone,
+    "guests": RSVP.guests,
+    "dish_id": RSVP.dish_id,
+    # Nome atual do prato pelo JOIN; a coluna legada só para linhas sem prato
+    "selected_dish": db.func.coalesce(DishCounter.dish_name, RSVP.selected_dish),
+    "payment_type": RSVP.payment_type,
+    "total_amount": RSVP.total_amount,
+    "payment_status": RSVP.payment_status,
+    "payment_proof": RSVP.payment_proof,
+    "payment_proof_sha256": RSVP.payment_proof_sha256,
+    "created_at": RSVP.created_at,
+    "updated_at": RSVP.updated_at,
+    "confirmed_at": RSVP.confirmed_at,
+    "notes": RSVP.notes,
+}
+
+
+def _proof_url(digest):
+    return f"/api/proofs/{digest}" if digest else None
+
+
+def _thumbnail_url(digest):
+    return f"/api/proofs/{digest}/thumbnail" if digest else None
+
+
+# Campo calculado -> (coluna de origem, função)
+_RSVP_DERIVED = {
+    "payment_proof_url": ("payment_proof_sha256", _proof_url),
+    "payment_proof_thumbnail_url": ("payment_proof_sha256", _thumbnail_url),
+}
+
+RSVP_FIELDS = ("id", "name", "email", "phone", "guests", "dish_id", "selected_dish", "payment_type",
+               "total_amount", "payment_status", "payment_proof", "payment_proof_url",
+               "payment_proof_thumbnail_url", "created_at", "updated_at", "confirmed_at", "notes")
+
+
+def parse_fields(value, available):
+    """Lista de campos de ?fields= (separados por vírgula). Sem o parâmetro, todos."""
+    if not value:
+        return list(available)
+    fields = []
+    for name in value.split(","):
+        name = name.strip()
+        if not name or name in fields:
+            continue
+        if name not in available:
+            raise ValueError(f"Campo inválido em fields: {name} (disponíveis: {', '.join(available)})")
+        fields.append(name)
+    return fields
+
+
+class RsvpProjection:
+    """SELECT com as colunas pedidas + conversão das linhas em dicts"""
+
+    def __init__(self, fields, extra=("id", "created_at")):
+        self.fields = fields
+        labels = []
+        for name in list(fields) + list(extra):
+            source = _RSVP_DERIVED[name][0] if name in _RSVP_DERIVED else name
+            if source not in labels:
+                labels.append(source)
+        self.labels = labels
+        self._getters = []
+        for name in fields:
+            if name in _RSVP_DERIVED:
+                source, convert = _RSVP_DERIVED[name]
+                self._getters.append((name, labels.index(source), convert))
+            else:
+                self._getters.append((name, labels.index(name), None))
+
+    def index(self, label):
+        return self.labels.index(label)
+
+    def select(self):
+        # yield_per: sem ele a Session carrega o resultado inteiro antes do primeiro lote
+        stmt = db.select(*[_RSVP_COLUMNS[label].label(label) for label in self.labels]).select_from(
+            RSVP
+        ).execution_options(yield_per=STREAM_BATCH_SIZE)
+        if "selected_dish" in self.labels:
+            stmt = stmt.outerjoin(DishCounter, DishCounter.id == RSVP.dish_id)
+        return stmt
+
+    def to_dict(self, row):
+        return {
+            name: (convert(row[index]) if convert is not None else row[index])
+            for name, index, convert in self._getters
+        }
+
+
+def stream_list(batches, tail):
+    """Gera {"success":true,"data":[...], **tail} aos poucos, um lote de linhas por vez.
+
+    batches: iterável de listas de dicts; tail: função chamada no fim (ex.: next_cursor).
+    """
+    yield b'{"success":true,"data":['
+    first = True
+    for batch in batches:
+        if not batch:
+            continue
+        chunk = fastjson.dumps(batch)[1:-1]
+        yield chunk if first else b"," + chunk
+        first = False
+    extra = fastjson.dumps(tail())
+    yield b"]" + (b"," + extra[1:] if extra != b"{}" else b"}")
@@ -0,0 +1,231 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, jsonify, request
+
+# -------------------------------------------------
+# Limite de requisições por cliente + controle de admissão (rsvp_bp)
+# Token bucket por (rota, IP): cada rota tem uma taxa (tokens/s) e uma
+# rajada máxima; sem token, 429 com Retry-After. Os baldes ficam em memória
+# (por processo) ou, com RATE_LIMIT_DB=/caminho/ratelimit.db, em um SQLite
+# compartilhado pelos workers do gunicorn.
+# Admissão: no máximo MAX_IN_FLIGHT requisições que usam o banco ao mesmo
+# tempo por processo; as demais esperam até ADMISSION_WAIT_SECONDS e
+# recebem 503 com Retry-After, em vez de esperar 20 s pelo pool_timeout.
+# Atrás de proxy (Render), defina TRUSTED_PROXIES=1 para o IP do cliente
+# vir do X-Forwarded-For.
+# Limites ajustáveis sem deploy: RATE_LIMIT_<ROTA>=taxa/rajada, com o nome
+# da view em maiúsculas (ex.: RATE_LIMIT_CREATE_RSVP=0.5/20), e
+# RATE_LIMIT_DEFAULT para as rotas fora de ROUTE_LIMITS.
+# -------------------------------------------------
+DEFAULT_LIMIT = (5.0, 50)  # (tokens por segundo, rajada)
+ROUTE_LIMITS = {
+    # Polling do site (a cada 10 s por celular); vários celulares no mesmo wi-fi
+    "rsvp.get_stats": (2.0, 20),
+    "rsvp.get_dish_status": (2.0, 20),
+    "rsvp.get_all_rsvps": (2.0, 20),
+    # Formulário: taxa baixa, mas convidados no mesmo wi-fi (festa, escritório)
+    # dividem o IP e confirmam juntos quando o convite é enviado no grupo
+    "rsvp.create_rsvp": (0.5, 20),
+    # Cada hold tira uma vaga do cardápio por 15 min: rajada pequena (e no
+    # máximo holds.MAX_PER_CLIENT ativos por IP)
+    "rsvp.hold_dish": (0.5, 3),
+    "rsvp.import_rsvps": (0.1, 2),
+}
+# Não passam pela admissão: SSE fica aberto por minutos e só usa o banco
+# no início; comprovantes e métricas não usam o banco
+ADMISSION_EXEMPT = {"rsvp.stream_events", "rsvp.get_metrics", "rsvp.get_payment_proof",
+                    "rsvp.get_payment_proof_thumbnail"}
+BUCKET_IDLE_SECONDS = 3600
+MAX_MEMORY_BUCKETS = 100000
+
+
+def _refill(tokens, updated, now, rate, burst):
+    return min(float(burst), tokens + (now - updated) * rate)
+
+
+def _decide(tokens, rate):
+    """(permitido, tokens restantes, segundos até o próximo token)"""
+    if tokens >= 1.0:
+        return True, tokens - 1.0, 0.0
+    return False, tokens, (1.0 - tokens) / rate
+
+
+class MemoryStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # chave -> (tokens, atualizado em)
+
+    def take(self, key, rate, burst, now):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(burst), now))
+            allowed, tokens, retry_after = _decide(_refill(tokens, updated, now, rate, burst), rate)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > MAX_MEMORY_BUCKETS:
+                self._prune(now)
+            return allowed, retry_after
+
+    def _prune(self, now):
+        self._buckets = {
+            key: value for key, value in self._buckets.items() if now - value[1] < BUCKET_IDLE_SECONDS
+        }
+
+
+class SqliteStore:
+    """Baldes em um arquivo SQLite, compartilhados entre processos"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")  # perder o estado dos baldes num crash não importa
+        return conn
+
+    def _connection(self):
+        # Uma conexão por thread e por processo (o gunicorn faz fork depois do import)
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            self._local.conn = self._connect()
+            self._local.pid = pid
+        return self._local.conn
+
+    def take(self, key, rate, burst, now):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM bucket WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(row[0], row[1], now, rate, burst) if row else float(burst)
+            allowed, tokens, retry_after = _decide(tokens, rate)
+            conn.execute(
+                "INSERT INTO bucket (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            self._takes += 1
+            if self._takes % 1000 == 0:
+                conn.execute("DELETE FROM bucket WHERE updated < ?", (now - BUCKET_IDLE_SECONDS,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+
+def parse_limit(value):
+    """"taxa/rajada" (ex.: "0.5/20") -> (taxa, rajada)"""
+    try:
+        rate, burst = value.split("/")
+        rate, burst = float(rate), int(burst)
+    except ValueError:
+        raise ValueError(f"Limite inválido: {value!r} (use taxa/rajada, ex.: 0.5/20)")
+    if rate <= 0 or burst < 1:
+        raise ValueError(f"Limite inválido: {value!r} (taxa > 0 e rajada >= 1)")
+    return rate, burst
+
+
+def _limit_setting(endpoint):
+    return "RATE_LIMIT_" + endpoint.rsplit(".", 1)[-1].upper()
+
+
+class Limiter:
+    def __init__(self, store, max_in_flight, admission_wait, limits=None, default_limit=DEFAULT_LIMIT):
+        self.store = store
+        self.limits = ROUTE_LIMITS if limits is None else limits
+        self.default_limit = default_limit
+        self.admission_wait = admission_wait
+        self._slots = threading.BoundedSemaphore(max_in_flight) if max_in_flight > 0 else None
+
+    def check_rate(self, endpoint, client):
+        if self.store is None:
+            return None
+        rate, burst = self.limits.get(endpoint, self.default_limit)
+        allowed, retry_after = self.store.take(f"{endpoint}:{client}", rate, burst, time.time())
+        if allowed:
+            return None
+        return _reject(429, "Muitas requisições, tente novamente em instantes", retry_after)
+
+    @property
+    def capped(self):
+        return self._slots is not None
+
+    def admit(self):
+        """Ocupa uma vaga de admissão; devolve a resposta 503 se não houver"""
+        if self._slots.acquire(timeout=self.admission_wait):
+            return None
+        return _reject(503, "Servidor ocupado, tente novamente em instantes", 1)
+
+    def release(self):
+        self._slots.release()
+
+
+def _reject(status, message, retry_after):
+    response = jsonify({"success": False, "error": message})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def _setting(app, name, default):
+    return app.config.get(name, os.getenv(name, default))
+
+
+def _limits(app):
+    """ROUTE_LIMITS e DEFAULT_LIMIT com as sobrescritas de RATE_LIMIT_<ROTA> / RATE_LIMIT_DEFAULT"""
+    limits = dict(ROUTE_LIMITS)
+    for endpoint in app.view_functions:
+        value = _setting(app, _limit_setting(endpoint), "")
+        if value and endpoint.startswith("rsvp."):
+            limits[endpoint] = parse_limit(value)
+    default = _setting(app, "RATE_LIMIT_DEFAULT", "")
+    return limits, parse_limit(default) if default else DEFAULT_LIMIT
+
+
+def init_app(app):
+    """Cria o limitador do app (os hooks ficam no blueprint: before_request/teardown_request)
+
+    Chamar depois de registrar o blueprint: os limites por rota são lidos das views.
+    """
+    store = None
+    if str(_setting(app, "RATE_LIMIT", "1")) != "0":
+        path = _setting(app, "RATE_LIMIT_DB", "")
+        store = SqliteStore(path) if path else MemoryStore()
+    limits, default_limit = _limits(app)
+    limiter = Limiter(
+        store,
+        max_in_flight=int(_setting(app, "MAX_IN_FLIGHT", "15")),
+        admission_wait=float(_setting(app, "ADMISSION_WAIT_SECONDS", "1")),
+        limits=limits,
+        default_limit=default_limit,
+    )
+    app.extensions["ratelimit"] = limiter
+
+
+def before_request():
+    limiter = current_app.extensions.get("ratelimit")
+    if limiter is None:
+        return None
+    rejected = limiter.check_rate(request.endpoint, request.remote_addr)
+    if rejected is not None or not limiter.capped or request.endpoint in ADMISSION_EXEMPT:
+        return rejected
+    rejected = limiter.admit()
+    if rejected is None:
+        request.environ["flashback.admitted"] = True
+    return rejected
+
+
+def teardown_request(exception=None):
+    # Em respostas em streaming, roda quando o stream termina
+    if request.environ.pop("flashback.admitted", False):
+        current_app.extensions["ratelimit"].release()
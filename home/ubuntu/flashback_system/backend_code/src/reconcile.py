@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from models.rsvp import db, Event, RSVP, DishCounter, ReconcileState, RsvpTombstone
+import changes
+import versioning
+
+# -------------------------------------------------
+# Conferência dos contadores de vagas (dish_counter.current_count)
+# Vagas: todo RSVP que não está recusado ocupa uma vaga do seu prato (bulk.py).
+# Uma consulta agrupada conta as vagas reais por prato, compara com os
+# contadores e corrige os divergentes num único UPDATE (subconsulta
+# correlacionada, recontada no momento da escrita).
+# Modo incremental: só os pratos mexidos desde a última conferência
+# (dish_counter.updated_at, rsvp.updated_at e tombstones de exclusão), barato
+# o bastante para rodar a cada minuto (flask rsvp reconcile-dishes --every 60).
+# -------------------------------------------------
+STATE_ID = 1
+OVERLAP = changes.CHANGE_OVERLAP  # Transações que gravaram antes e fizeram commit depois
+
+
+@dataclass
+class Drift:
+    dish_id: int
+    event_id: int
+    dish_name: str
+    stored: int
+    actual: int
+    max_count: int
+
+    def to_dict(self):
+        return {"dish_id": self.dish_id, "event_id": self.event_id, "dish_name": self.dish_name, "stored": self.stored,
+                "actual": self.actual, "max_count": self.max_count}
+
+
+def _holds_slot():
+    return db.or_(RSVP.payment_status.is_(None), RSVP.payment_status != "rejected")
+
+
+def true_counts(dish_ids=None):
+    """{dish_id: vagas ocupadas} contado na tabela RSVP (uma consulta agrupada)"""
+    stmt = db.select(RSVP.dish_id, db.func.count(RSVP.id)).where(RSVP.dish_id.isnot(None), _holds_slot())
+    if dish_ids is not None:
+        stmt = stmt.where(RSVP.dish_id.in_(dish_ids))
+    return dict(db.session.execute(stmt.group_by(RSVP.dish_id)).all())
+
+
+def touched_dishes(since):
+    """Pratos cujo contador ou RSVPs mudaram desde `since`"""
+    window = since - OVERLAP
+    # event_id IN (...): uma faixa por evento nos índices (event_id, updated_at/deleted_at)
+    event_ids = db.select(Event.id).scalar_subquery()
+    stmt = db.union(
+        db.select(DishCounter.id).where(DishCounter.updated_at >= window),
+        db.select(RSVP.dish_id).where(RSVP.event_id.in_(event_ids), RSVP.updated_at >= window,
+                                      RSVP.dish_id.isnot(None)),
+        db.select(RsvpTombstone.dish_id).where(RsvpTombstone.event_id.in_(event_ids),
+                                               RsvpTombstone.deleted_at >= window,
+                                               RsvpTombstone.dish_id.isnot(None)),
+    )
+    return set(db.session.execute(stmt).scalars())
+
+
+def check(dish_ids=None):
+    """Pratos com contador divergente (dish_ids=None: todos)"""
+    stmt = db.select(DishCounter.id, DishCounter.event_id, DishCounter.dish_name, DishCounter.current_count, DishCounter.max_count)
+    if dish_ids is not None:
+        if not dish_ids:
+            return []
+        stmt = stmt.where(DishCounter.id.in_(dish_ids))
+    counters = db.session.execute(stmt.order_by(DishCounter.id)).all()
+    actual = true_counts([row.id for row in counters] if dish_ids is not None else None)
+    return [
+        Drift(row.id, row.event_id, row.dish_name, row.current_count or 0, actual.get(row.id, 0), row.max_count)
+        for row in counters
+        if (row.current_count or 0) != actual.get(row.id, 0)
+    ]
+
+
+def fix(drifts):
+    """Corrige os contadores num único UPDATE. Não faz commit."""
+    if not drifts:
+        return 0
+    recount = db.select(db.func.count(RSVP.id)).where(RSVP.dish_id == DishCounter.id, _holds_slot())
+    db.session.execute(
+        db.update(DishCounter)
+        .where(DishCounter.id.in_([drift.dish_id for drift in drifts]))
+        .values(current_count=recount.scalar_subquery())
+    )
+    for event_id in sorted({drift.event_id for drift in drifts}):
+        versioning.bump(event_id)
+    return len(drifts)
+
+
+def reconcile(incremental=False, dry_run=False):
+    """Confere (e corrige, se não for dry_run) os contadores e faz commit.
+
+    Retorna (divergências, quantos pratos foram conferidos; None = todos).
+    No modo incremental sem conferência anterior (ou antiga demais para os
+    tombstones) confere todos.
+    """
+    started = datetime.utcnow()
+    state = db.session.get(ReconcileState, STATE_ID)
+    dish_ids = None
+    if incremental and state is not None and state.checked_at > started - changes.TOMBSTONE_TTL + OVERLAP:
+        dish_ids = touched_dishes(state.checked_at)
+    drifts = check(dish_ids)
+    if dry_run:
+        db.session.rollback()
+        return drifts, (None if dish_ids is None else len(dish_ids))
+    fix(drifts)
+    db.session.merge(ReconcileState(id=STATE_ID, checked_at=started))
+    db.session.commit()
+    return drifts, (None if dish_ids is None else len(dish_ids))
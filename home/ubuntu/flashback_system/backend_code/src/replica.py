@@ -0,0 +1,96 @@
+import os
+import time
+from functools import wraps
+
+from flask import current_app, g, request
+
+from models.rsvp import db
+from models.session import REPLICA_BIND
+
+# -------------------------------------------------
+# Réplica de leitura opcional (DATABASE_READ_URL)
+# As rotas de leitura (@read_only) vão para a réplica; escritas ficam no
+# primário. Depois de uma escrita o cliente recebe um prazo curto e, até
+# ele vencer, as leituras desse cliente voltam ao primário (lê o que
+# acabou de escrever mesmo com a réplica atrasada). O prazo vai no cookie
+# (painel, mesmo site) e no header X-Primary-Until, que o front em outro
+# domínio devolve nas leituras (cookie não vai em fetch cross-origin).
+# Se a leitura da réplica falha (fora do ar, sem sincronizar), a requisição
+# passa para o primário (fall_back_to_primary).
+# -------------------------------------------------
+PIN_COOKIE = "fb_primary_until"
+PIN_HEADER = "X-Primary-Until"
+CLOCK_SKEW_SECONDS = 1  # Relógios dos workers/instâncias
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+def configure(app):
+    """SQLALCHEMY_BINDS["replica"] a partir de DATABASE_READ_URL (se definida)"""
+    read_url = os.getenv("DATABASE_READ_URL", "").strip()
+    if read_url:
+        app.config.setdefault("SQLALCHEMY_BINDS", {})[REPLICA_BIND] = read_url
+
+
+def enabled(app=None):
+    app = app or current_app
+    return REPLICA_BIND in (app.config.get("SQLALCHEMY_BINDS") or {})
+
+
+def _pinned(value, now):
+    try:
+        deadline = float(value or 0)
+    except ValueError:
+        return False
+    # Prazo no futuro, mas não além do que o backend daria: o header vem do cliente
+    return now < deadline <= now + READ_YOUR_WRITES_SECONDS + CLOCK_SKEW_SECONDS
+
+
+def pinned_to_primary():
+    """True se o cliente escreveu há menos de READ_YOUR_WRITES_SECONDS (cookie ou X-Primary-Until)"""
+    now = time.time()
+    return _pinned(request.cookies.get(PIN_COOKIE), now) or _pinned(request.headers.get(PIN_HEADER), now)
+
+
+def fall_back_to_primary():
+    """Depois de uma falha lendo a réplica: desfaz a transação e manda o resto da
+    requisição ao primário. False se a requisição já estava no primário."""
+    if not g.get("use_replica"):
+        return False
+    db.session.rollback()
+    g.use_replica = False
+    return True
+
+
+def read_only(view):
+    """Marca a rota como só leitura: usa a réplica, salvo logo após uma escrita"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = not pinned_to_primary()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_app(app):
+    @app.after_request
+    def pin_after_write(response):
+        if request.method in WRITE_METHODS and response.status_code < 400 and enabled(app):
+            deadline = f"{time.time() + READ_YOUR_WRITES_SECONDS:.3f}"
+            response.set_cookie(PIN_COOKIE, deadline, max_age=READ_YOUR_WRITES_SECONDS,
+                                httponly=True, samesite="Lax")
+            response.headers[PIN_HEADER] = deadline
+        return response
+
+
+def sync_sqlite():
+    """Copia o banco primário para a réplica (dev local com dois arquivos SQLite)"""
+    primary, replica = db.engines[None], db.engines[REPLICA_BIND]
+    if primary.dialect.name != "sqlite" or replica.dialect.name != "sqlite":
+        raise RuntimeError("sync da réplica só com SQLite (em produção a replicação é do banco)")
+    source, target = primary.raw_connection(), replica.raw_connection()
+    try:
+        source.driver_connection.backup(target.driver_connection)
+    finally:
+        target.close()
+        source.close()
+    return replica.url.database
@@ -0,0 +1,178 @@
+import os
+from datetime import timedelta
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models.rsvp import db, RSVP, DishCounter, DishRollupBucket, RollupBucket
+
+# -------------------------------------------------
+# Séries temporais pré-agregadas (/api/stats/timeseries)
+# Buckets por hora e por dia: RSVPs, convidados, confirmações e receita, e
+# vagas ocupadas por prato. stats.apply_changes() repassa as mesmas mudanças
+# do snapshot para cá, na mesma transação (um upsert por tabela).
+# RSVPs, convidados e vagas contam no bucket de created_at (vagas: só RSVPs
+# não recusados, então a soma dos buckets de um prato é o seu contador);
+# confirmações e receita contam no bucket de confirmed_at.
+# Os dias começam à meia-noite em UTC+ROLLUP_UTC_OFFSET_HOURS (padrão -3, Brasília).
+# -------------------------------------------------
+GRANULARITIES = ("hour", "day")
+DAY_OFFSET = timedelta(hours=float(os.getenv("ROLLUP_UTC_OFFSET_HOURS", "-3")))
+MAX_BUCKETS = 5000
+REBUILD_BATCH_SIZE = 1000
+_TOTALS = ("rsvps", "guests", "confirmed", "revenue")
+
+_UPSERT = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def bucket_start(moment, granularity):
+    """Início (UTC) da hora ou do dia que contém `moment`"""
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    local = moment + DAY_OFFSET
+    return local.replace(hour=0, minute=0, second=0, microsecond=0) - DAY_OFFSET
+
+
+def _add(totals, dish_totals, facts, sign):
+    """Soma (sign=1) ou tira (sign=-1) a contribuição de um RSVP nos buckets"""
+    guests, amount = int(facts.guests or 0), float(facts.amount or 0)
+    for granularity in GRANULARITIES:
+        if facts.created_at is not None:
+            start = bucket_start(facts.created_at, granularity)
+            row = totals.setdefault((facts.event_id, granularity, start), [0, 0, 0, 0.0])
+            row[0] += sign
+            row[1] += sign * guests
+            if facts.status != "rejected" and facts.dish_id is not None:
+                key = (facts.event_id, granularity, start, facts.dish_id)
+                dish_totals[key] = dish_totals.get(key, 0) + sign
+        if facts.status == "confirmed" and facts.confirmed_at is not None:
+            start = bucket_start(facts.confirmed_at, granularity)
+            row = totals.setdefault((facts.event_id, granularity, start), [0, 0, 0, 0.0])
+            row[2] += sign
+            row[3] += sign * amount
+
+
+def _rows(totals, dish_totals):
+    rows = [
+        {"event_id": event_id, "granularity": granularity, "bucket_start": start, **dict(zip(_TOTALS, values))}
+        for (event_id, granularity, start), values in totals.items() if any(values)
+    ]
+    dish_rows = [
+        {"event_id": event_id, "granularity": granularity, "bucket_start": start, "dish_id": dish_id, "count": count}
+        for (event_id, granularity, start, dish_id), count in dish_totals.items() if count
+    ]
+    return rows, dish_rows
+
+
+def _upsert(model, keys, columns, rows):
+    """Soma os valores nas linhas existentes ou cria as que faltam (sem commit)"""
+    if not rows:
+        return
+    insert = _UPSERT.get(db.engine.dialect.name)
+    if insert is not None:
+        stmt = insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={column: getattr(model, column) + getattr(stmt.excluded, column) for column in columns},
+        )
+        db.session.execute(stmt, rows)
+        return
+    for row in rows:
+        result = db.session.execute(
+            db.update(model).where(*[getattr(model, key) == row[key] for key in keys]).values(
+                {column: getattr(model, column) + row[column] for column in columns}
+            )
+        )
+        if result.rowcount == 0:
+            db.session.execute(db.insert(model), [row])
+
+
+def apply_changes(changes):
+    """Aplica pares (before, after) de stats.RsvpFacts aos buckets. Não faz commit."""
+    totals, dish_totals = {}, {}
+    for before, after in changes:
+        if before is not None:
+            _add(totals, dish_totals, before, -1)
+        if after is not None:
+            _add(totals, dish_totals, after, 1)
+    rows, dish_rows = _rows(totals, dish_totals)
+    _upsert(RollupBucket, ["event_id", "granularity", "bucket_start"], _TOTALS, rows)
+    _upsert(DishRollupBucket, ["event_id", "granularity", "bucket_start", "dish_id"], ["count"], dish_rows)
+
+
+def rebuild(event_id):
+    """Recalcula os buckets do evento a partir de created_at/confirmed_at dos RSVPs. Não faz commit."""
+    db.session.execute(db.delete(RollupBucket).where(RollupBucket.event_id == event_id))
+    db.session.execute(db.delete(DishRollupBucket).where(DishRollupBucket.event_id == event_id))
+    stmt = db.select(
+        RSVP.event_id, RSVP.payment_status.label("status"), RSVP.guests, RSVP.total_amount.label("amount"),
+        RSVP.dish_id, RSVP.created_at, RSVP.confirmed_at,
+    ).where(RSVP.event_id == event_id).execution_options(yield_per=REBUILD_BATCH_SIZE)
+    totals, dish_totals = {}, {}
+    for facts in db.session.execute(stmt):
+        _add(totals, dish_totals, facts, 1)
+    rows, dish_rows = _rows(totals, dish_totals)
+    for model, batch in ((RollupBucket, rows), (DishRollupBucket, dish_rows)):
+        for start in range(0, len(batch), REBUILD_BATCH_SIZE):
+            db.session.execute(db.insert(model), batch[start:start + REBUILD_BATCH_SIZE])
+    return len(rows)
+
+
+def ensure(event_id):
+    """Preenche os buckets do evento na primeira execução (bancos já existentes)"""
+    has_buckets = db.session.execute(
+        db.select(RollupBucket.event_id).where(RollupBucket.event_id == event_id).limit(1)
+    ).first()
+    has_rsvps = db.session.execute(db.select(RSVP.id).where(RSVP.event_id == event_id).limit(1)).first()
+    if has_rsvps and not has_buckets:
+        rebuild(event_id)
+        db.session.commit()
+
+
+def series(event_id, granularity, since=None, until=None):
+    """Buckets do evento no intervalo [since, until), em ordem. Custo: número de buckets."""
+    filters = [RollupBucket.event_id == event_id, RollupBucket.granularity == granularity]
+    if since is not None:
+        filters.append(RollupBucket.bucket_start >= bucket_start(since, granularity))
+    if until is not None:
+        filters.append(RollupBucket.bucket_start < until)
+    rows = db.session.execute(
+        db.select(RollupBucket.bucket_start, RollupBucket.rsvps, RollupBucket.guests, RollupBucket.confirmed,
+                  RollupBucket.revenue).where(*filters).order_by(RollupBucket.bucket_start).limit(MAX_BUCKETS + 1)
+    ).all()
+    truncated = len(rows) > MAX_BUCKETS
+    if truncated:
+        until = rows[MAX_BUCKETS].bucket_start
+        rows = rows[:MAX_BUCKETS]
+
+    dish_filters = [DishRollupBucket.event_id == event_id, DishRollupBucket.granularity == granularity,
+                    DishRollupBucket.count != 0]
+    if since is not None:
+        dish_filters.append(DishRollupBucket.bucket_start >= bucket_start(since, granularity))
+    if until is not None:
+        dish_filters.append(DishRollupBucket.bucket_start < until)
+    dish_rows = db.session.execute(
+        db.select(DishRollupBucket.dish_id, DishRollupBucket.bucket_start, DishRollupBucket.count)
+        .where(*dish_filters).order_by(DishRollupBucket.bucket_start, DishRollupBucket.dish_id)
+    ).all()
+    names = dict(db.session.execute(
+        db.select(DishCounter.id, DishCounter.dish_name).where(DishCounter.event_id == event_id)
+    ).all())
+    dishes = {}
+    for dish_id, start, count in dish_rows:
+        dish = dishes.setdefault(dish_id, {"dish_id": dish_id, "dish_name": names.get(dish_id), "points": []})
+        dish["points"].append({"start": start.isoformat(), "count": count})
+
+    return {
+        "granularity": granularity,
+        "buckets": [
+            {"start": start.isoformat(), "rsvps": rsvps, "guests": guests, "confirmed": confirmed,
+             "revenue": round(revenue, 2)}
+            for start, rsvps, guests, confirmed, revenue in rows
+            if rsvps or guests or confirmed or revenue
+        ],
+        "dishes": [dishes[dish_id] for dish_id in sorted(dishes)],
+        "truncated": truncated,
+    }
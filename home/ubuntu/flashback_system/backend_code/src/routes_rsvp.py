@@ -1,42 +1,254 @@
-from flask import Blueprint, request, jsonify
-from models.rsvp import db, RSVP, DishCounter
-from datetime import datetime
+from flask import Blueprint, Response, current_app, g, request, jsonify, send_file, stream_with_context
+from models.rsvp import db, RSVP, DishCounter, PAYMENT_STATUSES, UNIQUE_EMAIL_INDEX
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import RequestEntityTooLarge
+from datetime import datetime, timedelta
+import base64
+import click
+import time
+import blobstore
+import bulk
+import changes
+import dishes
+import eventscope
+import fastjson
+import holds
+import idempotency
+import metrics
+import projection
+import ratelimit
+import reconcile
+import replica
+import rollups
+import rsvp_io
+import search
+import stats
+import versioning
+import writequeue
+from versioning import conditional
+from events import broker_for, format_event, StreamsFull, STREAMS_FULL_RETRY_SECONDS
 
 rsvp_bp = Blueprint("rsvp", __name__)
+# Tamanho do corpo por rota (as demais: MAX_CONTENT_LENGTH do app, no create_app)
+BODY_LIMITS = {
+    "rsvp.upload_payment_proof": blobstore.MAX_BLOB_BYTES + 64 * 1024,  # + cabeçalhos do multipart
+    "rsvp.import_rsvps": rsvp_io.MAX_IMPORT_BYTES,
+}
 
-# Lista de pratos disponíveis
-AVAILABLE_DISHES = [
-    "Almôndegas com mandioca",
-    "Torresmo", 
-    "Calabresa frita",
-    "Batata frita",
-    "Carne de sol frita",
-    "Caldos",
-    "Pastéis",
-    "Churrasquinho",
-    "Frango a passarinho",
-    "Linguiça acebolada",
-    "Cachorro quente",
-    "Mandioca frita",
-    "Frios (mussarela, presunto, mortadela, ovos de codorna, azeitona, salsicha, palmito, salaminho)",
-    "Bolinho de arroz",
-    "Bolinho de bacalhau",
-    "Camarão",
-    "Tilápia frita",
-    "Kibe"
-]
+def _limit_body():
+    """413 antes de ler o corpo quando o Content-Length passa do limite da rota"""
+    limit = BODY_LIMITS.get(request.endpoint)
+    if limit is not None:
+        request.max_content_length = limit
+    limit = request.max_content_length
+    if limit is not None and (request.content_length or 0) > limit:
+        return jsonify({"success": False, "error": f"Requisição maior que {limit // (1024 * 1024)} MB"}), 413
+    return None
+
+# Corpo grande demais: recusado antes de tudo, sem ocupar vaga de admissão
+rsvp_bp.before_request(_limit_body)
+# Limite por cliente e admissão (ratelimit.init_app no create_app)
+rsvp_bp.before_request(ratelimit.before_request)
+rsvp_bp.teardown_request(ratelimit.teardown_request)
+# Evento da requisição (?event=<slug>), 404 se não existe
+rsvp_bp.before_request(eventscope.before_request)
+# Holds de prato vencidos saem antes de /api/dishes e /api/events
+rsvp_bp.before_request(holds.before_request)
+
+def _dish_list(event):
+    version = g.data_version if "data_version" in g else versioning.current(event.id)[0]
+    return dishes.dish_list(event.id, version)
+
+def _change_payload(change, event, **info):
+    g.data_version = versioning.current(event.id)[0]
+    broker_for(event.id).note_version(g.data_version)
+    return {"type": change, **info, "stats": stats.read_stats(event.id), "dishes": _dish_list(event)}
+
+def _store_inline_proof(rsvp, value):
+    """Comprovante enviado inline (data URI/base64) vai para o blobstore; na linha fica só o hash"""
+    if blobstore.looks_inline(value):
+        rsvp.payment_proof_sha256 = blobstore.store.save_data_uri(value)
+        rsvp.payment_proof = ""
+    else:
+        rsvp.payment_proof = value
+
+def _publish_change(change, **info):
+    """Avisa os clientes de /api/events do evento depois de um commit"""
+    event = eventscope.current()
+    broker_for(event.id).publish("change", lambda: _change_payload(change, event, **info))
+
+def _get_rsvp_or_404(rsvp_id):
+    """RSVP do evento da requisição (404 também se for de outro evento)"""
+    return RSVP.query.filter_by(id=rsvp_id, event_id=eventscope.current().id).first_or_404()
+
+RSVP_PAGE_SIZE = 50
+RSVP_MAX_PAGE_SIZE = 5000  # A resposta sai em streaming, em lotes de projection.STREAM_BATCH_SIZE
+
+def _encode_cursor(rsvp):
+    raw = f"{rsvp.created_at.isoformat()}|{rsvp.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, rsvp_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(rsvp_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor inválido")
+
+def _parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Data inválida em {name} (use o formato ISO, ex.: 2025-09-06)")
+
+def _rsvp_filters():
+    """Filtros de /api/rsvps a partir da query string (sempre do evento da requisição)"""
+    event = eventscope.current()
+    filters = [RSVP.event_id == event.id]
+    status = request.args.get("status")
+    if status:
+        if status not in PAYMENT_STATUSES:
+            raise ValueError(f"Status inválido: {status}")
+        filters.append(RSVP.payment_status == status)
+    dish = request.args.get("dish")
+    if dish:
+        if dish.isdigit():
+            filters.append(RSVP.dish_id == int(dish))
+        else:
+            # Nome do prato (clientes antigos): resolvido pelo índice único (event_id, dish_name)
+            filters.append(RSVP.dish_id == db.select(DishCounter.id).where(
+                DishCounter.event_id == event.id, DishCounter.dish_name == dish).scalar_subquery())
+    since = _parse_date_arg("since")
+    if since:
+        filters.append(RSVP.created_at >= since)
+    until = _parse_date_arg("until")
+    if until:
+        if len(request.args["until"]) == 10:
+            # Só a data (AAAA-MM-DD): inclui o dia inteiro
+            until += timedelta(days=1)
+        filters.append(RSVP.created_at < until)
+    return filters
 
 @rsvp_bp.route("/rsvps", methods=["GET"])
+@replica.read_only
+@conditional
 def get_all_rsvps():
-    """Listar todos os RSVPs"""
+    """Listar RSVPs (mais recentes primeiro), paginado por cursor em (created_at, id)
+
+    Query string: limit, cursor, fields (ex.: id,name,payment_status), status,
+    dish (id ou nome), since, until (datas ISO)
+    """
     try:
-        rsvps = RSVP.query.order_by(RSVP.created_at.desc()).all()
+        try:
+            limit = min(max(int(request.args.get("limit", RSVP_PAGE_SIZE)), 1), RSVP_MAX_PAGE_SIZE)
+            fields = projection.parse_fields(request.args.get("fields"), projection.RSVP_FIELDS)
+            filters = _rsvp_filters()
+            cursor = request.args.get("cursor")
+            if cursor:
+                filters.append(db.tuple_(RSVP.created_at, RSVP.id) < _decode_cursor(cursor))
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        query = projection.RsvpProjection(fields)
+        result = db.session.execute(
+            query.select().where(*filters).order_by(RSVP.created_at.desc(), RSVP.id.desc()).limit(limit + 1)
+        )
+        # Primeiro lote antes de responder: erro de banco ainda vira 500
+        first = result.fetchmany(projection.STREAM_BATCH_SIZE)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+    page = {"sent": 0, "last": None, "has_more": False}
+
+    def batches():
+        rows = first
+        try:
+            while rows:
+                rows, extra = rows[:limit - page["sent"]], rows[limit - page["sent"]:]
+                if rows:
+                    page["sent"] += len(rows)
+                    page["last"] = rows[-1]
+                    yield [query.to_dict(row) for row in rows]
+                if extra:
+                    page["has_more"] = True
+                    break
+                rows = result.fetchmany(projection.STREAM_BATCH_SIZE)
+        finally:
+            result.close()
+
+    def tail():
+        has_more = page["has_more"]
+        return {"next_cursor": _encode_cursor(page["last"]) if has_more else None, "has_more": has_more}
+
+    return Response(stream_with_context(projection.stream_list(batches(), tail)), mimetype="application/json")
+
+@rsvp_bp.route("/rsvps/search", methods=["GET"])
+@replica.read_only
+def search_rsvps():
+    """Buscar convidados por prefixo do nome, e-mail ou dígitos do telefone (sem acentos)
+
+    Query string: q, limit (padrão 20), fields (como em /rsvps)
+    """
+    try:
+        try:
+            limit = min(max(int(request.args.get("limit", search.SEARCH_LIMIT)), 1), search.MAX_SEARCH_LIMIT)
+            fields = projection.parse_fields(request.args.get("fields"), projection.RSVP_FIELDS)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        return fastjson.response({
+            "success": True,
+            "data": search.search(request.args.get("q", ""), eventscope.current().id, fields, limit)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@rsvp_bp.route("/rsvps/export", methods=["GET"])
+def export_rsvps():
+    """Exportar RSVPs em CSV ou NDJSON (streaming, aceita os filtros de /rsvps)"""
+    fmt = request.args.get("format", "csv")
+    if fmt not in rsvp_io.FORMATS:
+        return jsonify({"success": False, "error": f"Formato inválido: {fmt} (use csv ou ndjson)"}), 400
+    try:
+        filters = _rsvp_filters()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return Response(
+        stream_with_context(rsvp_io.export_lines(filters, fmt)),
+        mimetype=rsvp_io.FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=rsvps.{fmt}"}
+    )
+
+@rsvp_bp.route("/rsvps/import", methods=["POST"])
+def import_rsvps():
+    """Importar RSVPs em lote de um CSV ou NDJSON enviado no corpo da requisição"""
+    try:
+        fmt = request.args.get("format") or rsvp_io.detect_format(request.content_type)
+        if fmt not in rsvp_io.READERS:
+            return jsonify({"success": False, "error": f"Formato inválido: {fmt} (use csv ou ndjson)"}), 400
+        report = rsvp_io.import_rows(rsvp_io.READERS[fmt](request.stream), eventscope.current())
+        if report.imported:
+            _publish_change("rsvps_imported", count=report.imported)
         return jsonify({
             "success": True,
-            "data": [rsvp.to_dict() for rsvp in rsvps],
-            "total": len(rsvps)
+            "data": report.to_dict(),
+            "message": f"{report.imported} RSVPs importados, {report.rejected} recusados"
         })
+    except RequestEntityTooLarge:
+        db.session.rollback()
+        return jsonify({"success": False, "error": "Arquivo maior que o limite"}), 413
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             "success": False,
             "error": str(e)
@@ -44,59 +256,88 @@ def get_all_rsvps():
 
 @rsvp_bp.route("/rsvps", methods=["POST"])
 def create_rsvp():
-    """Criar novo RSVP (do formulário do site ou admin)"""
+    """Criar novo RSVP (do formulário do site ou admin)
+
+    Cabeçalho opcional Idempotency-Key: reenvios com a mesma chave recebem
+    a resposta original, sem criar outro RSVP. hold_token (opcional): vaga
+    segurada em POST /api/dishes/<id>/hold.
+    """
+    key = request_hash = None
     try:
         data = request.get_json()
         
+        try:
+            key = idempotency.request_key()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        if key is not None:
+            request_hash = idempotency.body_hash()
+            stored = idempotency.find(key, eventscope.current().id)
+            if stored is not None:
+                return idempotency.replay(stored, request_hash)
+        
         # Validar dados obrigatórios
-        required_fields = ["name", "email", "selected_dish", "payment_type"]
+        required_fields = ["name", "email", "payment_type"]
         for field in required_fields:
             if not data.get(field):
                 return jsonify({"success": False, "error": f"Campo {field} é obrigatório"}), 400
-        
-        # Verificar se o prato ainda está disponível
-        dish_counter = DishCounter.query.filter_by(dish_name=data["selected_dish"]).first()
-        if not dish_counter:
-            # Criar contador se não existir
-            dish_counter = DishCounter(dish_name=data["selected_dish"], current_count=0, max_count=7)
-            db.session.add(dish_counter)
-        
-        if dish_counter.current_count >= dish_counter.max_count:
-            return jsonify({"success": False, "error": "Prato não disponível (limite atingido)"}), 400
-        
-        # Calcular valor total
+        if not data.get("dish_id") and not data.get("selected_dish"):
+            return jsonify({"success": False, "error": "Campo selected_dish é obrigatório"}), 400
+        event = eventscope.current()
+        dish = dishes.lookup(event.id, data.get("dish_id"), data.get("selected_dish"))
+        if dish is None:
+            return jsonify({"success": False, "error": "Prato desconhecido"}), 400
+        
+        # Calcular valor total (preços do evento)
         guests = data.get("guests", 1)
-        if data["payment_type"] == "individual":
-            total_amount = guests * 60.0
-        else:  # casal
-            total_amount = 100.0
+        total_amount = event.total_amount(data["payment_type"], guests)
         
         # Criar RSVP
         rsvp = RSVP(
+            event_id=event.id,
             name=data["name"],
             email=data["email"],
             phone=data.get("phone", ""),
             guests=guests,
-            selected_dish=data["selected_dish"],
+            dish_id=dish.id,
+            selected_dish=dish.dish_name,
             payment_type=data["payment_type"],
             total_amount=total_amount,
-            payment_proof=data.get("payment_proof", ""),
             notes=data.get("notes", "")
         )
+        _store_inline_proof(rsvp, data.get("payment_proof", ""))
+        hold_token = data.get("hold_token")
+        
+        write_queue = writequeue.get(current_app)
+        if write_queue is not None:
+            # Vai no próximo lote da fila (um commit para vários RSVPs). Antes,
+            # encerra a transação desta requisição: no SQLite ela segura o lock
+            db.session.rollback()
+            created = write_queue.submit(lambda: _insert_rsvp(rsvp, key, request_hash, hold_token), event.id)
+        else:
+            created = _insert_rsvp(rsvp, key, request_hash, hold_token)
+            if created is not None:
+                versioning.bump(event.id)
+                db.session.commit()
+        if created is None:
+            db.session.rollback()
+            return jsonify({"success": False, "error": "Prato não disponível (limite atingido)"}), 400
+        _publish_change("rsvp_created", id=created["id"])
         
-        db.session.add(rsvp)
-        
-        # Atualizar contador do prato
-        dish_counter.current_count += 1
-        
-        db.session.commit()
+        return fastjson.response(_created_payload(created), 201)
         
+    except IntegrityError as e:
+        db.session.rollback()
+        # Reenvio simultâneo com a mesma chave: o outro já gravou a resposta
+        stored = idempotency.find(key, eventscope.current().id) if key is not None else None
+        if stored is not None:
+            return idempotency.replay(stored, request_hash)
+        if _is_duplicate_email(e):
+            return jsonify({"success": False, "error": "Já existe um RSVP com este e-mail"}), 409
         return jsonify({
-            "success": True,
-            "data": rsvp.to_dict(),
-            "message": "RSVP criado com sucesso!"
-        }), 201
-        
+            "success": False,
+            "error": str(e)
+        }), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -104,54 +345,82 @@ def create_rsvp():
             "error": str(e)
         }), 500
 
+def _created_payload(created):
+    return {"success": True, "data": created, "message": "RSVP criado com sucesso!"}
+
+def _is_duplicate_email(error):
+    """IntegrityError do índice único de e-mail (UNIQUE_RSVP_EMAIL=1)"""
+    return UNIQUE_EMAIL_INDEX in str(error.orig)
+
+def _insert_rsvp(rsvp, key=None, request_hash=None, hold_token=None):
+    """Reserva a vaga e insere o RSVP na transação atual (sem commit).
+
+    Com hold_token, usa a vaga segurada em POST /api/dishes/<id>/hold.
+    Com Idempotency-Key, grava a resposta junto. Devolve o RSVP em dict,
+    ou None se o prato lotou.
+    """
+    # UPDATE condicional, atômico entre workers
+    if not holds.reserve(rsvp.event_id, rsvp.dish_id, hold_token):
+        return None
+    db.session.add(rsvp)
+    db.session.flush()  # created_at preenchido, para o bucket da série temporal
+    stats.apply_change(None, stats.facts(rsvp))
+    created = rsvp.to_dict()
+    if key is not None:
+        idempotency.remember(key, rsvp.event_id, request_hash, 201, fastjson.dumps(_created_payload(created)))
+    return created
+
 @rsvp_bp.route("/rsvps/<int:rsvp_id>", methods=["PUT"])
 def update_rsvp(rsvp_id):
     """Atualizar RSVP (admin)"""
     try:
-        rsvp = RSVP.query.get_or_404(rsvp_id)
+        rsvp = _get_rsvp_or_404(rsvp_id)
         data = request.get_json()
-        
-        old_dish = rsvp.selected_dish
-        new_dish = data.get("selected_dish", old_dish)
-        
-        # Se mudou o prato, atualizar contadores
-        if old_dish != new_dish:
-            # Decrementar contador do prato antigo
-            old_counter = DishCounter.query.filter_by(dish_name=old_dish).first()
-            if old_counter and old_counter.current_count > 0:
-                old_counter.current_count -= 1
-            
-            # Incrementar contador do prato novo
-            new_counter = DishCounter.query.filter_by(dish_name=new_dish).first()
-            if not new_counter:
-                new_counter = DishCounter(dish_name=new_dish, current_count=0, max_count=7)
-                db.session.add(new_counter)
-            
-            if new_counter.current_count >= new_counter.max_count:
+        before = stats.facts(rsvp)
+        
+        # Vagas: RSVP não recusado ocupa uma vaga do seu prato; ajustar se mudou o prato ou o status
+        new_dish = None
+        if data.get("dish_id") or data.get("selected_dish"):
+            new_dish = dishes.lookup(rsvp.event_id, data.get("dish_id"), data.get("selected_dish"))
+            if new_dish is None:
+                return jsonify({"success": False, "error": "Prato desconhecido"}), 400
+        dish_id = new_dish.id if new_dish is not None else rsvp.dish_id
+        had_slot = rsvp.payment_status != "rejected"
+        keeps_slot = data.get("payment_status", rsvp.payment_status) != "rejected"
+        moved = dish_id != rsvp.dish_id
+        if keeps_slot and (moved or not had_slot) and dish_id is not None:
+            if not dishes.reserve(dish_id):
+                db.session.rollback()
                 return jsonify({"success": False, "error": "Prato não disponível (limite atingido)"}), 400
-            
-            new_counter.current_count += 1
+        if had_slot and (moved or not keeps_slot):
+            dishes.release(rsvp.dish_id)
+        if moved:
+            rsvp.dish_id = new_dish.id
+            rsvp.selected_dish = new_dish.dish_name
         
         # Atualizar campos
         rsvp.name = data.get("name", rsvp.name)
         rsvp.email = data.get("email", rsvp.email)
         rsvp.phone = data.get("phone", rsvp.phone)
         rsvp.guests = data.get("guests", rsvp.guests)
-        rsvp.selected_dish = new_dish
         rsvp.payment_type = data.get("payment_type", rsvp.payment_type)
-        rsvp.payment_status = data.get("payment_status", rsvp.payment_status)
-        rsvp.payment_proof = data.get("payment_proof", rsvp.payment_proof)
+        status = data.get("payment_status", rsvp.payment_status)
+        if status != rsvp.payment_status:
+            rsvp.confirmed_at = datetime.utcnow() if status == "confirmed" else None
+        rsvp.payment_status = status
+        if "payment_proof" in data:
+            _store_inline_proof(rsvp, data["payment_proof"])
         rsvp.notes = data.get("notes", rsvp.notes)
         rsvp.updated_at = datetime.utcnow()
         
-        # Recalcular valor se necessário
+        # Recalcular valor se necessário (preços do evento)
         if data.get("payment_type") or data.get("guests"):
-            if rsvp.payment_type == "individual":
-                rsvp.total_amount = rsvp.guests * 60.0
-            else:
-                rsvp.total_amount = 100.0
+            rsvp.total_amount = eventscope.current().total_amount(rsvp.payment_type, rsvp.guests)
         
+        stats.apply_change(before, stats.facts(rsvp))
+        versioning.bump(rsvp.event_id)
         db.session.commit()
+        _publish_change("rsvp_updated", id=rsvp.id)
         
         return jsonify({
             "success": True,
@@ -159,6 +428,14 @@ def update_rsvp(rsvp_id):
             "message": "RSVP atualizado com sucesso!"
         })
         
+    except IntegrityError as e:
+        db.session.rollback()
+        if _is_duplicate_email(e):
+            return jsonify({"success": False, "error": "Já existe um RSVP com este e-mail"}), 409
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -170,15 +447,18 @@ def update_rsvp(rsvp_id):
 def delete_rsvp(rsvp_id):
     """Deletar RSVP (admin)"""
     try:
-        rsvp = RSVP.query.get_or_404(rsvp_id)
+        rsvp = _get_rsvp_or_404(rsvp_id)
         
-        # Decrementar contador do prato
-        dish_counter = DishCounter.query.filter_by(dish_name=rsvp.selected_dish).first()
-        if dish_counter and dish_counter.current_count > 0:
-            dish_counter.current_count -= 1
+        # Liberar a vaga do prato (RSVP recusado não ocupa vaga)
+        if rsvp.payment_status != "rejected":
+            dishes.release(rsvp.dish_id)
         
+        stats.apply_change(stats.facts(rsvp), None)
+        changes.record_deletions(rsvp.event_id, [(rsvp_id, rsvp.dish_id)])
+        versioning.bump(rsvp.event_id)
         db.session.delete(rsvp)
         db.session.commit()
+        _publish_change("rsvp_deleted", id=rsvp_id)
         
         return jsonify({
             "success": True,
@@ -192,25 +472,33 @@ def delete_rsvp(rsvp_id):
             "error": str(e)
         }), 500
 
+@rsvp_bp.route("/event", methods=["GET"])
+def get_event():
+    """Config do evento (nome e preços) para o formulário"""
+    return jsonify({
+        "success": True,
+        "data": eventscope.current().to_dict()
+    })
+
 @rsvp_bp.route('/dishes', methods=['GET'])
+@replica.read_only
+@conditional
 def get_dish_status():
-    """Obter status de todos os pratos"""
+    """Obter status de todos os pratos (somente leitura, com cache por versão)
+
+    Query string: fields (ex.: id,available)
+    """
     try:
-        # Inicializar contadores se não existirem
-        for dish in AVAILABLE_DISHES:
-            counter = DishCounter.query.filter_by(dish_name=dish).first()
-            if not counter:
-                counter = DishCounter(dish_name=dish, current_count=0, max_count=7)
-                db.session.add(counter)
-        
-        db.session.commit()
-        
-        # Buscar todos os contadores
-        counters = DishCounter.query.all()
-        
-        return jsonify({
+        try:
+            fields = projection.parse_fields(request.args.get("fields"), dishes.DISH_FIELDS)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        data = _dish_list(eventscope.current())
+        if len(fields) < len(dishes.DISH_FIELDS):
+            data = [{name: dish[name] for name in fields} for dish in data]
+        return fastjson.response({
             'success': True,
-            'data': [counter.to_dict() for counter in counters]
+            'data': data
         })
         
     except Exception as e:
@@ -219,30 +507,79 @@ def get_dish_status():
             "error": str(e)
         }), 500
 
+@rsvp_bp.route("/dishes/<int:dish_id>/hold", methods=["POST"])
+def hold_dish(dish_id):
+    """Segurar uma vaga do prato enquanto o convidado paga (validade em holds.TTL)
+
+    Corpo opcional: {"replace": "<token>"} devolve antes a vaga de um hold
+    anterior (troca de prato). O token vai em hold_token no POST /api/rsvps.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        event = eventscope.current()
+        if dishes.lookup(event.id, dish_id) is None:
+            return jsonify({"success": False, "error": "Prato desconhecido"}), 404
+        released = bool(data.get("replace")) and holds.release(data["replace"], event.id)
+        try:
+            hold = holds.create(event.id, dish_id, request.remote_addr)
+        except holds.TooManyHolds as e:
+            db.session.commit()  # A vaga devolvida por replace vale mesmo assim
+            if released:
+                _publish_change("dish_hold_released")
+            return jsonify({"success": False, "error": str(e)}), 429
+        if hold is None:
+            db.session.commit()  # Vaga antiga devolvida e holds vencidos limpos valem mesmo assim
+            if released:
+                _publish_change("dish_hold_released")
+            return jsonify({"success": False, "error": "Prato não disponível (limite atingido)"}), 400
+        db.session.commit()
+        _publish_change("dish_held", dish_id=dish_id)
+
+        return jsonify({
+            "success": True,
+            "data": {
+                "token": hold.token,
+                "dish_id": hold.dish_id,
+                "expires_at": hold.expires_at.isoformat(),
+                "ttl_seconds": int(holds.TTL.total_seconds()),
+            }
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@rsvp_bp.route("/dishes/holds/<token>", methods=["DELETE"])
+def release_dish_hold(token):
+    """Devolver a vaga segurada (troca de prato ou desistência)"""
+    try:
+        if not holds.release(token, eventscope.current().id):
+            db.session.rollback()
+            return jsonify({"success": False, "error": "Hold não encontrado (já usado ou vencido)"}), 404
+        db.session.commit()
+        _publish_change("dish_hold_released")
+
+        return jsonify({"success": True, "message": "Vaga devolvida"})
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @rsvp_bp.route("/stats", methods=["GET"])
+@replica.read_only
+@conditional
 def get_stats():
+    """Estatísticas gerais (lidas do snapshot materializado)"""
     try:
-        total_rsvps = RSVP.query.count()
-        confirmed_payments = RSVP.query.filter_by(payment_status='confirmed').count()
-        pending_payments = RSVP.query.filter_by(payment_status='pending').count()
-        total_guests = db.session.query(db.func.sum(RSVP.guests)).scalar() or 0
-        total_revenue = db.session.query(db.func.sum(RSVP.total_amount)).filter_by(payment_status='confirmed').scalar() or 0
-        # Pratos mais populares
-        dish_stats = db.session.query(
-            RSVP.selected_dish,
-            db.func.count(RSVP.id).label("count")
-        ).group_by(RSVP.selected_dish).order_by(db.func.count(RSVP.id).desc()).all()
-        
         return jsonify({
             'success': True,
-            'data': {
-                'total_rsvps': total_rsvps,
-                'confirmed_payments': confirmed_payments,
-                'pending_payments': pending_payments,
-                'total_guests': total_guests,
-                'total_revenue': total_revenue,
-                'dish_stats': [{'dish': dish, 'count': count} for dish, count in dish_stats]
-            }
+            'data': stats.read_stats(eventscope.current().id)
         })
         
     except Exception as e:
@@ -251,58 +588,185 @@ def get_stats():
             "error": str(e)
         }), 500
 
-@rsvp_bp.route("/init", methods=["POST"])
-def initialize_dishes():
-    """Inicializar contadores de pratos""" 
+@rsvp_bp.route("/stats/timeseries", methods=["GET"])
+@replica.read_only
+@conditional
+def get_stats_timeseries():
+    """Série temporal do evento (buckets pré-agregados em rollups.py)
+
+    Query string: granularity (hour ou day, padrão hour), since, until (ISO).
+    O custo depende do número de buckets, não do número de RSVPs.
+    """
     try:
-        for dish in AVAILABLE_DISHES:
-            counter = DishCounter.query.filter_by(dish_name=dish).first()
-            if not counter:
-                counter = DishCounter(dish_name=dish, current_count=0, max_count=7)
-                db.session.add(counter)
-        
-        db.session.commit()
-        
+        granularity = request.args.get("granularity", "hour")
+        if granularity not in rollups.GRANULARITIES:
+            return jsonify({"success": False, "error": "granularity deve ser hour ou day"}), 400
+        try:
+            since = _parse_date_arg("since")
+            until = _parse_date_arg("until")
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        if until and len(request.args["until"]) == 10:
+            until += timedelta(days=1)  # Só a data: inclui o dia inteiro
         return jsonify({
-            'success': True,
-            'message': 'Contadores de pratos inicializados!'
+            "success": True,
+            "data": rollups.series(eventscope.current().id, granularity, since, until)
         })
-        
+
     except Exception as e:
-        db.session.rollback()
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+@rsvp_bp.route("/admin/changes", methods=["GET"])
+def get_admin_changes():
+    """RSVPs criados/alterados/excluídos desde o cursor + stats e pratos (painel admin)
 
+    Query string: since (cursor da resposta anterior; sem ele, reset=true e só o cursor)
+    """
+    try:
+        event = eventscope.current()
+        try:
+            result = changes.since(request.args.get("since") or None, event.id)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        if result["changed"]:
+            result["stats"] = stats.read_stats(event.id)
+            result["dishes"] = _dish_list(event)
+        return fastjson.response({"success": True, **result})
+        
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
 
+def _watched_version(event_id):
+    """Versão lida pelo watcher do SSE; antes, vence os holds (convidados conectados não fazem polling)"""
+    try:
+        holds.expire_due()
+    except Exception:
+        db.session.rollback()
+    return versioning.current(event_id)[0]
 
+@rsvp_bp.route("/events", methods=["GET"])
+def stream_events():
+    """Stream SSE com stats e pratos do evento a cada mudança (substitui o polling)"""
+    event = eventscope.current()
+    broker = broker_for(event.id)
+    try:
+        q = broker.subscribe()
+    except StreamsFull as e:
+        # Sem thread sobrando para mais um stream: o cliente fica no polling
+        db.session.remove()
+        response = jsonify({"success": False, "error": str(e)})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(STREAMS_FULL_RETRY_SECONDS)
+        return response
+    try:
+        first_message = format_event("change", _change_payload("snapshot", event))
+        broker.watch(current_app._get_current_object(), lambda: _watched_version(event.id),
+                     lambda: _change_payload("remote_change", event))
+    except Exception:
+        broker.unsubscribe(q)
+        raise
+    finally:
+        # A conexão fica aberta por minutos: não segura uma conexão do pool
+        db.session.remove()
+    return Response(
+        broker.stream(q, first_message),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-@rsvp_bp.route("/rsvps/<int:rsvp_id>/accept", methods=["POST"])
-def accept_rsvp(rsvp_id):
-    """Aceitar RSVP (admin)"""
+@rsvp_bp.route("/rsvps/<int:rsvp_id>/payment-proof", methods=["POST"])
+def upload_payment_proof(rsvp_id):
+    """Enviar comprovante (multipart com o campo "file", ou o arquivo direto no corpo)"""
     try:
-        rsvp = RSVP.query.get_or_404(rsvp_id)
-        rsvp.payment_status = "confirmed"
+        rsvp = _get_rsvp_or_404(rsvp_id)
+        if request.mimetype == "multipart/form-data":
+            upload = request.files.get("file")
+            if upload is None:
+                return jsonify({"success": False, "error": "Campo file é obrigatório"}), 400
+            stream = upload.stream
+        else:
+            stream = request.stream
+        try:
+            digest, size = blobstore.store.save_stream(stream)
+        except blobstore.BlobTooLarge as e:
+            return jsonify({"success": False, "error": str(e)}), 413
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        rsvp.payment_proof_sha256 = digest
+        rsvp.payment_proof = ""
         rsvp.updated_at = datetime.utcnow()
-        
-        # Atualizar contadores de pratos e estatísticas
-        dish_counter = DishCounter.query.filter_by(dish_name=rsvp.selected_dish).first()
-        if dish_counter:
-            # Aumentar o contador apenas se o RSVP não estava confirmado antes
-            if rsvp.payment_status != "confirmed":
-                dish_counter.current_count += 1
-            db.session.add(dish_counter)
-
-        db.session.add(rsvp)
+        versioning.bump(rsvp.event_id)
         db.session.commit()
-        db.session.refresh(rsvp)
-        
+        _publish_change("rsvp_updated", id=rsvp.id)
+
         return jsonify({
             "success": True,
             "data": rsvp.to_dict(),
-            "message": "RSVP aceito com sucesso!"
+            "message": "Comprovante enviado!"
+        }), 201
+
+    except RequestEntityTooLarge:
+        # Envio sem Content-Length (chunked) que passou do limite durante a leitura
+        db.session.rollback()
+        return jsonify({"success": False, "error": "Arquivo maior que o limite"}), 413
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+def _send_blob(path, mimetype, etag):
+    # Conteúdo endereçado pelo hash nunca muda: cache longo e imutável, com Range/ETag do send_file
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=etag, max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@rsvp_bp.route("/proofs/<digest>", methods=["GET"])
+def get_payment_proof(digest):
+    """Baixar um comprovante pelo hash"""
+    if not blobstore.store.exists(digest):
+        return jsonify({"success": False, "error": "Comprovante não encontrado"}), 404
+    return _send_blob(blobstore.store.path(digest), blobstore.store.mimetype(digest), digest)
+
+@rsvp_bp.route("/proofs/<digest>/thumbnail", methods=["GET"])
+def get_payment_proof_thumbnail(digest):
+    """Miniatura JPEG do comprovante (gerada uma vez e guardada em disco)"""
+    if not blobstore.store.exists(digest):
+        return jsonify({"success": False, "error": "Comprovante não encontrado"}), 404
+    thumb_path = blobstore.store.thumbnail(digest)
+    if thumb_path is None:
+        return jsonify({"success": False, "error": "Miniatura indisponível para este arquivo"}), 404
+    return _send_blob(thumb_path, "image/jpeg", f"{digest}-thumb")
+
+@rsvp_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Métricas por rota e de SQL no formato texto do Prometheus"""
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+@rsvp_bp.route("/init", methods=["POST"])
+def initialize_dishes():
+    """Inicializar contadores de pratos (cardápio padrão no evento)""" 
+    try:
+        created = dishes.seed_dishes(eventscope.current())
+        if created:
+            versioning.bump(eventscope.current().id)
+        db.session.commit()
+        if created:
+            _publish_change("dishes_initialized")
+        
+        return jsonify({
+            'success': True,
+            'message': 'Contadores de pratos inicializados!',
+            'created': created
         })
         
     except Exception as e:
@@ -312,30 +776,35 @@ def accept_rsvp(rsvp_id):
             "error": str(e)
         }), 500
 
+@rsvp_bp.route("/rsvps/<int:rsvp_id>/accept", methods=["POST"])
+def accept_rsvp(rsvp_id):
+    """Aceitar RSVP (admin)"""
+    return _apply_single("accept", rsvp_id, "rsvp_accepted", "RSVP aceito com sucesso!")
+
 @rsvp_bp.route("/rsvps/<int:rsvp_id>/reject", methods=["POST"])
 def reject_rsvp(rsvp_id):
     """Recusar RSVP (admin)"""
+    return _apply_single("reject", rsvp_id, "rsvp_rejected", "RSVP recusado!")
+
+def _apply_single(action, rsvp_id, change, message):
+    """Aceitar/recusar um RSVP com as mesmas regras de vaga das ações em lote (bulk.apply)"""
     try:
-        rsvp = RSVP.query.get_or_404(rsvp_id)
-        
-        # Se o RSVP estava confirmado, decrementar o contador do prato
-        if rsvp.payment_status == "confirmed":
-            dish_counter = DishCounter.query.filter_by(dish_name=rsvp.selected_dish).first()
-            if dish_counter and dish_counter.current_count > 0:
-                dish_counter.current_count -= 1
-            db.session.add(dish_counter)
-
-        rsvp.payment_status = "rejected"
-        rsvp.updated_at = datetime.utcnow()
-        
-        db.session.add(rsvp)
+        rsvp = _get_rsvp_or_404(rsvp_id)
+        (result,), changed = bulk.apply(action, [rsvp_id], rsvp.event_id)
+        if not result["success"]:
+            db.session.rollback()
+            return jsonify({"success": False, "error": result["error"]}), 400
+        if changed:
+            versioning.bump(rsvp.event_id)
         db.session.commit()
         db.session.refresh(rsvp)
+        if changed:
+            _publish_change(change, id=rsvp.id)
         
         return jsonify({
             "success": True,
             "data": rsvp.to_dict(),
-            "message": "RSVP recusado!"
+            "message": message
         })
         
     except Exception as e:
@@ -345,3 +814,179 @@ def reject_rsvp(rsvp_id):
             "error": str(e)
         }), 500
 
+@rsvp_bp.route("/rsvps/bulk", methods=["POST"])
+def bulk_rsvps():
+    """Aceitar, recusar ou excluir vários RSVPs em uma transação (admin)
+
+    Corpo: {"ids": [1, 2, 3], "action": "accept" | "reject" | "delete"}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        action = data.get("action")
+        ids = data.get("ids")
+        if action not in bulk.BULK_ACTIONS:
+            return jsonify({"success": False, "error": f"Ação inválida: {action} (use accept, reject ou delete)"}), 400
+        if not isinstance(ids, list) or not ids or \
+                not all(isinstance(rsvp_id, int) and not isinstance(rsvp_id, bool) for rsvp_id in ids):
+            return jsonify({"success": False, "error": "Campo ids deve ser uma lista de ids"}), 400
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > bulk.MAX_BULK_IDS:
+            return jsonify({"success": False, "error": f"No máximo {bulk.MAX_BULK_IDS} RSVPs por vez"}), 400
+
+        results, changed = bulk.apply(action, ids, eventscope.current().id)
+        if changed:
+            versioning.bump(eventscope.current().id)
+        db.session.commit()
+        if changed:
+            _publish_change("rsvps_bulk", action=action, count=changed)
+
+        return jsonify({
+            "success": True,
+            "data": results,
+            "message": f"{changed} RSVPs atualizados"
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@rsvp_bp.cli.command("rebuild-stats")
+def rebuild_stats_command():
+    """Recalcula o snapshot de estatísticas de cada evento a partir da tabela RSVP"""
+    for event_id in eventscope.all_ids():
+        snapshot = stats.rebuild(event_id)
+        click.echo(f"Evento {event_id}: {snapshot.total_rsvps} RSVPs, "
+                   f"{snapshot.total_guests} convidados, R$ {snapshot.total_revenue:.2f} confirmados")
+        versioning.bump(event_id)
+    db.session.commit()
+
+@rsvp_bp.cli.command("rebuild-rollups")
+@click.option("--event", "slug", help="Só este evento (padrão: todos)")
+def rebuild_rollups_command(slug):
+    """Recalcula as séries por hora/dia (/api/stats/timeseries) a partir da tabela RSVP"""
+    try:
+        event_ids = [eventscope.get(slug).id] if slug else eventscope.all_ids()
+    except eventscope.UnknownEvent as e:
+        raise click.ClickException(str(e))
+    for event_id in event_ids:
+        buckets = rollups.rebuild(event_id)
+        click.echo(f"Evento {event_id}: {buckets} buckets")
+        versioning.bump(event_id)
+    db.session.commit()
+
+@rsvp_bp.cli.command("sweep-holds")
+@click.option("--every", type=float, default=0, help="Repete a cada N segundos (0: uma vez)")
+def sweep_holds_command(every):
+    """Apaga os holds de prato vencidos e devolve as vagas"""
+    while True:
+        swept = holds.sweep_all()
+        click.echo(f"{datetime.utcnow().isoformat(timespec='seconds')} {swept} holds vencidos removidos")
+        if every <= 0:
+            return
+        time.sleep(every)
+
+@rsvp_bp.cli.command("create-event")
+@click.argument("slug")
+@click.argument("name")
+@click.option("--price-individual", default=eventscope.DEFAULT_PRICE_INDIVIDUAL, show_default=True)
+@click.option("--price-couple", default=eventscope.DEFAULT_PRICE_COUPLE, show_default=True)
+@click.option("--max-count", default=dishes.DEFAULT_MAX_COUNT, show_default=True, help="Vagas por prato")
+@click.option("--menu", type=click.Path(exists=True, dir_okay=False),
+              help="Arquivo com um prato por linha (padrão: o cardápio padrão)")
+def create_event_command(slug, name, price_individual, price_couple, max_count, menu):
+    """Cria um evento (acessado com ?event=<slug>) com cardápio, preços e vagas próprios"""
+    try:
+        eventscope.get(slug)
+    except eventscope.UnknownEvent:
+        pass
+    else:
+        raise click.ClickException(f"Evento já existe: {slug}")
+    names = None
+    if menu:
+        with open(menu, encoding="utf-8") as fh:
+            names = [line.strip() for line in fh if line.strip()]
+    event = eventscope.create(slug, name, price_individual, price_couple, max_count)
+    created = dishes.seed_dishes(event, names)
+    stats.rebuild(event.id)
+    versioning.bump(event.id)
+    db.session.commit()
+    click.echo(f"Evento {slug} criado (id {event.id}) com {created} pratos")
+
+@rsvp_bp.cli.command("reconcile-dishes")
+@click.option("--incremental", is_flag=True, help="Só os pratos mexidos desde a última conferência")
+@click.option("--dry-run", is_flag=True, help="Só mostra as divergências, sem corrigir")
+@click.option("--every", type=float, default=0, help="Repete a cada N segundos (0: uma vez)")
+def reconcile_dishes_command(incremental, dry_run, every):
+    """Confere os contadores de vagas dos pratos com a tabela RSVP e corrige os divergentes"""
+    while True:
+        drifts, checked = reconcile.reconcile(incremental=incremental, dry_run=dry_run)
+        scope = "todos os pratos" if checked is None else f"{checked} pratos"
+        for drift in drifts:
+            click.echo(f"{drift.dish_name}: contador {drift.stored}, reais {drift.actual} (máximo {drift.max_count})")
+        action = "encontradas" if dry_run else "corrigidas"
+        click.echo(f"{datetime.utcnow().isoformat(timespec='seconds')} {scope} conferidos, "
+                   f"{len(drifts)} divergências {action}")
+        if every <= 0:
+            break
+        time.sleep(every)
+
+@rsvp_bp.cli.command("sync-replica")
+def sync_replica_command():
+    """Copia o banco primário para a réplica (dev local com dois arquivos SQLite)"""
+    if not replica.enabled():
+        raise click.ClickException("DATABASE_READ_URL não definida")
+    try:
+        path = replica.sync_sqlite()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Réplica atualizada: {path}")
+
+@rsvp_bp.cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(sorted(rsvp_io.READERS)), help="Padrão: pela extensão do arquivo")
+@click.option("--chunk-size", default=rsvp_io.IMPORT_CHUNK_SIZE, show_default=True)
+@click.option("--event", "event_slug", default=eventscope.DEFAULT_EVENT_SLUG, show_default=True)
+def import_command(path, fmt, chunk_size, event_slug):
+    """Importa RSVPs de um arquivo CSV ou NDJSON"""
+    fmt = fmt or rsvp_io.detect_format(None, path)
+    try:
+        event = eventscope.get(event_slug)
+    except eventscope.UnknownEvent as e:
+        raise click.ClickException(str(e))
+    with open(path, "rb") as fh:
+        report = rsvp_io.import_rows(rsvp_io.READERS[fmt](fh), event, chunk_size=chunk_size)
+    for error in report.errors:
+        click.echo(f"linha {error['line']}: {error['error']}", err=True)
+    click.echo(f"{report.imported} RSVPs importados, {report.rejected} recusados (de {report.total_rows} linhas)")
+
+@rsvp_bp.cli.command("migrate-proofs")
+@click.option("--batch-size", default=100, show_default=True)
+def migrate_proofs_command(batch_size):
+    """Move comprovantes gravados inline (base64) na tabela RSVP para o blobstore"""
+    inline = db.or_(RSVP.payment_proof.like("data:%"), db.func.length(RSVP.payment_proof) > 200)
+    moved = 0
+    last_id = 0
+    while True:
+        rsvps = RSVP.query.filter(inline, RSVP.payment_proof_sha256.is_(None), RSVP.id > last_id).order_by(
+            RSVP.id
+        ).limit(batch_size).all()
+        if not rsvps:
+            break
+        last_id = rsvps[-1].id
+        changed = set()
+        for rsvp in rsvps:
+            if not blobstore.looks_inline(rsvp.payment_proof):
+                continue
+            try:
+                _store_inline_proof(rsvp, rsvp.payment_proof)
+                moved += 1
+                changed.add(rsvp.event_id)
+            except ValueError as e:
+                click.echo(f"RSVP {rsvp.id}: {e}", err=True)
+        for event_id in sorted(changed, key=str):
+            versioning.bump(event_id)
+        db.session.commit()
+    click.echo(f"{moved} comprovantes movidos para {blobstore.store.root}")
@@ -0,0 +1,306 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from models.rsvp import db, RSVP, DishCounter, PAYMENT_STATUSES, UNIQUE_EMAIL_INDEX, UNIQUE_RSVP_EMAIL
+import dishes
+import search
+import stats
+import versioning
+
+# -------------------------------------------------
+# Importação e exportação em lote de RSVPs (CSV / NDJSON)
+# A importação lê o arquivo em streaming, valida cada linha e grava em
+# transações de IMPORT_CHUNK_SIZE linhas: um INSERT em lote, um UPDATE
+# condicional de vagas por prato e uma atualização do snapshot por lote.
+# Com UNIQUE_RSVP_EMAIL, e-mails repetidos (no evento ou no próprio lote)
+# são recusados por linha antes do INSERT; se mesmo assim o índice único
+# recusar o lote (RSVP criado no meio), o lote é gravado linha a linha em
+# SAVEPOINTs e só as linhas em conflito são recusadas.
+# A exportação percorre o banco com cursor no servidor (yield_per).
+# -------------------------------------------------
+IMPORT_CHUNK_SIZE = 500
+MAX_IMPORT_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(100 * 1024 * 1024)))  # Corpo de /api/rsvps/import
+EXPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+PAYMENT_TYPES = {"individual": "individual", "casal": "casal", "couple": "casal"}
+EXPORT_COLUMNS = ["id", "name", "email", "phone", "guests", "dish_id", "selected_dish", "payment_type",
+                  "total_amount", "payment_status", "payment_proof", "created_at", "updated_at", "confirmed_at",
+                  "notes"]
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+DUPLICATE_EMAIL_ERROR = "E-mail já cadastrado neste evento"
+
+
+class RowError(ValueError):
+    pass
+
+
+# -------------------------------------------------
+# Leitura
+# -------------------------------------------------
+def read_csv(stream):
+    """Gera (linha, dict) de um arquivo CSV binário, sem carregá-lo inteiro"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_ndjson(stream):
+    """Gera (linha, dict) de um arquivo NDJSON binário (um objeto JSON por linha)"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    for line_num, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_num, RowError(f"JSON inválido: {e}")
+            continue
+        yield line_num, row if isinstance(row, dict) else RowError("A linha não é um objeto JSON")
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+def detect_format(content_type, filename=None):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl") or \
+            (filename or "").endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+
+def _parse_datetime(values, name):
+    value = values.get(name)
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        raise RowError(f"Data inválida em {name}: {value}")
+
+
+def _validate(row, event, known_dishes):
+    """Converte uma linha do arquivo nos valores de uma nova linha de RSVP do evento
+
+    known_dishes: {nome do prato: id} do cardápio do evento
+    """
+    values = {key: (value.strip() if isinstance(value, str) else value) for key, value in row.items() if key}
+    for field in ("name", "email", "selected_dish", "payment_type"):
+        if not values.get(field):
+            raise RowError(f"Campo {field} é obrigatório")
+    if values["selected_dish"] not in known_dishes:
+        raise RowError(f"Prato desconhecido: {values['selected_dish']}")
+    payment_type = PAYMENT_TYPES.get(str(values["payment_type"]).lower())
+    if payment_type is None:
+        raise RowError(f"Tipo de pagamento inválido: {values['payment_type']}")
+    try:
+        guests = int(values.get("guests") or 1)
+    except (TypeError, ValueError):
+        raise RowError(f"Número de convidados inválido: {values.get('guests')}")
+    if guests < 1:
+        raise RowError("O número de convidados deve ser pelo menos 1")
+    status = values.get("payment_status") or "pending"
+    if status not in PAYMENT_STATUSES:
+        raise RowError(f"Status de pagamento inválido: {status}")
+    created_at = _parse_datetime(values, "created_at") or datetime.utcnow()
+    confirmed_at = None
+    if status == "confirmed":
+        # Sem confirmed_at (arquivos antigos): conta como confirmado na criação
+        confirmed_at = _parse_datetime(values, "confirmed_at") or created_at
+
+    return {
+        "event_id": event.id,
+        "name": values["name"],
+        "email": values["email"],
+        "phone": values.get("phone") or "",
+        "guests": guests,
+        "dish_id": known_dishes[values["selected_dish"]],
+        "selected_dish": values["selected_dish"],
+        "payment_type": payment_type,
+        "total_amount": event.total_amount(payment_type, guests),
+        "payment_status": status,
+        "payment_proof": values.get("payment_proof") or "",
+        "notes": values.get("notes") or "",
+        "created_at": created_at,
+        "confirmed_at": confirmed_at,
+        "updated_at": datetime.utcnow(),  # Gravado agora: entra em /api/admin/changes
+        **search.columns(values["name"], values["email"], values.get("phone")),
+    }
+
+
+# -------------------------------------------------
+# Importação
+# -------------------------------------------------
+class ImportReport:
+    def __init__(self):
+        self.total_rows = 0
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line, error):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": str(error)})
+
+    def to_dict(self):
+        return {
+            "total_rows": self.total_rows,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+            "errors_truncated": self.rejected > len(self.errors),
+        }
+
+
+def import_rows(rows, event, chunk_size=IMPORT_CHUNK_SIZE):
+    """Importa (linha, dict) no evento em transações de chunk_size linhas. Retorna um ImportReport."""
+    report = ImportReport()
+    known_dishes = dict(db.session.execute(
+        db.select(DishCounter.dish_name, DishCounter.id).where(DishCounter.event_id == event.id)
+    ).all())
+    db.session.rollback()
+
+    chunk = []
+    for line, row in rows:
+        report.total_rows += 1
+        if isinstance(row, Exception):
+            report.reject(line, row)
+            continue
+        try:
+            chunk.append((line, _validate(row, event, known_dishes)))
+        except RowError as e:
+            report.reject(line, e)
+            continue
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, report)
+            chunk = []
+    if chunk:
+        _import_chunk(chunk, report)
+    return report
+
+
+def _duplicate_emails(chunk):
+    """Linhas cujo e-mail já existe no evento ou aparece antes no mesmo lote (UNIQUE_RSVP_EMAIL)"""
+    email = db.func.lower(RSVP.email)
+    taken = set(db.session.scalars(
+        db.select(email).where(RSVP.event_id == chunk[0][1]["event_id"],
+                               email.in_({values["email"].lower() for _line, values in chunk}))
+    ))
+    duplicates = set()
+    for line, values in chunk:
+        if values["email"].lower() in taken:
+            duplicates.add(line)
+        else:
+            taken.add(values["email"].lower())
+    return duplicates
+
+
+def _insert_rows(rows):
+    """INSERT em lote de (linha, valores). Se o lote viola um índice único, grava linha a linha
+    em SAVEPOINTs. Retorna (linhas gravadas, {linha: erro})."""
+    if not rows:
+        return rows, {}
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(RSVP), [values for _line, values in rows])
+        return rows, {}
+    except IntegrityError:
+        pass
+    inserted, failed = [], {}
+    for line, values in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(RSVP), [values])
+            inserted.append((line, values))
+        except IntegrityError as e:
+            failed[line] = DUPLICATE_EMAIL_ERROR if UNIQUE_EMAIL_INDEX in str(e.orig) else f"Falha ao gravar: {e.orig}"
+    return inserted, failed
+
+
+def _import_chunk(chunk, report):
+    try:
+        duplicates = _duplicate_emails(chunk) if UNIQUE_RSVP_EMAIL else set()
+        rows = [(line, values) for line, values in chunk if line not in duplicates]
+
+        # Vagas: um UPDATE condicional por prato (RSVPs recusados não ocupam vaga)
+        wanted = {}
+        for line, values in rows:
+            if values["payment_status"] != "rejected":
+                wanted.setdefault(values["dish_id"], []).append(line)
+        full = set()
+        for dish_id, lines in wanted.items():
+            granted = dishes.reserve_many(dish_id, len(lines))
+            full.update(lines[granted:])
+
+        accepted, failed = _insert_rows([(line, values) for line, values in rows if line not in full])
+        # Vagas das linhas que o banco recusou voltam para o prato
+        released = {}
+        for line, values in rows:
+            if line in failed and values["payment_status"] != "rejected":
+                released[values["dish_id"]] = released.get(values["dish_id"], 0) + 1
+        dishes.release_many(released)
+        accepted = [values for _line, values in accepted]
+        if accepted:
+            stats.apply_changes([
+                (None, stats.RsvpFacts(values["event_id"], values["payment_status"], values["guests"],
+                                       values["total_amount"], values["dish_id"], values["created_at"],
+                                       values["confirmed_at"]))
+                for values in accepted
+            ])
+            versioning.bump(accepted[0]["event_id"])
+        db.session.commit()
+        report.imported += len(accepted)
+        for line in sorted(full):
+            report.reject(line, "Prato não disponível (limite atingido)")
+        for line in sorted(duplicates):
+            report.reject(line, DUPLICATE_EMAIL_ERROR)
+        for line, error in sorted(failed.items()):
+            report.reject(line, error)
+    except Exception as e:
+        db.session.rollback()
+        for line, _values in chunk:
+            report.reject(line, f"Falha ao gravar o lote: {e}")
+
+
+# -------------------------------------------------
+# Exportação
+# -------------------------------------------------
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_lines(filters, fmt):
+    """Gera o arquivo de exportação aos poucos (memória constante)"""
+    # Nome do prato pelo JOIN com dish_counter (a coluna selected_dish é só uma cópia legada)
+    columns = [DishCounter.dish_name.label(name) if name == "selected_dish" else getattr(RSVP, name)
+               for name in EXPORT_COLUMNS]
+    stmt = db.select(*columns).outerjoin(DishCounter, DishCounter.id == RSVP.dish_id).where(
+        *filters
+    ).order_by(RSVP.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    result = db.session.execute(stmt)
+    try:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            # BOM para o Excel abrir como UTF-8
+            writer.writerow(EXPORT_COLUMNS)
+            yield "\ufeff" + buffer.getvalue()
+            for partition in result.partitions():
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows([[_export_value(v) for v in row] for row in partition])
+                yield buffer.getvalue()
+        else:
+            for partition in result.partitions():
+                yield "".join(
+                    json.dumps({name: _export_value(v) for name, v in zip(EXPORT_COLUMNS, row)},
+                               ensure_ascii=False) + "\n"
+                    for row in partition
+                )
+    finally:
+        result.close()
@@ -0,0 +1,231 @@
+import hashlib
+
+from sqlalchemy import bindparam, case, func, inspect, literal, select
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+
+from models.rsvp import (db, Event, RSVP, DishCounter, DishStat, IdempotencyKey, RsvpTombstone, SchemaVersion,
+                         StatsSnapshot, UNIQUE_EMAIL_INDEX, UNIQUE_RSVP_EMAIL)
+import dishes
+import eventscope
+import search
+
+# -------------------------------------------------
+# Esquema do banco
+# create_all() só cria tabelas que não existem; colunas e índices novos em
+# tabelas antigas (bancos já em produção) precisam ser criados à parte.
+# Na inicialização, o hash do DDL esperado é comparado com o gravado em
+# schema_version: se bater, nada de create_all/inspeção (uma consulta só).
+# -------------------------------------------------
+SCHEMA_VERSION_ID = 1
+# Índices substituídos pelas versões com event_id na frente (multi-evento)
+OBSOLETE_INDEXES = (
+    "ix_rsvp_created_at_id", "ix_rsvp_payment_status", "ix_rsvp_email", "ix_rsvp_updated_at",
+    "ix_rsvp_search_name", "ix_rsvp_search_email", "ix_rsvp_search_phone", "ix_rsvp_tombstone_deleted_at",
+    "ux_rsvp_email",
+)
+
+
+def fingerprint(dialect):
+    """Hash do DDL (tabelas e índices) que os modelos geram para o dialeto"""
+    digest = hashlib.sha1()
+    for table in db.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    return digest.hexdigest()
+
+
+def pending_fingerprint():
+    """Hash do esquema atual se o banco precisa de upgrade(); None se já está em dia"""
+    expected = fingerprint(db.engine.dialect)
+    try:
+        stored = db.session.scalar(
+            db.select(SchemaVersion.fingerprint).where(SchemaVersion.id == SCHEMA_VERSION_ID)
+        )
+    except (OperationalError, ProgrammingError):
+        stored = None  # Banco novo, ou anterior ao controle de versão do esquema
+    db.session.rollback()
+    return None if stored == expected else expected
+
+
+def mark_upgraded(value):
+    """Grava o hash do esquema aplicado. Não faz commit."""
+    db.session.merge(SchemaVersion(id=SCHEMA_VERSION_ID, fingerprint=value))
+
+
+def _reset_derived_tables(conn):
+    """Recria dish_stat se ainda for do formato antigo (por nome). O conteúdo é recalculado
+    por stats.ensure_snapshot(), já que o snapshot é apagado junto."""
+    inspector = inspect(conn)
+    if not inspector.has_table(DishStat.__tablename__):
+        return
+    columns = {column["name"] for column in inspector.get_columns(DishStat.__tablename__)}
+    if "dish_id" not in columns:
+        DishStat.__table__.drop(conn)
+        if inspector.has_table(StatsSnapshot.__tablename__):
+            conn.execute(StatsSnapshot.__table__.delete())
+
+
+def _take_global_idempotency_keys(conn):
+    """Lê e apaga idempotency_key do formato antigo (chave global, sem event_id); create_all a
+    recria com a chave por evento. Retorna as linhas antigas (poucas: valem 24 h), ou None."""
+    table = IdempotencyKey.__table__
+    inspector = inspect(conn)
+    if not inspector.has_table(table.name):
+        return None
+    if "event_id" in {column["name"] for column in inspector.get_columns(table.name)}:
+        return None
+    # Colunas do modelo (sem event_id): created_at volta como datetime também no SQLite
+    old_columns = [column for column in table.columns if column.name != "event_id"]
+    rows = [dict(row._mapping) for row in conn.execute(select(*old_columns))]
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_idempotency_key_created_at")
+    conn.exec_driver_sql(f"DROP TABLE {table.name}")
+    return rows
+
+
+def _add_missing_columns(conn):
+    """Adiciona colunas novas (nullable) em tabelas existentes. Retorna {(tabela, coluna)} criadas."""
+    inspector = inspect(conn)
+    added = set()
+    for table in db.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                raise RuntimeError(f"Coluna {table.name}.{column.name} precisa de migração manual (NOT NULL)")
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            table_name = conn.dialect.identifier_preparer.format_table(table)
+            conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {ddl}")
+            added.add((table.name, column.name))
+    return added
+
+
+def _migrate_dish_refs(conn):
+    """Preenche RSVP.dish_id a partir do nome do prato (bancos anteriores à chave estrangeira)"""
+    rsvp, dish = RSVP.__table__, DishCounter.__table__
+    # Pratos que só existem como texto nos RSVPs ganham contador, para nenhuma linha ficar sem prato
+    orphans = select(
+        rsvp.c.selected_dish,
+        func.sum(case((rsvp.c.payment_status == "rejected", 0), else_=1)),
+        literal(dishes.DEFAULT_MAX_COUNT),
+    ).where(
+        rsvp.c.selected_dish.is_not(None),
+        rsvp.c.selected_dish.not_in(select(dish.c.dish_name)),
+    ).group_by(rsvp.c.selected_dish)
+    conn.execute(dish.insert().from_select(["dish_name", "current_count", "max_count"], orphans))
+
+    # Um UPDATE para a tabela toda, com subconsulta correlacionada pelo nome (banco antigo: um evento só)
+    conn.execute(
+        rsvp.update().where(rsvp.c.dish_id.is_(None)).values(
+            dish_id=select(dish.c.id).where(dish.c.dish_name == rsvp.c.selected_dish).scalar_subquery(),
+            updated_at=rsvp.c.updated_at,  # Migração não é alteração do RSVP
+        )
+    )
+    # Índice por nome não é mais usado nas consultas
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_rsvp_selected_dish")
+
+
+def _ensure_default_event(conn):
+    """Id do evento padrão (DEFAULT_EVENT), criado se ainda não existe"""
+    event = Event.__table__
+    values = eventscope.default_values()
+    event_id = conn.execute(select(event.c.id).where(event.c.slug == values["slug"])).scalar()
+    if event_id is None:
+        event_id = conn.execute(event.insert().values(**values)).inserted_primary_key[0]
+    return event_id
+
+
+def _backfill_events(conn, event_id):
+    """Dados de antes do multi-evento passam a ser do evento padrão"""
+    for table in (RSVP.__table__, DishCounter.__table__, RsvpTombstone.__table__):
+        values = {"event_id": event_id}
+        if "updated_at" in table.c:
+            values["updated_at"] = table.c.updated_at  # Migração não é alteração da linha
+        conn.execute(table.update().where(table.c.event_id.is_(None)).values(**values))
+
+
+def _drop_global_dish_name_unique(conn):
+    """Tira o UNIQUE(dish_name) antigo: o nome do prato passa a ser único por evento"""
+    table = DishCounter.__table__
+    constraints = [
+        constraint for constraint in inspect(conn).get_unique_constraints(table.name)
+        if constraint["column_names"] == ["dish_name"]
+    ]
+    if not constraints:
+        return
+    if conn.dialect.name != "sqlite":
+        for constraint in constraints:
+            conn.exec_driver_sql(f'ALTER TABLE {table.name} DROP CONSTRAINT "{constraint["name"]}"')
+        return
+    # SQLite não remove constraints: recria a tabela (as chaves estrangeiras seguem pelo nome)
+    columns = ", ".join(column.name for column in table.columns)
+    conn.exec_driver_sql("PRAGMA legacy_alter_table = ON")  # Não reescrever as FKs de rsvp/dish_stat
+    conn.exec_driver_sql(f"ALTER TABLE {table.name} RENAME TO {table.name}_old")
+    conn.exec_driver_sql("PRAGMA legacy_alter_table = OFF")
+    table.create(conn)
+    conn.exec_driver_sql(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {table.name}_old")
+    conn.exec_driver_sql(f"DROP TABLE {table.name}_old")
+
+
+def _backfill_search(conn, chunk_size=1000):
+    """Preenche as colunas de busca dos RSVPs existentes (normalização em Python)"""
+    rsvp = RSVP.__table__
+    rows = conn.execute(select(rsvp.c.id, rsvp.c.name, rsvp.c.email, rsvp.c.phone)).all()
+    stmt = rsvp.update().where(rsvp.c.id == bindparam("rsvp_id")).values(
+        search_name=bindparam("search_name"),
+        search_email=bindparam("search_email"),
+        search_phone=bindparam("search_phone"),
+        updated_at=rsvp.c.updated_at,  # Migração não é alteração do RSVP
+    )
+    for start in range(0, len(rows), chunk_size):
+        conn.execute(stmt, [
+            {"rsvp_id": row.id, **search.columns(row.name, row.email, row.phone)}
+            for row in rows[start:start + chunk_size]
+        ])
+
+
+def _backfill_confirmed_at(conn):
+    """RSVPs já confirmados antes de existir confirmed_at: usa updated_at (melhor estimativa)"""
+    rsvp = RSVP.__table__
+    conn.execute(rsvp.update().where(rsvp.c.payment_status == "confirmed").values(
+        confirmed_at=func.coalesce(rsvp.c.updated_at, rsvp.c.created_at),
+        updated_at=rsvp.c.updated_at,  # Migração não é alteração do RSVP
+    ))
+
+
+def upgrade():
+    """Cria tabelas, colunas e índices que ainda não existem e migra os dados, numa transação"""
+    with db.engine.begin() as conn:
+        _reset_derived_tables(conn)
+        global_keys = _take_global_idempotency_keys(conn)
+        db.metadata.create_all(conn)
+        added = _add_missing_columns(conn)
+        if (RSVP.__tablename__, "dish_id") in added:
+            _migrate_dish_refs(conn)
+        default_event_id = _ensure_default_event(conn)
+        _backfill_events(conn, default_event_id)
+        if global_keys:
+            # Chaves de antes do escopo por evento passam a ser do evento padrão
+            conn.execute(IdempotencyKey.__table__.insert(),
+                         [{**row, "event_id": default_event_id} for row in global_keys])
+        _drop_global_dish_name_unique(conn)
+        for name in OBSOLETE_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    # IF NOT EXISTS: a inspeção não enxerga índices de expressão (lower(email))
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+                except IntegrityError:
+                    if index.name != UNIQUE_EMAIL_INDEX:
+                        raise
+                    raise RuntimeError("Há RSVPs com e-mail repetido no mesmo evento: remova as duplicatas "
+                                       "antes de ligar UNIQUE_RSVP_EMAIL")
+        if not UNIQUE_RSVP_EMAIL:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {UNIQUE_EMAIL_INDEX}")
+        if (RSVP.__tablename__, "search_name") in added:
+            _backfill_search(conn)
+        if (RSVP.__tablename__, "confirmed_at") in added:
+            _backfill_confirmed_at(conn)
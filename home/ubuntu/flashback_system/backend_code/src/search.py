@@ -0,0 +1,109 @@
+import re
+import unicodedata
+
+from sqlalchemy import event
+
+from models.rsvp import db, RSVP
+import projection
+
+# -------------------------------------------------
+# Busca de convidados (/api/rsvps/search?q=)
+# Cada RSVP guarda o nome e o e-mail normalizados (sem acentos, minúsculas,
+# espaços simples) e o telefone só com dígitos, em colunas indexadas. A busca
+# é por prefixo nessas colunas: "joao" acha "João da Silva", "joao@" acha o
+# e-mail, "6199" acha o telefone. Cada consulta é uma faixa do índice com
+# LIMIT dentro do evento (índices (event_id, coluna)), então o custo não
+# depende do tamanho da tabela.
+# As colunas são preenchidas pelos eventos do ORM (before_insert/update);
+# inserts em lote (importação) usam columns() direto.
+# -------------------------------------------------
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MIN_PHONE_DIGITS = 3
+_SPACES_RE = re.compile(r"\s+")
+_PHONE_QUERY_RE = re.compile(r"^[\d\s()+.-]+$")
+
+
+def normalize(value):
+    """"  João  da SILVA " -> "joao da silva" """
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _SPACES_RE.sub(" ", stripped).strip().lower()
+
+
+def digits(value):
+    return "".join(char for char in str(value or "") if char.isdigit())
+
+
+def columns(name, email, phone):
+    """Valores das colunas de busca de um RSVP"""
+    return {
+        "search_name": normalize(name)[:100],
+        "search_email": normalize(email)[:120],
+        "search_phone": digits(phone)[:20],
+    }
+
+
+def _fill(mapper, connection, rsvp):
+    for column, value in columns(rsvp.name, rsvp.email, rsvp.phone).items():
+        setattr(rsvp, column, value)
+
+
+event.listen(RSVP, "before_insert", _fill)
+event.listen(RSVP, "before_update", _fill)
+
+
+def _prefix(column, prefix):
+    """Faixa do índice [prefix, prefix com o último caractere + 1) + LIKE para confirmar"""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return db.and_(column >= prefix, column < upper, column.like(escaped + "%", escape="\\"))
+
+
+def _matches(event_id, column, prefix, limit):
+    """[(id, valor)] dos RSVPs do evento cujo column começa com prefix, na ordem do índice"""
+    return db.session.execute(
+        db.select(RSVP.id, column).where(RSVP.event_id == event_id, _prefix(column, prefix)).order_by(
+            column, RSVP.id).limit(limit)
+    ).all()
+
+
+def find_ids(query, event_id, limit=SEARCH_LIMIT):
+    """Ids dos RSVPs do evento que casam com a busca, do mais relevante ao menos.
+
+    Ordem: nome exato, prefixo do nome, prefixo do e-mail; telefone quando a
+    busca só tem dígitos.
+    """
+    text = normalize(query)
+    if not text:
+        return []
+    ranked = []
+    if _PHONE_QUERY_RE.match(text):
+        phone = digits(text)
+        if len(phone) >= MIN_PHONE_DIGITS:
+            ranked += [(1, value, rsvp_id) for rsvp_id, value in _matches(event_id, RSVP.search_phone, phone, limit)]
+    else:
+        if "@" not in text:
+            ranked += [(0 if value == text else 1, value, rsvp_id)
+                       for rsvp_id, value in _matches(event_id, RSVP.search_name, text, limit)]
+        ranked += [(2, value, rsvp_id) for rsvp_id, value in _matches(event_id, RSVP.search_email, text, limit)]
+    ids = []
+    for _rank, _value, rsvp_id in sorted(ranked):
+        if rsvp_id not in ids:
+            ids.append(rsvp_id)
+    return ids[:limit]
+
+
+def search(query, event_id, fields, limit=SEARCH_LIMIT):
+    """RSVPs do evento (dicts com os campos pedidos) que casam com a busca, em ordem de relevância"""
+    ids = find_ids(query, event_id, limit)
+    if not ids:
+        return []
+    projected = projection.RsvpProjection(fields)
+    rows = db.session.execute(projected.select().where(RSVP.id.in_(ids))).all()
+    id_index = projected.index("id")
+    position = {rsvp_id: i for i, rsvp_id in enumerate(ids)}
+    rows.sort(key=lambda row: position[row[id_index]])
+    return [projected.to_dict(row) for row in rows]
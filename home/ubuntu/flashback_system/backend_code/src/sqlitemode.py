@@ -0,0 +1,55 @@
+import os
+import sqlite3
+
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+from models.rsvp import db
+from replica import WRITE_METHODS
+
+# -------------------------------------------------
+# SQLite em produção (sem DATABASE_URL, banco em database/app.db)
+# Em cada conexão nova: WAL (leitores não bloqueiam o escritor),
+# busy_timeout (espera o lock em vez de falhar) e synchronous=NORMAL
+# (com WAL, fsync só no checkpoint). As transações das rotas de escrita
+# começam com BEGIN IMMEDIATE: pegam o lock de escrita logo no início, em
+# vez de ler com lock compartilhado e falhar com "database is locked" ao
+# tentar escrever depois de outro worker (o busy_timeout não vale nesse caso).
+# SQLITE_TUNING=0 volta ao comportamento padrão do driver.
+# -------------------------------------------------
+JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def _on_connect(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    # O driver não emite BEGIN sozinho; quem emite é _on_begin
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def _wants_write_lock():
+    if has_request_context() and request.method in WRITE_METHODS:
+        return True
+    return has_app_context() and g.get("sqlite_immediate", False)
+
+
+def _on_begin(conn):
+    conn.exec_driver_sql("BEGIN IMMEDIATE" if _wants_write_lock() else "BEGIN")
+
+
+def init_app(app):
+    """Registra os eventos nas engines SQLite do app (antes da primeira conexão)"""
+    if str(app.config.get("SQLITE_TUNING", os.getenv("SQLITE_TUNING", "1"))) == "0":
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", _on_connect)
+                event.listen(engine, "begin", _on_begin)
@@ -0,0 +1,309 @@
+// Cards de estatísticas e pratos (vêm de /api/admin/changes e do SSE)
+function renderStats(stats) {
+    document.getElementById('total-rsvps').textContent = stats.total_rsvps;
+    document.getElementById('total-guests').textContent = stats.total_guests;
+    document.getElementById('confirmed-payments').textContent = stats.confirmed_payments;
+    document.getElementById('total-revenue').textContent = `R$ ${stats.total_revenue.toFixed(2)}`;
+}
+function renderDishes(dishes) {
+    const dishesGrid = document.getElementById('dishes-grid');
+    dishesGrid.innerHTML = '';
+    dishes.forEach(dish => {
+        const dishCard = document.createElement('div');
+        dishCard.className = `dish-card ${dish.available ? 'dish-available' : 'dish-full'}`;
+        dishCard.innerHTML = `
+            <div class="dish-name">${dish.dish_name}</div>
+            <div class="dish-count">${dish.current_count}/${dish.max_count} ${dish.available ? '✅' : '❌'}</div>
+            ${dish.held_count ? `<div class="dish-held">+${dish.held_count} em pagamento</div>` : ''}
+        `;
+        dishesGrid.appendChild(dishCard);
+    });
+    const dishFilter = document.getElementById('filter-dish');
+    if (dishFilter.options.length <= 1) {
+        dishes.forEach(dish => dishFilter.add(new Option(dish.dish_name, dish.id)));
+    }
+}
+// Evento do painel (/admin?event=<slug>), repassado em todas as chamadas à API
+const EVENT = new URLSearchParams(location.search).get('event');
+function api(path) {
+    if (!EVENT) return path;
+    return `${path}${path.includes('?') ? '&' : '?'}event=${encodeURIComponent(EVENT)}`;
+}
+// Lista paginada por cursor: as páginas seguintes só quando o admin pede
+const PAGE_SIZE = 50;
+let loadedRows = 0;
+let nextCursor = null;
+function rsvpQuery(extra) {
+    const params = new URLSearchParams(extra);
+    const filters = { status: 'filter-status', dish: 'filter-dish', since: 'filter-since', until: 'filter-until' };
+    Object.entries(filters).forEach(([name, id]) => {
+        const value = document.getElementById(id).value;
+        if (value) params.set(name, value);
+    });
+    if (EVENT) params.set('event', EVENT);
+    return `/api/rsvps?${params}`;
+}
+function renderRsvpRow(rsvp) {
+    const row = document.createElement('tr');
+    row.dataset.id = rsvp.id;
+    row.dataset.createdAt = rsvp.created_at;
+    const statusClass = `status-${rsvp.payment_status}`;
+    const statusText = rsvp.payment_status === 'pending' ? 'Pendente' :
+                     rsvp.payment_status === 'confirmed' ? 'Confirmado' : 'Recusado';
+    row.innerHTML = `
+        <td><input type="checkbox" class="row-select" value="${rsvp.id}" ${selected.has(rsvp.id) ? 'checked' : ''} onchange="toggleSelect(${rsvp.id}, this.checked)"></td>
+        <td>${rsvp.name}</td>
+        <td>${rsvp.email}</td>
+        <td>${rsvp.guests}</td>
+        <td>${rsvp.selected_dish}</td>
+        <td>R$ ${rsvp.total_amount.toFixed(2)}</td>
+        <td class="${statusClass}">${statusText}</td>
+        <td>${rsvp.payment_proof_url ? `
+            <a href="${rsvp.payment_proof_url}" target="_blank">
+                <img class="proof-thumb" src="${rsvp.payment_proof_thumbnail_url}" alt="Comprovante" loading="lazy" onerror="this.replaceWith('📎')">
+            </a>` : ''}</td>
+        <td>${new Date(rsvp.created_at).toLocaleDateString('pt-BR')}</td>
+        <td>
+            ${rsvp.payment_status === 'pending' ? `
+                <button class="btn btn-success" onclick="acceptRsvp(${rsvp.id})">✅ Aceitar</button>
+                <button class="btn btn-danger" onclick="rejectRsvp(${rsvp.id})">❌ Recusar</button>
+            ` : ''}
+            <button class="btn btn-warning" onclick="deleteRsvp(${rsvp.id})">🗑️ Excluir</button>
+        </td>
+    `;
+    return row;
+}
+function showPage(rsvpsData, append) {
+    const rsvpList = document.getElementById('rsvp-list');
+    if (!append) {
+        rsvpList.innerHTML = '';
+        loadedRows = 0;
+        // Mantém selecionados só os RSVPs que continuam na lista
+        const visible = new Set(rsvpsData.data.map(rsvp => rsvp.id));
+        selected.forEach(id => { if (!visible.has(id)) selected.delete(id); });
+        updateBulkBar();
+    }
+    rsvpsData.data.forEach(rsvp => rsvpList.appendChild(renderRsvpRow(rsvp)));
+    loadedRows += rsvpsData.data.length;
+    nextCursor = rsvpsData.next_cursor;
+    document.getElementById('load-more').style.display = rsvpsData.has_more ? 'block' : 'none';
+}
+async function loadRsvps() {
+    // Primeira página (filtros novos ou carga completa); depois, só applyChanges
+    if (searchTerm()) return runSearch();
+    const response = await fetch(rsvpQuery({ limit: PAGE_SIZE }), { cache: 'no-store' });
+    const rsvpsData = await response.json();
+    if (rsvpsData.success) { showPage(rsvpsData, false); }
+    else { alert('Erro: ' + rsvpsData.error); }
+}
+// Busca (na porta): /api/rsvps/search por prefixo do nome, e-mail ou telefone
+let searchTimer = null;
+function searchTerm() {
+    return document.getElementById('search').value.trim();
+}
+function onSearchInput() {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(runSearch, 250);
+}
+async function runSearch() {
+    const q = searchTerm();
+    if (!q) return loadRsvps();
+    try {
+        const response = await fetch(api(`/api/rsvps/search?${new URLSearchParams({ q })}`), { cache: 'no-store' });
+        const data = await response.json();
+        if (q !== searchTerm()) return;  // Resposta de uma busca que já foi trocada
+        if (data.success) { showPage({ data: data.data, next_cursor: null, has_more: false }, false); }
+        else { alert('Erro: ' + data.error); }
+    } catch (error) { console.error('Erro na busca:', error); }
+}
+async function loadMoreRsvps() {
+    if (!nextCursor) return;
+    try {
+        const response = await fetch(rsvpQuery({ limit: PAGE_SIZE, cursor: nextCursor }));
+        const rsvpsData = await response.json();
+        if (rsvpsData.success) { showPage(rsvpsData, true); }
+        else { alert('Erro: ' + rsvpsData.error); }
+    } catch (error) { alert('Erro ao carregar RSVPs'); }
+}
+async function fetchChanges(since) {
+    const url = since ? `/api/admin/changes?since=${encodeURIComponent(since)}` : '/api/admin/changes';
+    const response = await fetch(api(url), { cache: 'no-store' });
+    const data = await response.json();
+    if (!data.success) throw new Error(data.error);
+    return data;
+}
+// Carga completa: pega o cursor antes da lista; o que mudar no meio vem no próximo sync
+async function loadData() {
+    try {
+        const changes = await fetchChanges(null);
+        changesCursor = changes.cursor;
+        renderStats(changes.stats);
+        renderDishes(changes.dishes);
+        await loadRsvps();
+    } catch (error) {
+        console.error('Erro ao carregar dados:', error);
+        alert('Erro ao carregar dados. Verifique a conexão.');
+    }
+}
+// Sincronização incremental: só os RSVPs que mudaram desde o cursor são
+// trocados, inseridos ou removidos na tabela
+let changesCursor = null;
+let syncing = null;
+function rsvpMatchesFilters(rsvp) {
+    const status = document.getElementById('filter-status').value;
+    const dish = document.getElementById('filter-dish').value;
+    const since = document.getElementById('filter-since').value;
+    const until = document.getElementById('filter-until').value;
+    const day = rsvp.created_at.slice(0, 10);
+    return (!status || rsvp.payment_status === status) &&
+           (!dish || String(rsvp.dish_id) === dish) &&
+           (!since || day >= since) && (!until || day <= until);
+}
+function rowFor(id) {
+    return document.querySelector(`#rsvp-list tr[data-id="${id}"]`);
+}
+function sortsBefore(rsvp, row) {
+    // Mesma ordem da lista: created_at desc, id desc
+    if (rsvp.created_at !== row.dataset.createdAt) return rsvp.created_at > row.dataset.createdAt;
+    return rsvp.id > Number(row.dataset.id);
+}
+function removeRow(id) {
+    const row = rowFor(id);
+    if (row) { row.remove(); loadedRows--; }
+    selected.delete(id);
+}
+function patchRsvp(rsvp) {
+    const existing = rowFor(rsvp.id);
+    if (searchTerm()) {
+        // Com busca ativa, só atualiza as linhas encontradas
+        if (existing) existing.replaceWith(renderRsvpRow(rsvp));
+        return;
+    }
+    if (!rsvpMatchesFilters(rsvp)) { removeRow(rsvp.id); return; }
+    const row = renderRsvpRow(rsvp);
+    if (existing) { existing.replaceWith(row); return; }
+    const list = document.getElementById('rsvp-list');
+    const next = [...list.children].find(other => sortsBefore(rsvp, other));
+    if (next) { list.insertBefore(row, next); }
+    else if (!nextCursor) { list.appendChild(row); }
+    else { return; }  // Cai numa página ainda não carregada
+    loadedRows++;
+}
+async function applyChanges() {
+    if (!changesCursor) return loadData();
+    const changes = await fetchChanges(changesCursor);
+    if (changes.reset) return loadData();
+    changesCursor = changes.cursor;
+    if (!changes.changed) return;
+    renderStats(changes.stats);
+    renderDishes(changes.dishes);
+    changes.deleted.forEach(removeRow);
+    changes.upserted.forEach(patchRsvp);
+    updateBulkBar();
+}
+function syncChanges() {
+    // Uma sincronização por vez; pedidos no meio reaproveitam a que está rodando
+    if (!syncing) {
+        syncing = applyChanges()
+            .catch(error => console.error('Erro ao sincronizar:', error))
+            .finally(() => { syncing = null; });
+    }
+    return syncing;
+}
+async function acceptRsvp(id) {
+    try {
+        const response = await fetch(api(`/api/rsvps/${id}/accept`), { method: 'POST' });
+        const data = await response.json();
+        if (data.success) { alert('RSVP aceito com sucesso!'); syncChanges(); }
+        else { alert('Erro: ' + data.error); }
+    } catch (error) { alert('Erro ao aceitar RSVP'); }
+}
+async function rejectRsvp(id) {
+    try {
+        const response = await fetch(api(`/api/rsvps/${id}/reject`), { method: 'POST' });
+        const data = await response.json();
+        if (data.success) { alert('RSVP recusado!'); syncChanges(); }
+        else { alert('Erro: ' + data.error); }
+    } catch (error) { alert('Erro ao recusar RSVP'); }
+}
+async function deleteRsvp(id) {
+    if (confirm('Tem certeza que deseja excluir este RSVP?')) {
+        try {
+            const response = await fetch(api(`/api/rsvps/${id}`), { method: 'DELETE' });
+            const data = await response.json();
+            if (data.success) { alert('RSVP excluído com sucesso!'); syncChanges(); }
+            else { alert('Erro: ' + data.error); }
+        } catch (error) { alert('Erro ao excluir RSVP'); }
+    }
+}
+// Seleção múltipla + ações em lote (uma requisição, uma transação no servidor)
+const selected = new Set();
+function updateBulkBar() {
+    document.getElementById('bulk-count').textContent = selected.size;
+    document.getElementById('bulk-actions').style.display = selected.size ? 'flex' : 'none';
+    if (!selected.size) document.getElementById('select-all').checked = false;
+}
+function toggleSelect(id, checked) {
+    if (checked) { selected.add(id); } else { selected.delete(id); }
+    updateBulkBar();
+}
+function toggleSelectAll(checked) {
+    document.querySelectorAll('.row-select').forEach(box => {
+        box.checked = checked;
+        toggleSelect(Number(box.value), checked);
+    });
+}
+async function bulkAction(action) {
+    const ids = [...selected];
+    if (!ids.length) return;
+    if (action === 'delete' && !confirm(`Tem certeza que deseja excluir ${ids.length} RSVPs?`)) return;
+    try {
+        const response = await fetch(api('/api/rsvps/bulk'), {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ids, action })
+        });
+        const data = await response.json();
+        if (!data.success) { alert('Erro: ' + data.error); return; }
+        // Os que falharam continuam selecionados para uma nova tentativa
+        const failed = data.data.filter(result => !result.success);
+        selected.clear();
+        failed.forEach(result => selected.add(result.id));
+        updateBulkBar();
+        alert(data.message + (failed.length ?
+            `\n${failed.length} com erro:\n` + failed.map(result => `#${result.id}: ${result.error}`).join('\n') : ''));
+        syncChanges();
+    } catch (error) { alert('Erro na ação em lote'); }
+}
+// Atualizações em tempo real via SSE; polling de 30s só se o stream cair
+let pollId = null;
+function startPolling() {
+    if (pollId) return;
+    syncChanges();
+    pollId = setInterval(syncChanges, 30000);
+}
+function stopPolling() {
+    if (!pollId) return;
+    clearInterval(pollId);
+    pollId = null;
+}
+function connectEvents() {
+    const source = new EventSource(api('/api/events'));
+    source.addEventListener('change', event => {
+        const change = JSON.parse(event.data);
+        renderStats(change.stats);
+        renderDishes(change.dishes);
+        syncChanges();
+    });
+    source.onopen = stopPolling;
+    source.onerror = () => {
+        startPolling();
+        // 503 (servidor no limite de streams): o EventSource desiste; tenta de novo depois
+        if (source.readyState === EventSource.CLOSED) setTimeout(connectEvents, 60000);
+    };
+}
+if (window.EventSource) {
+    connectEvents();
+} else {
+    startPolling();
+}
@@ -0,0 +1,147 @@
+from collections import namedtuple
+from datetime import datetime
+
+from models.rsvp import db, RSVP, DishCounter, StatsSnapshot, DishStat
+import rollups
+
+# -------------------------------------------------
+# Snapshot de estatísticas, um por evento (stats_snapshot.id = event_id)
+# As rotas de escrita chamam apply_change() na mesma transação do RSVP,
+# então /api/stats só precisa ler o snapshot (sem agregações na tabela RSVP).
+# As mesmas mudanças atualizam as séries por hora/dia (rollups.py).
+# -------------------------------------------------
+
+# Estado de um RSVP que importa para as estatísticas
+RsvpFacts = namedtuple("RsvpFacts", ["event_id", "status", "guests", "amount", "dish_id", "created_at",
+                                     "confirmed_at"])
+
+
+def facts(rsvp):
+    """Extrai do RSVP os campos usados nas estatísticas"""
+    return RsvpFacts(
+        event_id=rsvp.event_id,
+        status=rsvp.payment_status or "pending",
+        guests=int(rsvp.guests or 0),
+        amount=float(rsvp.total_amount or 0),
+        dish_id=rsvp.dish_id,
+        created_at=rsvp.created_at,
+        confirmed_at=rsvp.confirmed_at,
+    )
+
+
+def _contribution(f):
+    if f is None:
+        return {"total_rsvps": 0, "confirmed_payments": 0, "pending_payments": 0,
+                "total_guests": 0, "total_revenue": 0.0}
+    return {
+        "total_rsvps": 1,
+        "confirmed_payments": 1 if f.status == "confirmed" else 0,
+        "pending_payments": 1 if f.status == "pending" else 0,
+        "total_guests": f.guests,
+        "total_revenue": f.amount if f.status == "confirmed" else 0.0,
+    }
+
+
+def apply_change(before, after):
+    """Aplica ao snapshot a diferença entre dois estados de um RSVP.
+
+    before=None para criação, after=None para exclusão. Não faz commit.
+    """
+    apply_changes([(before, after)])
+
+
+def apply_changes(changes):
+    """Aplica várias mudanças (pares before/after) com um UPDATE por tabela/prato"""
+    rollups.apply_changes(changes)
+    events = {}  # event_id -> (totais, {dish_id: delta})
+    for before, after in changes:
+        event_id = (after or before).event_id
+        totals, dish_deltas = events.setdefault(event_id, (_contribution(None), {}))
+        old, new = _contribution(before), _contribution(after)
+        for col in totals:
+            totals[col] += new[col] - old[col]
+        if before is not None:
+            dish_deltas[before.dish_id] = dish_deltas.get(before.dish_id, 0) - 1
+        if after is not None:
+            dish_deltas[after.dish_id] = dish_deltas.get(after.dish_id, 0) + 1
+
+    for event_id, (totals, dish_deltas) in events.items():
+        values = {col: getattr(StatsSnapshot, col) + delta for col, delta in totals.items()}
+        values["updated_at"] = datetime.utcnow()
+        result = db.session.execute(
+            db.update(StatsSnapshot).where(StatsSnapshot.id == event_id).values(**values)
+        )
+        if result.rowcount == 0:
+            # Snapshot ainda não existe: recalcula tudo (já incluindo estas mudanças)
+            db.session.flush()
+            rebuild(event_id)
+            continue
+
+        for dish_id, delta in dish_deltas.items():
+            if delta and dish_id is not None:
+                _bump_dish(dish_id, delta)
+
+
+def _bump_dish(dish_id, delta):
+    result = db.session.execute(
+        db.update(DishStat).where(DishStat.dish_id == dish_id).values(count=DishStat.count + delta)
+    )
+    if result.rowcount == 0 and delta > 0:
+        db.session.add(DishStat(dish_id=dish_id, count=delta))
+        db.session.flush()
+
+
+def rebuild(event_id):
+    """Recalcula o snapshot do evento a partir da tabela RSVP. Não faz commit."""
+    confirmed = RSVP.payment_status == "confirmed"
+    total, confirmed_count, pending_count, guests, revenue = db.session.query(
+        db.func.count(RSVP.id),
+        db.func.sum(db.case((confirmed, 1), else_=0)),
+        db.func.sum(db.case((RSVP.payment_status == "pending", 1), else_=0)),
+        db.func.sum(RSVP.guests),
+        db.func.sum(db.case((confirmed, RSVP.total_amount), else_=0)),
+    ).filter(RSVP.event_id == event_id).one()
+
+    snapshot = db.session.get(StatsSnapshot, event_id) or StatsSnapshot(id=event_id)
+    snapshot.total_rsvps = total or 0
+    snapshot.confirmed_payments = confirmed_count or 0
+    snapshot.pending_payments = pending_count or 0
+    snapshot.total_guests = guests or 0
+    snapshot.total_revenue = float(revenue or 0)
+    snapshot.updated_at = datetime.utcnow()
+    db.session.add(snapshot)
+
+    event_dishes = db.select(DishCounter.id).where(DishCounter.event_id == event_id)
+    db.session.execute(db.delete(DishStat).where(DishStat.dish_id.in_(event_dishes)))
+    dish_counts = db.session.query(
+        RSVP.dish_id, db.func.count(RSVP.id)
+    ).filter(RSVP.event_id == event_id, RSVP.dish_id.is_not(None)).group_by(RSVP.dish_id).all()
+    db.session.add_all([DishStat(dish_id=dish_id, count=count) for dish_id, count in dish_counts])
+    db.session.flush()
+    return snapshot
+
+
+def ensure_snapshot(event_id):
+    """Cria o snapshot do evento na primeira execução (bancos já existentes)"""
+    if db.session.get(StatsSnapshot, event_id) is None:
+        rebuild(event_id)
+        db.session.commit()
+
+
+def read_stats(event_id):
+    """Estatísticas do evento no formato de /api/stats, lidas do snapshot"""
+    snapshot = db.session.get(StatsSnapshot, event_id)
+    if snapshot is None:
+        snapshot = rebuild(event_id)
+        db.session.commit()
+    dish_stats = db.session.query(DishStat.dish_id, DishCounter.dish_name, DishStat.count).join(
+        DishCounter, DishCounter.id == DishStat.dish_id
+    ).filter(DishCounter.event_id == event_id, DishStat.count > 0).order_by(DishStat.count.desc()).all()
+    return {
+        'total_rsvps': snapshot.total_rsvps,
+        'confirmed_payments': snapshot.confirmed_payments,
+        'pending_payments': snapshot.pending_payments,
+        'total_guests': snapshot.total_guests,
+        'total_revenue': snapshot.total_revenue,
+        'dish_stats': [{'dish_id': dish_id, 'dish': dish, 'count': count} for dish_id, dish, count in dish_stats]
+    }
@@ -0,0 +1,102 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import g, jsonify, request, make_response
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models.rsvp import db, DataVersion
+import eventscope
+import replica
+
+# -------------------------------------------------
+# Versão dos dados + GET condicional (ETag / 304)
+# Uma versão por evento (data_version.id = event_id): escritas num evento
+# não invalidam ETags, cache de pratos nem SSE dos outros.
+# Toda rota de escrita chama bump(event_id) antes do commit. As rotas de
+# leitura usam @conditional: se o cliente já tem a versão atual do evento,
+# responde 304 lendo só a linha de data_version (sem tocar RSVP/DishCounter).
+# Sem Last-Modified: com resolução de segundos, duas escritas no mesmo
+# segundo dariam 304 com dados velhos; só a versão no ETag é exata.
+# -------------------------------------------------
+_UPSERT = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def bump(event_id):
+    """Incrementa a versão dos dados do evento na transação atual. Não faz commit."""
+    now = datetime.utcnow()
+    insert = _UPSERT.get(db.engine.dialect.name)
+    if insert is not None:
+        # Um comando só: a primeira escrita de um evento novo em dois workers não colide
+        stmt = insert(DataVersion).values(id=event_id, version=1, updated_at=now)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=["id"], set_={"version": DataVersion.version + 1, "updated_at": now}
+        ))
+        return
+    result = db.session.execute(
+        db.update(DataVersion).where(DataVersion.id == event_id).values(
+            version=DataVersion.version + 1, updated_at=now
+        )
+    )
+    if result.rowcount == 0:
+        db.session.add(DataVersion(id=event_id, version=1, updated_at=now))
+        db.session.flush()
+
+
+def current(event_id):
+    """(versão, data da última escrita) do evento — leitura por chave primária"""
+    row = db.session.execute(
+        db.select(DataVersion.version, DataVersion.updated_at).where(DataVersion.id == event_id)
+    ).first()
+    if row is None:
+        return 0, None
+    updated_at = row.updated_at.replace(microsecond=0, tzinfo=timezone.utc) if row.updated_at else None
+    return row.version, updated_at
+
+
+def _etag(version):
+    tag = f"{request.endpoint}-{version}"
+    if request.query_string:
+        tag += "-" + hashlib.sha1(request.query_string).hexdigest()[:12]
+    return tag
+
+
+def _not_modified(etag):
+    return bool(request.if_none_match) and request.if_none_match.contains_weak(etag)
+
+
+def _read_version(event_id):
+    try:
+        return current(event_id)[0]
+    except Exception:
+        # Réplica fora do ar, sem sincronizar ou sem a tabela: esta requisição lê do primário
+        if not replica.fall_back_to_primary():
+            raise
+        return current(event_id)[0]
+
+
+def conditional(view):
+    """Adiciona o ETag da versão do evento à resposta e devolve 304 quando nada mudou"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            version = _read_version(eventscope.current().id)
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({"success": False, "error": str(e)}), 500
+        g.data_version = version
+        etag = _etag(version)
+        if _not_modified(etag):
+            response = make_response("", 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        # O cliente sempre revalida; a revalidação é barata
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
@@ -1,22 +1,89 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { partyInfo, menuItems } from './data/menu.js'
 import './App.css'
 
 // URL do backend (lê do .env e usa localhost se não tiver)
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000/api'
+// Evento no backend (um backend atende várias festas); sem ele, o evento padrão
+const EVENT_QUERY = process.env.REACT_APP_EVENT ? `?event=${encodeURIComponent(process.env.REACT_APP_EVENT)}` : ''
+
+// Ler as próprias escritas com réplica no backend: o cookie de leitura no primário
+// não vai em requisições para outro domínio, então o front devolve o X-Primary-Until
+// da última escrita nas leituras seguintes (quem confere o prazo é o backend)
+let primaryPin = { value: null, at: 0 }
+
+function rememberPrimaryPin(res) {
+  const value = res.headers.get('X-Primary-Until')
+  if (value) primaryPin = { value, at: Date.now() }
+  return res
+}
+
+function readHeaders(etag) {
+  const headers = etag ? { 'If-None-Match': etag } : {}
+  if (primaryPin.value && Date.now() - primaryPin.at < 60000) headers['X-Primary-Until'] = primaryPin.value
+  return headers
+}
 
 // ===== função para puxar stats do backend (tolerante a formatos) =====
+// GET condicional: manda o ETag da última resposta; 304 reaproveita o último resultado
+let statsCache = { etag: null, data: null }
+
 async function fetchStatsAPI() {
-  const res = await fetch(`${API_URL}/stats`)
+  const headers = readHeaders(statsCache.etag)
+  const res = await fetch(`${API_URL}/stats${EVENT_QUERY}`, { headers, cache: 'no-store' })
+  if (res.status === 304 && statsCache.data) {
+    return statsCache.data
+  }
   const json = await res.json()
   if (!res.ok || json.success === false) {
     throw new Error(json?.error || `Erro HTTP ${res.status}`)
   }
   // seu back manda { data: {...} }, então normalizamos:
   const data = json?.data ?? json
+  statsCache = { etag: res.headers.get('ETag'), data }
   return data // { dish_stats: [{dish, count}], ... }
 }
 
+// ===== pratos do backend: id e disponibilidade (já contando as vagas seguradas) =====
+let dishesCache = { etag: null, data: null }
+
+async function fetchDishesAPI() {
+  const headers = readHeaders(dishesCache.etag)
+  const sep = EVENT_QUERY ? '&' : '?'
+  const res = await fetch(`${API_URL}/dishes${EVENT_QUERY}${sep}fields=id,dish_name,available`, { headers, cache: 'no-store' })
+  if (res.status === 304 && dishesCache.data) {
+    return dishesCache.data
+  }
+  const json = await res.json()
+  if (!res.ok || json.success === false) {
+    throw new Error(json?.error || `Erro HTTP ${res.status}`)
+  }
+  dishesCache = { etag: res.headers.get('ETag'), data: json.data }
+  return json.data // [{ id, dish_name, available }]
+}
+
+// Segura uma vaga do prato enquanto o convidado paga o PIX; replace devolve a vaga anterior
+async function holdDishAPI(dishId, replace) {
+  const res = await fetch(`${API_URL}/dishes/${dishId}/hold${EVENT_QUERY}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(replace ? { replace } : {})
+  }).then(rememberPrimaryPin)
+  const json = await res.json()
+  if (!res.ok || json.success === false) {
+    const error = new Error(json?.error || `Erro HTTP ${res.status}`)
+    error.status = res.status
+    throw error
+  }
+  return json.data // { token, dish_id, expires_at, ttl_seconds }
+}
+
+// Idempotency-Key: um valor por envio do formulário
+function newIdempotencyKey() {
+  if (window.crypto?.randomUUID) return window.crypto.randomUUID()
+  return `${Date.now()}-${Math.random().toString(36).slice(2)}`
+}
+
 function App() {
   const [formData, setFormData] = useState({
     name: '',
@@ -34,6 +101,8 @@ function App() {
   const [currentDecade, setCurrentDecade] = useState('60s')
   const [isPlaying, setIsPlaying] = useState(false)
   const [youtubePlayer, setYoutubePlayer] = useState(null)
+  // Vaga segurada no backend para o prato escolhido: { itemId, token }
+  const dishHold = useRef(null)
 
   // Inicializar player do YouTube
   useEffect(() => {
@@ -147,41 +216,106 @@ function App() {
   }, [currentDecade])
 
   // ===== SINCRONIZAÇÃO COM O BACKEND =====
+  // Recebe as mudanças por SSE (/api/events); só volta a fazer polling se o stream cair
   useEffect(() => {
     let alive = true
+    let pollId = null
+    let source = null
+    let reconnectId = null
+
+    function applyStats(stats) {
+      const dishStats = (stats?.dish_stats || [])  // [{ dish, count }]
+
+      setAvailableItems(prev =>
+        prev.map(item => {
+          // casa pelo nome do prato que você exibe
+          const match = dishStats.find(d => d.dish === item.name)
+          const confirmed = Number(match?.count ?? 0)
+          const capacity  = Number(item.maxCount) // capacidade vem do menu local
+
+          return {
+            ...item,
+            maxCount: capacity,
+            selectedCount: confirmed,
+            available: confirmed < capacity,
+            selectedBy: item.selectedBy || []
+          }
+        })
+      )
+    }
+
+    // Disponibilidade do backend (conta as vagas seguradas por quem está pagando)
+    function applyDishes(dishes) {
+      if (!dishes) return
+      setAvailableItems(prev =>
+        prev.map(item => {
+          const match = dishes.find(d => d.dish_name === item.name)
+          return match ? { ...item, backendId: match.id, available: match.available } : item
+        })
+      )
+    }
 
     async function syncFromBackend() {
       try {
-        const stats = await fetchStatsAPI()
-        const dishStats = (stats?.dish_stats || [])  // [{ dish, count }]
-
+        const [stats, dishes] = await Promise.all([fetchStatsAPI(), fetchDishesAPI()])
         if (!alive) return
-
-        setAvailableItems(prev =>
-          prev.map(item => {
-            // casa pelo nome do prato que você exibe
-            const match = dishStats.find(d => d.dish === item.name)
-            const confirmed = Number(match?.count ?? 0)
-            const capacity  = Number(item.maxCount) // capacidade vem do menu local
-
-            return {
-              ...item,
-              maxCount: capacity,
-              selectedCount: confirmed,
-              available: confirmed < capacity,
-              selectedBy: item.selectedBy || []
-            }
-          })
-        )
+        applyStats(stats)
+        applyDishes(dishes)
       } catch (e) {
         console.error('Falha ao sincronizar stats:', e)
       }
     }
 
-    syncFromBackend()                 // primeira carga
-    const id = setInterval(syncFromBackend, 10000) // e a cada 10s
+    function startPolling() {
+      if (pollId) return
+      syncFromBackend()
+      pollId = setInterval(syncFromBackend, 10000) // a cada 10s enquanto o stream estiver fora
+    }
+
+    function stopPolling() {
+      if (!pollId) return
+      clearInterval(pollId)
+      pollId = null
+    }
+
+    fetchDishesAPI().then(dishes => { if (alive) applyDishes(dishes) }).catch(e => {
+      console.error('Falha ao carregar pratos:', e)
+    })
+
+    function connectEvents() {
+      if (!alive) return
+      const current = new EventSource(`${API_URL}/events${EVENT_QUERY}`)
+      source = current
+      current.addEventListener('change', (e) => {
+        if (!alive) return
+        try {
+          const change = JSON.parse(e.data)
+          applyStats(change.stats)
+          applyDishes(change.dishes)
+        } catch (err) {
+          console.error('Evento inválido:', err)
+        }
+      })
+      current.onopen = stopPolling
+      current.onerror = () => {
+        startPolling() // o EventSource tenta reconectar sozinho...
+        // ...menos depois de um 503 (servidor no limite de streams): tenta de novo em 1 min
+        if (current.readyState === EventSource.CLOSED) reconnectId = setTimeout(connectEvents, 60000)
+      }
+    }
+
+    if (window.EventSource) {
+      connectEvents()
+    } else {
+      startPolling()
+    }
 
-    return () => { alive = false; clearInterval(id) }
+    return () => {
+      alive = false
+      stopPolling()
+      clearTimeout(reconnectId)
+      if (source) source.close()
+    }
   }, [])
 
   const calculateTotal = () => {
@@ -189,6 +323,34 @@ function App() {
     return formData.paymentType === 'individual' ? basePrice * formData.guests : basePrice
   }
 
+  // Escolha do prato: segura a vaga no backend (devolvendo a do prato anterior)
+  const selectDish = async (value) => {
+    setFormData(prev => ({ ...prev, selectedDish: value }))
+    const item = availableItems.find(it => it.id === parseInt(value))
+    const previous = dishHold.current
+    dishHold.current = null
+    if (!item?.backendId) {
+      if (previous) {
+        fetch(`${API_URL}/dishes/holds/${previous.token}${EVENT_QUERY}`, { method: 'DELETE' }).then(rememberPrimaryPin).catch(() => {})
+      }
+      return
+    }
+    try {
+      const hold = await holdDishAPI(item.backendId, previous?.token)
+      dishHold.current = { itemId: item.id, token: hold.token }
+    } catch (e) {
+      console.error('Falha ao segurar o prato:', e)
+      // 429 (muitas vagas seguradas / muitas tentativas): segue sem hold, o envio disputa uma vaga livre
+      if (e.status === 429) return
+      setFormData(prev => ({ ...prev, selectedDish: '' }))
+      alert(`Erro: ${e.message}. Por favor, escolha outro prato!`)
+    }
+  }
+
+  // Mesma chave enquanto os dados não mudam: toque duplo ou reenvio em rede ruim
+  // recebe o RSVP já criado, em vez de criar outro e ocupar outra vaga
+  const submitKey = useRef({ body: null, key: null })
+
   const handleSubmit = async (e) => {
     e.preventDefault()
     if (!formData.selectedDish) {
@@ -208,16 +370,25 @@ function App() {
         selected_dish: availableItems.find(item => item.id === parseInt(formData.selectedDish))?.name,
         payment_type: formData.paymentType
       }
+      if (dishHold.current?.itemId === parseInt(formData.selectedDish)) {
+        submitData.hold_token = dishHold.current.token // vaga já segurada (se venceu, o backend tenta uma livre)
+      }
 
       console.log('POST ->', `${API_URL}/rsvps`, submitData)
 
-      const response = await fetch(`${API_URL}/rsvps`, {
+      const body = JSON.stringify(submitData)
+      if (submitKey.current.body !== body) {
+        submitKey.current = { body, key: newIdempotencyKey() }
+      }
+
+      const response = await fetch(`${API_URL}/rsvps${EVENT_QUERY}`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'Idempotency-Key': submitKey.current.key,
         },
-        body: JSON.stringify(submitData)
-      })
+        body
+      }).then(rememberPrimaryPin)
 
       if (!response.ok) {
         const text = await response.text()
@@ -228,6 +399,7 @@ function App() {
       console.log('RESPOSTA <-', result)
       
       if (result?.success) {
+        dishHold.current = null
         // mantém sua UX: efeito imediato local
         setAvailableItems(prev => 
           prev.map(item => {
@@ -555,12 +727,12 @@ function App() {
                     value={formData.selectedDish}
                     onChange={(e) => {
                       console.log('Selecionando prato:', e.target.value);
-                      setFormData({...formData, selectedDish: e.target.value});
+                      selectDish(e.target.value);
                     }}
                     className="w-full bg-black/50 border border-cyan-400/50 rounded px-3 py-2 text-white font-mono focus:border-cyan-400 focus:outline-none"
                   >
                     <option value="">Selecione um suprimento</option>
-                    {availableItems.filter(item => item.available).map(item => (
+                    {availableItems.filter(item => item.available || String(item.id) === formData.selectedDish).map(item => (
                       <option key={item.id} value={item.id}>
                         {item.name} ({item.selectedCount}/{item.maxCount})
                       </option>